@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Serve the project through this module (e.g. `uvicorn config.asgi:application`)
+and set NOTIFICATION_STREAM_ENABLED so the long-lived notification stream at
+/api/notifications/stream/ runs on the event loop instead of holding a worker
+thread per open tab.
 """
 
 import os
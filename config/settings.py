@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'crispy_forms',
     'crispy_tailwind',
     'otp_auth',
+    'reporting',
 ]
 
 MIDDLEWARE = [
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'jobs.middleware.NotificationBatchMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -79,6 +81,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'jobs.context_processors.unread_notifications',
             ],
         },
     },
@@ -101,6 +104,24 @@ DATABASES = {
     }
 }
 
+# Reporting tables (the reporting app) go to DATABASES['reporting'] when that
+# alias is defined, keeping warehouse loads and report queries off the main
+# database; otherwise they live in 'default'.
+DATABASE_ROUTERS = ['reporting.routers.ReportingRouter']
+
+
+# Cache
+# Unread notification counters live here. Use a shared backend (Redis or
+# Memcached) when running more than one process so every worker sees the same
+# counters.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bluecaller',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -188,8 +209,62 @@ EMAIL_HOST_PASSWORD = 'Nist@12345'               # Generated App Password
 DEFAULT_FROM_EMAIL = 'BlueCaller <alina.csit2078@nistcollege.edu.np>'
 SITE_URL = 'http://localhost:8000'  # Change to your domain in production
 
+# Outgoing mail goes through config.utils.email_dispatch, which keeps one SMTP
+# connection open per process; bulk sends run on background threads.
+# `backend` defaults to EMAIL_BACKEND; point it (or EMAIL_HOST/EMAIL_PORT) at
+# a local SMTP server such as `python -m aiosmtpd -n -l localhost:1025`
+# during development.
+EMAIL_DISPATCH = {
+    'rate_limit': 10,      # messages per second, 0 for unlimited
+    'max_retries': 3,      # reconnect attempts after a dropped connection
+    'retry_backoff': 1.0,  # seconds, doubled on every retry
+    'idle_timeout': 60,    # reopen the connection after this many idle seconds
+    'background_workers': 2,  # threads sending queued bulk email
+}
+
+# One-time login/signup codes (otp_auth.store). Codes are hashed and kept in
+# CACHES with this TTL; requests and guesses are rate limited per user and IP.
+OTP_TTL_SECONDS = 300
+OTP_MAX_ATTEMPTS = 5           # wrong guesses before a code is discarded
+OTP_RATE_LIMIT_WINDOW = 900    # seconds
+OTP_MAX_ISSUES_PER_USER = 5    # codes per user per window
+OTP_MAX_ISSUES_PER_IP = 20     # codes per IP address per window
+OTP_DELIVERY_WORKERS = 2       # background threads sending OTP emails
+OTP_AUDIT_RETENTION_DAYS = 30  # `manage.py purge_expired` drops older audit rows
+# Reverse proxies in front of the app that append to X-Forwarded-For. With 0
+# the header is ignored and REMOTE_ADDR is used, so clients cannot spoof the
+# address the per-IP OTP limit is keyed on.
+TRUSTED_PROXY_COUNT = 0
+
 SITE_ID = 1
 
+# Notifications are buffered per request and written with bulk_create in
+# chunks of this size
+NOTIFICATION_BATCH_SIZE = 500
+# Cached unread-notification counters expire after this many seconds and are
+# recounted from the database on the next read
+NOTIFICATION_UNREAD_COUNT_TIMEOUT = 300
+# Workers with WorkerSettings.email_frequency = 'digest' get one summary email
+# per run of `manage.py send_notification_digests` instead of one per request
+NOTIFICATION_DIGEST_LOOKBACK_HOURS = 24  # older unread notifications are skipped
+NOTIFICATION_DIGEST_MAX_ITEMS = 20       # notifications listed per digest email
+
+# Push channel for /api/notifications/stream/ (Server-Sent Events). Only
+# enable it when serving through an ASGI server (config/asgi.py); under WSGI
+# each open stream holds a worker thread, so pages poll the unread count
+# instead. InProcessBroker fans out within one server process; CacheBroker
+# shares events between processes through CACHES, so use it with a shared
+# cache backend when running several ASGI workers.
+NOTIFICATION_STREAM_ENABLED = False
+NOTIFICATION_BROKER = 'jobs.events.InProcessBroker'
+NOTIFICATION_BROKER_OPTIONS = {}
+NOTIFICATION_STREAM_HEARTBEAT = 15      # seconds between keep-alive comments
+NOTIFICATION_STREAM_MAX_DURATION = 300  # seconds before a stream closes and the browser reconnects
+
+# Each customer's set of favorited worker ids is cached for worker cards and
+# dropped whenever they add or remove a favorite
+FAVORITE_IDS_TIMEOUT = 600
+
 # CRISPY FORMS SETTINGS
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
@@ -0,0 +1,175 @@
+# utils/email_dispatch.py
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+import logging
+logger = logging.getLogger(__name__)
+
+# Errors worth reconnecting and retrying for; anything else (bad address,
+# malformed message) fails the same way on every attempt
+RETRYABLE_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                    smtplib.SMTPHeloError, smtplib.SMTPDataError, OSError)
+
+
+class EmailDispatcher:
+    """
+    Sends email over one long-lived backend connection shared by the process.
+
+    - The connection is opened on first use and reused until it has been idle
+      for `idle_timeout` seconds (SMTP servers drop idle clients).
+    - Messages are written one at a time, so a failure part-way through a
+      batch never resends the messages already delivered.
+    - At most `rate_limit` messages per second are sent (0 disables).
+    - A failed message is retried on a fresh connection up to `max_retries`
+      times with exponential backoff.
+
+    The lock only covers writing to the connection: rate-limit waits and
+    retry backoff sleep outside it, so one slow batch does not hold up other
+    senders in the process.
+    """
+
+    def __init__(self, backend=None, rate_limit=0, max_retries=3, retry_backoff=1.0,
+                 idle_timeout=60, background_workers=2, **connection_kwargs):
+        self.backend = backend
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.background_workers = background_workers
+        self.connection_kwargs = connection_kwargs
+        self._connection = None
+        self._last_used = 0.0
+        self._next_send_at = 0.0
+        self._lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._executor = None
+
+    def _get_connection(self):
+        now = time.monotonic()
+        if self._connection is not None and now - self._last_used > self.idle_timeout:
+            self._close()
+        if self._connection is None:
+            self._connection = get_connection(self.backend, fail_silently=False, **self.connection_kwargs)
+            self._connection.open()
+        self._last_used = now
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def close(self):
+        """Close the pooled connection"""
+        with self._lock:
+            self._close()
+
+    def _throttle(self):
+        """Reserve the next send slot and wait for it, without holding the connection lock"""
+        if not self.rate_limit:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_send_at)
+            self._next_send_at = send_at + 1 / self.rate_limit
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def _send_one(self, message):
+        attempt = 0
+        while True:
+            self._throttle()
+            with self._lock:
+                try:
+                    return self._get_connection().send_messages([message]) or 0
+                except RETRYABLE_ERRORS as e:
+                    self._close()
+                    error = e
+            if attempt >= self.max_retries:
+                raise error
+            delay = self.retry_backoff * (2 ** attempt)
+            attempt += 1
+            logger.warning(f"Email send failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def send_messages(self, messages, fail_silently=False):
+        """
+        Send EmailMessage objects over the pooled connection. Returns the number
+        sent. Without fail_silently the first message that still fails after
+        its retries raises; the messages before it have been delivered.
+        """
+        sent = 0
+        for message in messages:
+            try:
+                sent += self._send_one(message)
+            except Exception as e:
+                logger.error(f"Failed to send email to {', '.join(message.recipients())}: {e}")
+                if not fail_silently:
+                    raise
+        return sent
+
+    def queue_messages(self, messages):
+        """
+        Send messages from a background thread once the current transaction
+        commits, so a request sending many emails does not wait on the rate
+        limit or SMTP. Failures are logged.
+        """
+        messages = list(messages)
+        if not messages:
+            return
+        if self._executor is None:
+            with self._rate_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.background_workers, thread_name_prefix="email-dispatch",
+                    )
+        transaction.on_commit(lambda: self._executor.submit(self.send_messages, messages, True))
+
+    def send_mass_mail(self, datatuple, fail_silently=False):
+        """Same contract as django.core.mail.send_mass_mail, over the pooled connection"""
+        from_default = settings.DEFAULT_FROM_EMAIL
+        messages = [
+            EmailMessage(subject, message, sender or from_default, recipients)
+            for subject, message, sender, recipients in datatuple
+        ]
+        return self.send_messages(messages, fail_silently=fail_silently)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Return the process-wide dispatcher configured by settings.EMAIL_DISPATCH"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = EmailDispatcher(**getattr(settings, 'EMAIL_DISPATCH', {}))
+    return _dispatcher
+
+
+def reset_dispatcher():
+    """Close and forget the process-wide dispatcher (e.g. after changing settings)"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.close()
+        _dispatcher = None
+
+
+def send_messages(messages, fail_silently=False):
+    """Send prepared EmailMessage objects through the shared dispatcher"""
+    return get_dispatcher().send_messages(messages, fail_silently=fail_silently)
+
+
+def queue_messages(messages):
+    """Send prepared EmailMessage objects from the shared dispatcher's background threads"""
+    get_dispatcher().queue_messages(messages)
@@ -0,0 +1,277 @@
+# analytics.py - WorkerAnalytics daily rollup and the queries behind the worker analytics page
+from datetime import date
+from decimal import Decimal
+from django.db.models import Avg, Count, DurationField, Exists, ExpressionWrapper, F, OuterRef, Q, Sum
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+from jobs.models import (
+    Appointment, DirtyWorkerDay, Worker, WorkerAnalytics, WorkerEarning, WorkerRating, WorkerService,
+)
+
+# Metrics written by rollup_worker_days(), in WorkerAnalytics column order
+ROLLUP_FIELDS = (
+    'total_appointments', 'accepted_appointments', 'completed_appointments',
+    'cancelled_appointments', 'total_earnings', 'average_rating', 'new_customers',
+    'repeat_customers', 'average_response_time',
+)
+
+
+def activity_day(prefix=''):
+    """
+    The day an appointment is counted on: its scheduled date, or the day it
+    was booked if it has none. `prefix` reaches the appointment through a
+    relation, e.g. 'appointment__'.
+    """
+    return TruncDate(Coalesce(f'{prefix}appointment_date', f'{prefix}created_at'))
+
+
+def appointment_day(appointment):
+    """
+    (worker_id, day) an appointment instance is counted on, matching
+    activity_day() in the current time zone. Fields that were not loaded
+    (e.g. under .only()) are not fetched; None is returned instead.
+    """
+    values = appointment.__dict__
+    if 'worker_id' not in values or 'appointment_date' not in values or 'created_at' not in values:
+        return None
+    moment = values['appointment_date'] or values['created_at']
+    if values['worker_id'] is None or moment is None:
+        return None
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment)
+    return values['worker_id'], moment.date()
+
+
+def mark_days_dirty(pairs):
+    """Queue (worker_id, day) pairs for the next rollup run to recount"""
+    DirtyWorkerDay.objects.bulk_create([DirtyWorkerDay(worker_id=worker_id, date=day) for worker_id, day in pairs])
+
+
+def changed_worker_days(since=None):
+    """
+    Return the set of (worker_id, day) pairs whose appointments, ratings or
+    earnings changed at or after `since`, plus the days appointments moved
+    away from or were deleted from (DirtyWorkerDay). With since=None every
+    day that has an appointment or an existing rollup row is returned, for a
+    full rebuild. Workers that no longer exist are left out.
+    """
+    if since is None:
+        # Ratings and earnings always hang off an appointment
+        pairs = set(
+            Appointment.objects.annotate(day=activity_day())
+            .order_by().values_list('worker_id', 'day').distinct()
+        )
+        pairs.update(WorkerAnalytics.objects.values_list('worker_id', 'date'))
+        return pairs
+
+    sources = (
+        (Appointment.objects, ''),
+        (WorkerRating.objects, 'appointment__'),
+        (WorkerEarning.objects, 'appointment__'),
+    )
+    pairs = set()
+    for manager, prefix in sources:
+        pairs.update(
+            manager.filter(updated_at__gte=since)
+            .annotate(day=activity_day(prefix))
+            .order_by().values_list(f'{prefix}worker_id', 'day').distinct()
+        )
+    pairs.update(
+        DirtyWorkerDay.objects.filter(created_at__gte=since, worker_id__in=Worker.objects.values('pk'))
+        .order_by().values_list('worker_id', 'date').distinct()
+    )
+    return pairs
+
+
+def compute_worker_days(worker_ids, days):
+    """
+    Recompute the rollup metrics for the given workers on the given days in
+    one grouped query. Returns {(worker_id, day): {metric: value}} for the
+    pairs that still have appointments.
+
+    A customer counts as new on the first day they booked this worker and as
+    repeat on every later day. Cancellations are appointments with status
+    'cancelled'; earnings are the posted ledger amounts (see jobs/earnings.py).
+    Accepted counts and response times (minutes from booking to accept or
+    reject) only cover appointments with transition timestamps.
+    """
+    response_time = ExpressionWrapper(
+        Coalesce('accepted_at', 'rejected_at') - F('created_at'), output_field=DurationField()
+    )
+    earlier_booking = (
+        Appointment.objects.filter(worker=OuterRef('worker'), customer=OuterRef('customer'))
+        .annotate(day=activity_day()).filter(day__lt=OuterRef('day'))
+    )
+    rows = (
+        Appointment.objects.filter(worker_id__in=worker_ids)
+        .annotate(day=activity_day(), returning=Exists(earlier_booking))
+        .filter(day__in=days)
+        .order_by().values('worker_id', 'day')
+        .annotate(
+            total_appointments=Count('id'),
+            accepted_appointments=Count('id', filter=Q(accepted_at__isnull=False)),
+            completed_appointments=Count('id', filter=Q(status='completed')),
+            cancelled_appointments=Count('id', filter=Q(status='cancelled')),
+            total_earnings=Sum('workerearning__amount', filter=Q(workerearning__posted_at__isnull=False)),
+            average_rating=Avg('workerrating__rating'),
+            new_customers=Count('customer', distinct=True, filter=Q(returning=False)),
+            repeat_customers=Count('customer', distinct=True, filter=Q(returning=True)),
+            average_response_time=Avg(response_time),
+        )
+    )
+    metrics = {}
+    for row in rows:
+        key = (row.pop('worker_id'), row.pop('day'))
+        row['total_earnings'] = row['total_earnings'] or Decimal('0.00')
+        row['average_rating'] = round(Decimal(str(row['average_rating'] or 0)), 2)
+        response = row['average_response_time']
+        row['average_response_time'] = int(response.total_seconds() // 60) if response else 0
+        metrics[key] = row
+    return metrics
+
+
+def rollup_worker_days(pairs, chunk_size=200):
+    """
+    Upsert a WorkerAnalytics row for every (worker_id, day) in `pairs`.
+    Pairs that no longer have appointments (a booking moved to another day or
+    was deleted) are written as zeros. Returns the number of rows written.
+    """
+    by_worker = {}
+    for worker_id, day in pairs:
+        by_worker.setdefault(worker_id, set()).add(day)
+
+    worker_ids = sorted(by_worker)
+    written = 0
+    for start in range(0, len(worker_ids), chunk_size):
+        chunk = worker_ids[start:start + chunk_size]
+        days = set().union(*(by_worker[worker_id] for worker_id in chunk))
+        metrics = compute_worker_days(chunk, days)
+
+        empty = dict.fromkeys(ROLLUP_FIELDS, 0)
+        rows = [
+            WorkerAnalytics(worker_id=worker_id, date=day, **metrics.get((worker_id, day), empty))
+            for worker_id in chunk
+            for day in sorted(by_worker[worker_id])
+        ]
+        WorkerAnalytics.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['worker', 'date'],
+            update_fields=[*ROLLUP_FIELDS, 'updated_at'],
+        )
+        written += len(rows)
+    return written
+
+
+def rollup_totals(worker):
+    """Lifetime appointment and customer totals for a worker, summed from the rollup"""
+    totals = WorkerAnalytics.objects.filter(worker=worker).aggregate(
+        total=Sum('total_appointments'),
+        accepted=Sum('accepted_appointments'),
+        completed=Sum('completed_appointments'),
+        cancelled=Sum('cancelled_appointments'),
+        earnings=Sum('total_earnings'),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def open_appointment_counts(worker):
+    """Live pending/accepted counts; these change too often to read from the rollup"""
+    counts = dict(
+        Appointment.objects.filter(worker=worker, status__in=['pending', 'accepted'])
+        .order_by().values_list('status').annotate(total=Count('id'))
+    )
+    return {'pending': counts.get('pending', 0), 'accepted': counts.get('accepted', 0)}
+
+
+# Migration that added accepted_at/rejected_at/completed_at; older rows were
+# never stamped
+TIMESTAMPS_MIGRATION = ('jobs', '0039_transition_timestamps_latency')
+_timestamps_since = None
+
+
+def timestamps_tracked_since():
+    """When appointments started recording transition timestamps (cached per process)"""
+    global _timestamps_since
+    if _timestamps_since is None:
+        app, name = TIMESTAMPS_MIGRATION
+        _timestamps_since = (
+            MigrationRecorder.Migration.objects.filter(app=app, name=name)
+            .values_list('applied', flat=True).first()
+        )
+    return _timestamps_since
+
+
+def conversion_funnel(worker):
+    """
+    Requested -> accepted -> completed counts for appointments booked since
+    transition timestamps were recorded, so every stage covers the same rows
+    (older appointments have no accepted_at). `since` is that cut-off.
+    """
+    since = timestamps_tracked_since() or timezone.now()
+    funnel = Appointment.objects.filter(worker=worker, created_at__gte=since).aggregate(
+        requested=Count('id'),
+        accepted=Count('id', filter=Q(accepted_at__isnull=False)),
+        completed=Count('id', filter=Q(completed_at__isnull=False)),
+    )
+    funnel['since'] = since
+    return funnel
+
+
+def _month_starts(months):
+    """First day of the current month and the `months - 1` before it, oldest first"""
+    today = timezone.localdate()
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return starts[::-1]
+
+
+def monthly_activity(worker, months=6):
+    """
+    Appointments, income from completed appointments and new/repeat customers
+    per calendar month for the last `months` months, summed from the daily
+    rollup. Months without activity are reported as zero.
+    """
+    month_starts = _month_starts(months)
+    rows = (
+        WorkerAnalytics.objects.filter(worker=worker, date__gte=month_starts[0])
+        .annotate(month=TruncMonth('date'))
+        .order_by().values('month')
+        .annotate(
+            appointments=Sum('total_appointments'),
+            income=Sum('total_earnings'),
+            new_customers=Sum('new_customers'),
+            repeat_customers=Sum('repeat_customers'),
+        )
+    )
+    by_month = {row['month']: row for row in rows}
+
+    activity = []
+    for start in month_starts:
+        row = by_month.get(start, {})
+        activity.append({
+            'month': start.strftime('%b %Y'),
+            'appointments': row.get('appointments', 0),
+            'income': row.get('income') or Decimal('0.00'),
+            'new_customers': row.get('new_customers', 0),
+            'repeat_customers': row.get('repeat_customers', 0),
+        })
+    return activity
+
+
+def service_popularity(worker):
+    """Appointment count per service the worker offers, in one grouped query"""
+    services = (
+        WorkerService.objects.filter(worker=worker)
+        .values('service__name')
+        .annotate(appointment_count=Count('pricing__appointment'))
+        .order_by('-appointment_count', 'service__name')
+    )
+    return [
+        {'service_name': service['service__name'], 'appointment_count': service['appointment_count']}
+        for service in services
+    ]
@@ -0,0 +1,150 @@
+# calendar_feed.py - Range-bounded worker calendar events with ETags and deltas
+import hashlib
+import re
+from datetime import datetime, time, timedelta
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from jobs.models import Appointment, AppointmentTombstone
+
+# Widest window one request may ask for; a month view with padding is ~6 weeks
+CALENDAR_MAX_RANGE_DAYS = 100
+# Used when a service has no parseable duration
+DEFAULT_EVENT_DURATION = timedelta(hours=2)
+# Oldest ?since= answered with a delta; deletions are remembered this long,
+# and older clients get the full window instead
+CALENDAR_DELTA_MAX_AGE = timedelta(days=7)
+
+# Columns read per event; values() keeps the feed free of model instances
+EVENT_FIELDS = (
+    'id', 'appointment_date', 'status', 'location', 'quantity', 'updated_at',
+    'customer__name', 'service_subtask__pricing_type',
+    'service_subtask__subtask__name', 'service_subtask__subtask__duration',
+)
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(min|minute|hr|hour|day)', re.IGNORECASE)
+_DURATION_UNITS = {'min': 'minutes', 'minute': 'minutes', 'hr': 'hours', 'hour': 'hours', 'day': 'days'}
+
+
+class CalendarRangeError(ValueError):
+    """Raised for a missing, malformed or too wide start/end range"""
+
+
+def parse_duration(text):
+    """Turn SubTask.duration text such as '2 hours' or '30 min' into a timedelta, or None"""
+    match = _DURATION_RE.search(text or '')
+    if not match:
+        return None
+    value, unit = float(match.group(1)), _DURATION_UNITS[match.group(2).lower()]
+    return timedelta(**{unit: value}) or None
+
+
+def event_duration(row):
+    """Length of an appointment: the service's duration, times the quantity for hourly pricing"""
+    duration = parse_duration(row['service_subtask__subtask__duration']) or DEFAULT_EVENT_DURATION
+    if row['service_subtask__pricing_type'] == 'hourly' and row['quantity'] and row['quantity'] > 1:
+        duration = max(duration, timedelta(hours=row['quantity']))
+    return duration
+
+
+def _parse_bound(value, label):
+    moment = parse_datetime(value) if value else None
+    if moment is None and value:
+        day = parse_date(value[:10])
+        if day is not None:
+            moment = datetime.combine(day, time.min)
+    if moment is None:
+        raise CalendarRangeError(f"'{label}' must be an ISO date or datetime")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_range(start, end):
+    """Validate the start/end query parameters FullCalendar sends"""
+    start_at, end_at = _parse_bound(start, 'start'), _parse_bound(end, 'end')
+    if end_at <= start_at:
+        raise CalendarRangeError("'end' must be after 'start'")
+    if end_at - start_at > timedelta(days=CALENDAR_MAX_RANGE_DAYS):
+        raise CalendarRangeError(f"Range may not exceed {CALENDAR_MAX_RANGE_DAYS} days")
+    return start_at, end_at
+
+
+def parse_since(since, now=None):
+    """
+    Parse ?since=. Returns None (meaning: send the full window) when it is
+    missing or older than CALENDAR_DELTA_MAX_AGE, since deletions before then
+    are no longer known.
+    """
+    if not since:
+        return None
+    since_at = _parse_bound(since, 'since')
+    if since_at < (now or timezone.now()) - CALENDAR_DELTA_MAX_AGE:
+        return None
+    return since_at
+
+
+def record_deletions(appointments):
+    """Keep the ids of deleted appointments for delta clients, pruning expired ones"""
+    AppointmentTombstone.objects.bulk_create([
+        AppointmentTombstone(appointment_id=appointment.pk, worker_id=appointment.worker_id)
+        for appointment in appointments
+    ])
+    AppointmentTombstone.objects.filter(
+        worker_id__in={appointment.worker_id for appointment in appointments},
+        deleted_at__lt=timezone.now() - CALENDAR_DELTA_MAX_AGE,
+    ).delete()
+
+
+def window_queryset(worker, start_at, end_at):
+    """A worker's appointments starting inside [start_at, end_at), via the (worker, appointment_date) index"""
+    return Appointment.objects.filter(worker=worker, appointment_date__gte=start_at, appointment_date__lt=end_at)
+
+
+def window_etag(worker, start_at, end_at):
+    """
+    Validator for a calendar window from one aggregate query: it changes when
+    an appointment in the window is added, removed or edited.
+    """
+    state = window_queryset(worker, start_at, end_at).aggregate(count=Count('id'), changed=Max('updated_at'))
+    key = f"{worker.pk}:{start_at.isoformat()}:{end_at.isoformat()}:{state['count']}:{state['changed']}"
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def serialize_event(row):
+    service_name = row['service_subtask__subtask__name'] or 'General Service'
+    start = row['appointment_date']
+    return {
+        'id': row['id'],
+        'title': f"{row['customer__name']} - {service_name}",
+        'start': start.isoformat(),
+        'end': (start + event_duration(row)).isoformat(),
+        'status': row['status'],
+        'customer_name': row['customer__name'],
+        'service_name': service_name,
+        'location': row['location'],
+    }
+
+
+def window_events(worker, start_at, end_at, since=None):
+    """
+    Events in the window, oldest first. With `since`, only appointments
+    changed at or after it are returned, plus the ids the client should drop:
+    changed appointments that no longer fall in the window and appointments
+    deleted since then.
+    """
+    events = window_queryset(worker, start_at, end_at)
+    removed = []
+    if since is not None:
+        events = events.filter(updated_at__gte=since)
+        removed = list(
+            Appointment.objects.filter(worker=worker, updated_at__gte=since)
+            .exclude(appointment_date__gte=start_at, appointment_date__lt=end_at)
+            .values_list('id', flat=True)
+        )
+        removed.extend(
+            AppointmentTombstone.objects.filter(worker_id=worker.pk, deleted_at__gte=since)
+            .values_list('appointment_id', flat=True)
+        )
+    rows = events.order_by('appointment_date').values(*EVENT_FIELDS)
+    return [serialize_event(row) for row in rows], removed
@@ -0,0 +1,23 @@
+from django.conf import settings
+from jobs.notifications import get_unread_count
+
+
+def unread_notifications(request):
+    """
+    Expose `unread_notification_count` to templates from the cached counter,
+    and whether pages may open the notification stream instead of polling it.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+
+    context = {'notification_stream_enabled': getattr(settings, 'NOTIFICATION_STREAM_ENABLED', False)}
+    worker = getattr(user, 'worker', None)
+    if worker is not None:
+        context['unread_notification_count'] = get_unread_count(worker=worker)
+        return context
+    customer = getattr(user, 'customer', None)
+    if customer is not None:
+        context['unread_notification_count'] = get_unread_count(customer=customer)
+        return context
+    return {}
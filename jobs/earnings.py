@@ -0,0 +1,117 @@
+# earnings.py - Worker earnings ledger with running balances and monthly totals
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from jobs.models import Worker, WorkerEarning, WorkerMonthlyEarning, subtask_total_price
+
+PLATFORM_FEE_RATE = Decimal('0.10')
+
+
+def earning_amount(appointment):
+    """
+    Gross amount owed for an appointment: its stored total, else the priced
+    total (Appointment.calculate_total_price). Migration 0038 keeps a frozen
+    copy of this for the ledger backfill.
+    """
+    amount = appointment.total_price
+    if not amount and appointment.service_subtask:
+        night_shift = appointment.is_night_shift or appointment.shift_type == 'night'
+        amount = subtask_total_price(appointment.service_subtask, appointment.quantity, night_shift)
+    return Decimal(str(amount or 0)).quantize(Decimal('0.01'))
+
+
+def month_start(moment):
+    """First day of the (local) month `moment` falls in"""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def latest_entry(worker):
+    """(ledger_sequence, running_balance) of the worker's last ledger entry, or (0, 0.00)"""
+    entry = (
+        WorkerEarning.objects.filter(worker=worker, ledger_sequence__isnull=False)
+        .order_by('-ledger_sequence').values_list('ledger_sequence', 'running_balance').first()
+    )
+    return entry or (0, Decimal('0.00'))
+
+
+def latest_balance(worker):
+    """The worker's running balance after their most recent ledger entry"""
+    return latest_entry(worker)[1]
+
+
+def _add_to_month(worker_id, month, gross, fees, net, entries):
+    updated = WorkerMonthlyEarning.objects.filter(worker_id=worker_id, month=month).update(
+        gross_amount=F('gross_amount') + gross,
+        platform_fees=F('platform_fees') + fees,
+        net_amount=F('net_amount') + net,
+        entries=F('entries') + entries,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        WorkerMonthlyEarning.objects.create(
+            worker_id=worker_id, month=month,
+            gross_amount=gross, platform_fees=fees, net_amount=net, entries=entries,
+        )
+
+
+def post_earnings(appointments):
+    """
+    Post a ledger entry for each completed appointment. Entries for one worker
+    are written under a lock on the worker row, so running balances stay
+    sequential; the worker's monthly total is bumped in the same transaction.
+    Appointments that are already posted or have no price are skipped.
+    Load appointments with service_subtask to avoid a query per entry.
+    """
+    by_worker = {}
+    for appointment in appointments:
+        by_worker.setdefault(appointment.worker_id, []).append(appointment)
+
+    posted = 0
+    for worker_id, worker_appointments in by_worker.items():
+        with transaction.atomic():
+            list(Worker.objects.select_for_update().filter(pk=worker_id).values_list('pk', flat=True))
+            existing = WorkerEarning.objects.in_bulk(
+                [appointment.pk for appointment in worker_appointments], field_name='appointment_id'
+            )
+
+            now = timezone.now()
+            sequence, balance = latest_entry(worker_id)
+            new_entries, reposted = [], []
+            gross_total = fees_total = net_total = Decimal('0.00')
+            for appointment in worker_appointments:
+                entry = existing.get(appointment.pk)
+                if entry is not None and entry.posted_at is not None:
+                    continue
+                amount = earning_amount(appointment)
+                if amount <= 0:
+                    continue
+
+                fee = (amount * PLATFORM_FEE_RATE).quantize(Decimal('0.01'))
+                balance += amount - fee
+                sequence += 1
+                if entry is None:
+                    entry = WorkerEarning(worker_id=worker_id, appointment=appointment)
+                    new_entries.append(entry)
+                else:
+                    # Unposted row left over from the old booking-time signal
+                    reposted.append(entry)
+                    entry.updated_at = now
+                entry.amount, entry.platform_fee, entry.net_amount = amount, fee, amount - fee
+                entry.posted_at, entry.running_balance, entry.ledger_sequence = now, balance, sequence
+
+                gross_total += amount
+                fees_total += fee
+                net_total += amount - fee
+
+            if not new_entries and not reposted:
+                continue
+            WorkerEarning.objects.bulk_create(new_entries)
+            WorkerEarning.objects.bulk_update(
+                reposted,
+                ['amount', 'platform_fee', 'net_amount', 'posted_at', 'running_balance', 'ledger_sequence', 'updated_at'],
+            )
+            _add_to_month(worker_id, month_start(now), gross_total, fees_total, net_total,
+                          len(new_entries) + len(reposted))
+            posted += len(new_entries) + len(reposted)
+    return posted
@@ -0,0 +1,164 @@
+# emails.py - Appointment emails rendered from templates in jobs/emails/
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+from config.utils.email_dispatch import queue_messages, send_messages
+import logging
+logger = logging.getLogger(__name__)
+
+# Related rows read while rendering an appointment email. Load appointments with
+# with_email_related() so a whole batch renders without per-email queries.
+APPOINTMENT_EMAIL_RELATED = ('customer__owner', 'worker__owner', 'service_subtask__subtask')
+
+
+def with_email_related(queryset):
+    """Join everything the appointment email templates read"""
+    return queryset.select_related(*APPOINTMENT_EMAIL_RELATED)
+
+
+def appointment_email_context(appointment, **extra):
+    """
+    Flatten an appointment into the plain values the email templates use, so
+    every related lookup happens exactly once per email.
+    """
+    service_subtask = appointment.service_subtask
+    context = {
+        'appointment_id': appointment.id,
+        'customer_name': appointment.customer.name,
+        'worker_name': appointment.worker.name,
+        'service_name': service_subtask.subtask.name if service_subtask else None,
+        'price_info': f"₹{service_subtask.price}" if service_subtask and service_subtask.price else "Contact for pricing",
+        'appointment_date': appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p'),
+        'location': appointment.location,
+        'special_instructions': appointment.special_instructions,
+        'site_url': settings.SITE_URL,
+    }
+    context.update(extra)
+    return context
+
+
+def _render_email(template_name, subject, context, recipients):
+    """
+    Build a multipart email from jobs/emails/<template_name>.txt and .html.
+    Templates come from the cached loader, so they are compiled once per process.
+    """
+    plain_message = get_template(f'jobs/emails/{template_name}.txt').render(context).strip()
+    html_message = get_template(f'jobs/emails/{template_name}.html').render(context)
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@bluecaller.com')
+    message = EmailMultiAlternatives(subject, plain_message, from_email, recipients)
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def build_appointment_request_email(worker, appointment):
+    """Build the email sent to a worker when a customer requests an appointment"""
+    context = appointment_email_context(appointment, worker_name=worker.name)
+    subject = f"New Appointment Request - {context['service_name'] or 'Service'}"
+    return _render_email('appointment_request', subject, context, [worker.owner.email])
+
+
+def build_appointment_status_email(appointment, status):
+    """Build the email sent to a customer when an appointment is accepted or rejected"""
+    accepted = status == 'accepted'
+    context = appointment_email_context(
+        appointment,
+        accepted=accepted,
+        status_message="Your appointment has been confirmed!" if accepted else "Your appointment request was declined",
+    )
+    if accepted:
+        subject = f"Appointment Confirmed - {context['worker_name']}"
+    else:  # rejected
+        subject = f"Appointment Update - {context['worker_name']}"
+    return _render_email('appointment_status', subject, context, [appointment.customer.owner.email])
+
+
+def build_appointment_completion_email(appointment):
+    """Build the email sent to a customer when an appointment is completed"""
+    context = appointment_email_context(appointment)
+    subject = "Appointment Completed - Please Rate Your Experience"
+    return _render_email('appointment_completion', subject, context, [appointment.customer.owner.email])
+
+
+def worker_email_mode(worker):
+    """
+    How a worker wants appointment emails: 'instant', 'digest' or 'off'.
+    Workers without a WorkerSettings row get instant emails.
+    """
+    try:
+        worker_settings = worker.settings
+    except ObjectDoesNotExist:
+        return 'instant'
+    if not worker_settings.email_notifications:
+        return 'off'
+    return worker_settings.email_frequency
+
+
+def build_notification_digest_email(worker, notifications, total=None):
+    """
+    Build one summary email for a worker's pending notifications. At most
+    NOTIFICATION_DIGEST_MAX_ITEMS are listed; `total` is the full pending count.
+    """
+    total = total if total is not None else len(notifications)
+    max_items = getattr(settings, 'NOTIFICATION_DIGEST_MAX_ITEMS', 20)
+    context = {
+        'worker_name': worker.name,
+        'notifications': notifications[:max_items],
+        'total': total,
+        'remaining': max(total - max_items, 0),
+        'site_url': settings.SITE_URL,
+    }
+    subject = f"You have {total} new notification{'s' if total != 1 else ''} on BlueCaller"
+    return _render_email('notification_digest', subject, context, [worker.owner.email])
+
+
+def send_appointment_request_email(worker, appointment):
+    """Send email notification to worker when customer requests an appointment"""
+    email_mode = worker_email_mode(worker)
+    if email_mode != 'instant':
+        # Digest workers get this request in their next summary email
+        logger.info(f"Appointment request email for worker {worker.name} held back (mode: {email_mode})")
+        return
+    try:
+        send_messages([build_appointment_request_email(worker, appointment)])
+        logger.info(f"Appointment request email sent to worker {worker.name} ({worker.owner.email})")
+
+    except Exception as e:
+        logger.error(f"Failed to send appointment request email to worker {worker.name}: {str(e)}")
+        # Don't raise the exception to prevent appointment creation from failing
+        pass
+
+
+def send_appointment_status_email(appointment, status):
+    """Send email notification to customer when appointment status changes"""
+    customer = appointment.customer
+    try:
+        send_messages([build_appointment_status_email(appointment, status)])
+        logger.info(f"Appointment status email ({status}) sent to customer {customer.name} ({customer.owner.email})")
+
+    except Exception as e:
+        logger.error(f"Failed to send appointment status email to customer {customer.name}: {str(e)}")
+        # Don't raise the exception to prevent the main action from failing
+        pass
+
+
+def send_appointment_completion_email(appointment):
+    """Send email notification when appointment is completed"""
+    customer = appointment.customer
+    try:
+        send_messages([build_appointment_completion_email(appointment)])
+        logger.info(f"Appointment completion email sent to customer {customer.name} ({customer.owner.email})")
+
+    except Exception as e:
+        logger.error(f"Failed to send appointment completion email to customer {customer.name}: {str(e)}")
+        raise
+
+
+def send_email_batch(email_messages):
+    """
+    Queue a batch of prepared emails for the background sender, so the request
+    does not wait on the rate limit or SMTP. Returns the number queued.
+    """
+    queue_messages(email_messages)
+    logger.info(f"Queued {len(email_messages)} batched emails")
+    return len(email_messages)
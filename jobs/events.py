@@ -0,0 +1,177 @@
+# events.py - Push channel for notifications and appointment status changes
+import asyncio
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+import logging
+logger = logging.getLogger(__name__)
+
+
+def channel_for(worker_id=None, customer_id=None):
+    """Name of the event channel a worker or customer listens on"""
+    if worker_id is not None:
+        return f'worker:{worker_id}'
+    return f'customer:{customer_id}'
+
+
+class InProcessBroker:
+    """
+    Delivers events to subscribers living in this process. Suitable for a
+    single ASGI server process; publishers may run in any thread.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, event)
+
+    @staticmethod
+    def _deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client only loses its oldest events
+            queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def subscribe(self, channel, heartbeat=15, last_event_id=None):
+        """Yield events for `channel`, or None every `heartbeat` seconds of silence"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(channel, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(channel, None)
+
+
+class CacheBroker:
+    """
+    Multi-process stand-in broker built on the Django cache. Each channel is a
+    short log of numbered events; subscribers poll for numbers they have not
+    seen yet. Point CACHES at a shared backend (file-based locally, Redis or
+    Memcached in production) so every process sees the same log.
+    """
+
+    def __init__(self, poll_interval=1.0, ttl=300, backlog=100):
+        self.poll_interval = poll_interval
+        self.ttl = ttl
+        # Most events replayed to a reconnecting client
+        self.backlog = backlog
+
+    def _seq_key(self, channel):
+        return f'events:{channel}:seq'
+
+    def _event_key(self, channel, seq):
+        return f'events:{channel}:{seq}'
+
+    def publish(self, channel, event):
+        seq_key = self._seq_key(channel)
+        cache.add(seq_key, 0, None)
+        seq = cache.incr(seq_key)
+        cache.set(self._event_key(channel, seq), dict(event, id=seq), self.ttl)
+
+    async def subscribe(self, channel, heartbeat=15, last_event_id=None):
+        """Yield events for `channel`, or None every `heartbeat` seconds of silence"""
+        seq_key = self._seq_key(channel)
+        current = await cache.aget(seq_key, 0)
+        try:
+            last_seen = int(last_event_id)
+        except (TypeError, ValueError):
+            last_seen = current
+        # Last-Event-ID comes from the client: replay at most `backlog` events
+        # and never wait for numbers that have not been issued
+        last_seen = min(max(last_seen, current - self.backlog), current)
+
+        idle = 0.0
+        while True:
+            current = await cache.aget(seq_key, 0)
+            if current > last_seen:
+                keys = [self._event_key(channel, seq) for seq in range(last_seen + 1, current + 1)]
+                found = await cache.aget_many(keys)
+                for key in keys:
+                    if key in found:
+                        yield found[key]
+                last_seen = current
+                idle = 0.0
+                continue
+
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if idle >= heartbeat:
+                idle = 0.0
+                yield None
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the broker configured by settings.NOTIFICATION_BROKER"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'NOTIFICATION_BROKER', 'jobs.events.InProcessBroker')
+                _broker = import_string(broker_path)(**getattr(settings, 'NOTIFICATION_BROKER_OPTIONS', {}))
+    return _broker
+
+
+def publish(channel, event):
+    """Publish an event once the current transaction commits"""
+    def _publish():
+        try:
+            get_broker().publish(channel, event)
+        except Exception as e:
+            logger.error(f"Failed to publish {event.get('type')} event on {channel}: {e}")
+    transaction.on_commit(_publish)
+
+
+def publish_notifications(notifications):
+    """Push newly created Notification rows to their recipients"""
+    for notification in notifications:
+        if not (notification.worker_id or notification.customer_id):
+            continue
+        publish(channel_for(notification.worker_id, notification.customer_id), {
+            'type': 'notification',
+            'notification': {
+                'id': notification.id,
+                'type': notification.notification_type,
+                'title': notification.title,
+                'message': notification.message,
+                'appointment_id': notification.appointment_id,
+                'created_at': notification.created_at.isoformat() if notification.created_at else None,
+            },
+        })
+
+
+
+def publish_status_changes(appointments):
+    """Push appointment status changes to both the worker and the customer"""
+    for appointment in appointments:
+        event = {
+            'type': 'appointment_status',
+            'appointment_id': appointment.id,
+            'status': appointment.status,
+            'customer_completed': appointment.customer_completed,
+            'worker_completed': appointment.worker_completed,
+        }
+        publish(channel_for(worker_id=appointment.worker_id), event)
+        publish(channel_for(customer_id=appointment.customer_id), event)
@@ -0,0 +1,157 @@
+# exports.py - Streaming CSV/JSONL exports of earnings, appointments and ratings
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from jobs.models import Appointment, WorkerEarning, WorkerRating
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Rows fetched per database round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+# Each dataset: the rows it covers, the datetime column the date range
+# filters on, and (header, field) pairs read with values_list(), so rows are
+# streamed as tuples without building model instances.
+EXPORTS = {
+    'earnings': {
+        'queryset': lambda: WorkerEarning.objects.filter(posted_at__isnull=False),
+        'date_field': 'posted_at',
+        'columns': [
+            ('id', 'id'),
+            ('posted_at', 'posted_at'),
+            ('appointment_id', 'appointment_id'),
+            ('worker_id', 'worker_id'),
+            ('worker', 'worker__name'),
+            ('customer', 'appointment__customer__name'),
+            ('amount', 'amount'),
+            ('platform_fee', 'platform_fee'),
+            ('net_amount', 'net_amount'),
+            ('running_balance', 'running_balance'),
+            ('payment_status', 'payment_status'),
+            ('payment_date', 'payment_date'),
+            ('transaction_id', 'transaction_id'),
+        ],
+    },
+    'appointments': {
+        'queryset': lambda: Appointment.objects.all(),
+        'date_field': 'appointment_date',
+        'columns': [
+            ('id', 'id'),
+            ('appointment_date', 'appointment_date'),
+            ('status', 'status'),
+            ('worker_id', 'worker_id'),
+            ('worker', 'worker__name'),
+            ('customer_id', 'customer_id'),
+            ('customer', 'customer__name'),
+            ('service', 'service_subtask__subtask__name'),
+            ('shift_type', 'shift_type'),
+            ('quantity', 'quantity'),
+            ('total_price', 'total_price'),
+            ('location', 'location'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+    },
+    'ratings': {
+        'queryset': lambda: WorkerRating.objects.all(),
+        'date_field': 'created_at',
+        'columns': [
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('appointment_id', 'appointment_id'),
+            ('worker_id', 'worker_id'),
+            ('worker', 'worker__name'),
+            ('customer', 'customer__name'),
+            ('rating', 'rating'),
+            ('comment', 'comment'),
+        ],
+    },
+}
+
+
+class ExportError(ValueError):
+    """Raised for an unknown dataset/format or a malformed date range"""
+
+
+def parse_date_range(start, end):
+    """
+    Turn optional YYYY-MM-DD bounds into aware datetimes [start, end + 1 day),
+    so the range is inclusive of both dates and can use the column's index.
+    """
+    bounds = []
+    for label, value, offset in (('start', start, 0), ('end', end, 1)):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date() + timedelta(days=offset)
+        except ValueError:
+            raise ExportError(f"Invalid {label} date '{value}', expected YYYY-MM-DD")
+        bounds.append(timezone.make_aware(datetime.combine(day, time.min)))
+    if bounds[0] and bounds[1] and bounds[0] >= bounds[1]:
+        raise ExportError("start date must not be after end date")
+    return bounds
+
+
+def export_rows(dataset, start=None, end=None, worker=None):
+    """
+    Return (headers, row iterator) for a dataset. Rows are read through a
+    chunked iterator in date order, so memory stays flat however many rows
+    match. Pass `worker` to restrict the export to one worker's rows.
+    """
+    try:
+        export = EXPORTS[dataset]
+    except KeyError:
+        raise ExportError(f"Unknown export '{dataset}'")
+
+    date_field = export['date_field']
+    queryset = export['queryset']()
+    if worker is not None:
+        queryset = queryset.filter(worker=worker)
+    start_at, end_at = parse_date_range(start, end)
+    if start_at:
+        queryset = queryset.filter(**{f'{date_field}__gte': start_at})
+    if end_at:
+        queryset = queryset.filter(**{f'{date_field}__lt': end_at})
+
+    headers = [header for header, _ in export['columns']]
+    rows = (
+        queryset.order_by(date_field, 'id')
+        .values_list(*[field for _, field in export['columns']])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return headers, rows
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        # ISO timestamps, matching the JSONL export
+        yield writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+
+
+def stream_jsonl(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(export_format, headers, rows):
+    """Encode rows lazily as CSV or JSON Lines"""
+    if export_format == 'csv':
+        return stream_csv(headers, rows)
+    if export_format == 'jsonl':
+        return stream_jsonl(headers, rows)
+    raise ExportError(f"Unknown export format '{export_format}'")
@@ -0,0 +1,71 @@
+# favorites.py - Bulk loading of a customer's favorite workers for listing pages
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from jobs.models import FavoriteWorker, Worker
+
+
+def _favorite_ids_timeout():
+    return getattr(settings, 'FAVORITE_IDS_TIMEOUT', 600)
+
+
+def favorite_ids_key(customer_id):
+    """Cache key holding the ids of the workers one customer has favorited"""
+    return f'favorites:ids:customer:{customer_id}'
+
+
+def get_favorite_ids(customer):
+    """
+    Return the set of worker ids `customer` has favorited. Served from cache;
+    on a miss the ids are read in one query and cached.
+    """
+    key = favorite_ids_key(customer.pk)
+    worker_ids = cache.get(key)
+    if worker_ids is None:
+        worker_ids = set(FavoriteWorker.objects.filter(customer=customer).values_list('worker_id', flat=True))
+        cache.add(key, worker_ids, _favorite_ids_timeout())
+    return worker_ids
+
+
+def invalidate_favorite_ids(customer_id):
+    """Drop the cached favorite ids once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(favorite_ids_key(customer_id)))
+
+
+def star_display(rating):
+    """Full/half/empty star counts for a 0-5 rating, as the rating templates expect"""
+    full_stars = int(rating)
+    half_star = 1 if rating % 1 >= 0.5 else 0
+    return range(full_stars), half_star, range(5 - (full_stars + half_star))
+
+
+def load_favorite_cards(favorites, latitude=None, longitude=None):
+    """
+    Build the favorites page rows for `favorites` (FavoriteWorker rows, usually
+    one page). Workers are loaded with their rating stats in one query instead
+    of one rating lookup per card; distances from (latitude, longitude) are
+    computed in the same pass and are None when either side has no location.
+    """
+    favorites = list(favorites)
+    workers = Worker.objects.with_rating_stats().in_bulk([favorite.worker_id for favorite in favorites])
+
+    cards = []
+    for favorite in favorites:
+        worker = workers[favorite.worker_id]
+        distance_km = None
+        if latitude is not None and longitude is not None:
+            distance_km = worker.calculate_distance(latitude, longitude)
+            if distance_km is not None:
+                distance_km = round(distance_km, 2)
+
+        worker.average_rating = round(worker.bayesian_rating, 2)
+        worker.total_ratings = worker.rating_total
+        worker.full_stars, worker.half_star, worker.empty_stars = star_display(worker.average_rating)
+        worker.distance_km = distance_km
+
+        cards.append({
+            'worker': worker,
+            'favorited_at': favorite.created_at,
+            'distance_km': distance_km,
+        })
+    return cards
@@ -0,0 +1,194 @@
+# ics_feed.py - Per-worker iCalendar subscription feed, cached until the worker's appointments change
+import secrets
+import uuid
+from datetime import timedelta, timezone as dt_timezone
+from urllib.parse import urlparse
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from jobs.calendar_feed import EVENT_FIELDS, event_duration
+from jobs.models import Appointment, WorkerSettings
+
+# Window of appointments published in the feed, relative to now
+ICS_PAST_DAYS = 90
+ICS_FUTURE_DAYS = 365
+
+# Feeds and rendered events are invalidated explicitly, so the timeout only
+# bounds how long unused entries linger
+ICS_CACHE_TIMEOUT = 60 * 60 * 24
+
+ICS_STATUS = {
+    'pending': 'TENTATIVE',
+    'accepted': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'rejected': 'CANCELLED',
+    'cancelled': 'CANCELLED',
+}
+
+
+def _version_key(worker_id):
+    return f"calendar:ics:version:{worker_id}"
+
+
+def _token_key(token):
+    return f"calendar:ics:token:{token}"
+
+
+def _feed_key(worker_id, version):
+    return f"calendar:ics:feed:{worker_id}:{version}"
+
+
+def _event_key(row):
+    return f"calendar:ics:event:{row['id']}:{row['updated_at'].timestamp()}"
+
+
+def feed_version(worker_id):
+    """Current cache version of a worker's feed; a fresh one is issued if it was evicted"""
+    version = cache.get(_version_key(worker_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(worker_id), version, None):
+            version = cache.get(_version_key(worker_id), version)
+    return version
+
+
+def invalidate_calendar_feeds(worker_ids):
+    """
+    Point each worker's feed at a new cache version once the current
+    transaction commits, so the next poll rebuilds it from committed rows.
+    """
+    worker_ids = set(worker_ids)
+
+    def bump():
+        cache.set_many({_version_key(worker_id): uuid.uuid4().hex for worker_id in worker_ids}, None)
+
+    transaction.on_commit(bump)
+
+
+def get_or_create_token(worker):
+    """The worker's feed token, generated on first use"""
+    worker_settings, _ = WorkerSettings.objects.get_or_create(worker=worker)
+    if not worker_settings.calendar_token:
+        return rotate_token(worker)
+    return worker_settings.calendar_token
+
+
+def rotate_token(worker):
+    """Issue a new feed token; the old subscription URL stops working immediately"""
+    worker_settings, _ = WorkerSettings.objects.get_or_create(worker=worker)
+    if worker_settings.calendar_token:
+        cache.delete(_token_key(worker_settings.calendar_token))
+    worker_settings.calendar_token = secrets.token_urlsafe(32)
+    worker_settings.save(update_fields=['calendar_token', 'updated_at'])
+    return worker_settings.calendar_token
+
+
+def worker_id_for_token(token):
+    """Resolve a feed token to a worker id, caching the lookup; None if unknown"""
+    worker_id = cache.get(_token_key(token))
+    if worker_id is None:
+        worker_id = (
+            WorkerSettings.objects.filter(calendar_token=token)
+            .values_list('worker_id', flat=True).first()
+        )
+        if worker_id is not None:
+            cache.set(_token_key(token), worker_id, ICS_CACHE_TIMEOUT)
+    return worker_id
+
+
+def _escape(text):
+    return (
+        str(text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], b''
+    for char in line:
+        char_bytes = char.encode()
+        if len(current) + len(char_bytes) > (75 if not parts else 74):
+            parts.append(current.decode())
+            current = b''
+        current += char_bytes
+    parts.append(current.decode())
+    return '\r\n '.join(parts)
+
+
+def _utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(row, domain):
+    """One VEVENT block for an appointment row read with EVENT_FIELDS"""
+    start = row['appointment_date']
+    service_name = row['service_subtask__subtask__name'] or 'General Service'
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:appointment-{row['id']}@{domain}",
+        f"DTSTAMP:{_utc(row['updated_at'])}",
+        f"LAST-MODIFIED:{_utc(row['updated_at'])}",
+        f"DTSTART:{_utc(start)}",
+        f"DTEND:{_utc(start + event_duration(row))}",
+        f"SUMMARY:{_escape(row['customer__name'])} - {_escape(service_name)}",
+        f"LOCATION:{_escape(row['location'])}",
+        f"DESCRIPTION:{_escape('Status: ' + row['status'].title())}",
+        f"STATUS:{ICS_STATUS.get(row['status'], 'TENTATIVE')}",
+        'END:VEVENT',
+    ]
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def build_feed(worker_id):
+    """
+    Render the feed for a worker. Each VEVENT is cached under the
+    appointment's id and updated_at, so after a change only that
+    appointment is rendered again.
+    """
+    now = timezone.now()
+    rows = list(
+        Appointment.objects.filter(
+            worker_id=worker_id,
+            appointment_date__gte=now - timedelta(days=ICS_PAST_DAYS),
+            appointment_date__lt=now + timedelta(days=ICS_FUTURE_DAYS),
+        ).order_by('appointment_date').values(*EVENT_FIELDS)
+    )
+    domain = urlparse(settings.SITE_URL).hostname or 'localhost'
+
+    cached = cache.get_many([_event_key(row) for row in rows])
+    rendered = {}
+    events = []
+    for row in rows:
+        key = _event_key(row)
+        if key not in cached:
+            cached[key] = rendered[key] = render_event(row, domain)
+        events.append(cached[key])
+    if rendered:
+        cache.set_many(rendered, ICS_CACHE_TIMEOUT)
+
+    header = '\r\n'.join([
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//BlueCaller//Worker Calendar//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:BlueCaller Appointments',
+        'X-PUBLISHED-TTL:PT15M',
+    ]) + '\r\n'
+    return header + ''.join(events) + 'END:VCALENDAR\r\n'
+
+
+def get_feed(worker_id):
+    """The worker's feed, from cache when nothing has changed since it was built"""
+    version = feed_version(worker_id)
+    key = _feed_key(worker_id, version)
+    feed = cache.get(key)
+    if feed is None:
+        feed = build_feed(worker_id)
+        cache.set(key, feed, ICS_CACHE_TIMEOUT)
+    return feed, version
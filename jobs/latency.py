@@ -0,0 +1,96 @@
+# latency.py - Per-worker response/completion latency histograms and percentiles
+from bisect import bisect_left
+from django.db import transaction
+from jobs.models import WorkerLatencyHistogram
+
+# Upper bound (inclusive, minutes) of each histogram bucket; the last bucket
+# takes everything slower. Finer at the low end where response times cluster.
+BUCKET_BOUNDS_MINUTES = (
+    1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 360, 480, 720,
+    1440, 2880, 4320, 7200, 10080,
+)
+BUCKET_COUNT = len(BUCKET_BOUNDS_MINUTES) + 1
+
+# Latency finished by each transition: action -> (metric, start field, end field)
+TRANSITION_METRICS = {
+    'accept': ('response', 'created_at', 'accepted_at'),
+    'reject': ('response', 'created_at', 'rejected_at'),
+    'complete': ('completion', 'accepted_at', 'completed_at'),
+    'worker_complete': ('completion', 'accepted_at', 'completed_at'),
+}
+
+
+def bucket_for(minutes):
+    """Index of the bucket a latency of `minutes` falls in"""
+    return bisect_left(BUCKET_BOUNDS_MINUTES, minutes)
+
+
+def record_latencies(appointments, action):
+    """
+    Add the latency each appointment just completed by `action` to its
+    worker's histogram. Rows are locked and updated once per worker, so call
+    this inside the transition's transaction to count every sample once.
+    """
+    if action not in TRANSITION_METRICS:
+        return
+    metric, start_field, end_field = TRANSITION_METRICS[action]
+
+    samples = {}
+    for appointment in appointments:
+        start, end = getattr(appointment, start_field), getattr(appointment, end_field)
+        if start is None or end is None:
+            continue
+        minutes = max(int((end - start).total_seconds() // 60), 0)
+        samples.setdefault(appointment.worker_id, []).append(minutes)
+
+    with transaction.atomic():
+        for worker_id, minutes_list in samples.items():
+            histogram, _ = WorkerLatencyHistogram.objects.select_for_update().get_or_create(
+                worker_id=worker_id, metric=metric,
+            )
+            counts = histogram.counts or [0] * BUCKET_COUNT
+            counts += [0] * (BUCKET_COUNT - len(counts))
+            for minutes in minutes_list:
+                counts[bucket_for(minutes)] += 1
+            histogram.counts = counts
+            histogram.total += len(minutes_list)
+            histogram.total_minutes += sum(minutes_list)
+            histogram.save(update_fields=['counts', 'total', 'total_minutes', 'updated_at'])
+
+
+def histogram_percentile(counts, total, percentile):
+    """
+    Estimate a percentile (0-100) in minutes from bucket counts, interpolating
+    linearly inside the bucket it falls in. The open-ended last bucket
+    reports its lower bound.
+    """
+    if not total:
+        return None
+    rank = percentile / 100 * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = BUCKET_BOUNDS_MINUTES[index - 1] if index else 0
+            if index >= len(BUCKET_BOUNDS_MINUTES):
+                return lower
+            upper = BUCKET_BOUNDS_MINUTES[index]
+            return round(lower + (upper - lower) * (rank - seen) / count)
+        seen += count
+    return BUCKET_BOUNDS_MINUTES[-1]
+
+
+def latency_summary(worker, percentiles=(50, 90)):
+    """
+    {metric: {'count', 'average', 'p50', 'p90', ...}} for a worker from the
+    stored histograms, one small query regardless of history.
+    """
+    summary = {}
+    for histogram in WorkerLatencyHistogram.objects.filter(worker=worker):
+        stats = {
+            'count': histogram.total,
+            'average': round(histogram.total_minutes / histogram.total) if histogram.total else None,
+        }
+        for percentile in percentiles:
+            stats[f'p{percentile}'] = histogram_percentile(histogram.counts, histogram.total, percentile)
+        summary[histogram.metric] = stats
+    return summary
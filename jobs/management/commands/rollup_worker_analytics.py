@@ -0,0 +1,37 @@
+# rollup_worker_analytics.py - Incrementally refresh the WorkerAnalytics daily rollup
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from jobs.analytics import changed_worker_days, rollup_worker_days
+from jobs.models import DirtyWorkerDay, RollupCheckpoint
+
+CHECKPOINT_NAME = 'worker_analytics'
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert WorkerAnalytics rows for every worker/day whose appointments, "
+        "ratings or earnings changed since the previous run. The first run (or "
+        "--full) rebuilds every day. Run it periodically (e.g. every 15 minutes "
+        "from cron); the analytics page is only as fresh as the last run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Ignore the checkpoint and rebuild every day")
+        parser.add_argument('--chunk-size', type=int, default=200, help="Workers recomputed per query/upsert")
+
+    def handle(self, *args, **options):
+        # Take the new high-water mark before reading, so rows changed while
+        # this run is in progress are picked up again next time
+        started_at = timezone.now()
+        checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+        since = None if options['full'] or checkpoint is None else checkpoint.last_run_at
+
+        pairs = changed_worker_days(since)
+        written = rollup_worker_days(pairs, chunk_size=options['chunk_size'])
+
+        RollupCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'last_run_at': started_at})
+        # Dirty days older than the previous checkpoint were recounted by an
+        # earlier run (or by this one, when rebuilding everything)
+        DirtyWorkerDay.objects.filter(created_at__lt=started_at if since is None else since).delete()
+        scope = "all days" if since is None else f"changes since {since:%Y-%m-%d %H:%M}"
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} WorkerAnalytics rows ({scope})"))
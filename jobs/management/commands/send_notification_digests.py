@@ -0,0 +1,79 @@
+# send_notification_digests.py - Email each digest-mode worker one summary of pending notifications
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from config.utils.email_dispatch import send_messages
+from jobs.emails import build_notification_digest_email
+from jobs.models import Notification, Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Send one summary email per worker in digest mode covering their unread, "
+        "not yet emailed notifications. Run it periodically (e.g. hourly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookback-hours', type=int,
+            default=getattr(settings, 'NOTIFICATION_DIGEST_LOOKBACK_HOURS', 24),
+            help="Ignore notifications older than this (default: NOTIFICATION_DIGEST_LOOKBACK_HOURS)",
+        )
+        parser.add_argument('--chunk-size', type=int, default=200, help="Workers handled per query/send batch")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be sent without sending")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['lookback_hours'])
+        chunk_size = options['chunk_size']
+
+        worker_ids = list(
+            Worker.objects.filter(
+                settings__email_notifications=True,
+                settings__email_frequency='digest',
+                notifications__is_read=False,
+                notifications__emailed_at__isnull=True,
+                notifications__created_at__gte=since,
+            ).exclude(owner__email='').values_list('id', flat=True).distinct().order_by('id')
+        )
+
+        emails_sent = notifications_covered = 0
+        for start in range(0, len(worker_ids), chunk_size):
+            chunk = worker_ids[start:start + chunk_size]
+            workers = Worker.objects.select_related('owner').in_bulk(chunk)
+            pending = (
+                Notification.objects
+                .filter(worker_id__in=chunk, is_read=False, emailed_at__isnull=True, created_at__gte=since)
+                .only('id', 'worker_id', 'title', 'message', 'created_at')
+                .order_by('worker_id', '-created_at')
+            )
+
+            digests = []
+            for worker_id, notifications in groupby(pending, key=lambda notification: notification.worker_id):
+                notifications = list(notifications)
+                digests.append((build_notification_digest_email(workers[worker_id], notifications), notifications))
+
+            if options['dry_run']:
+                covered = sum(len(notifications) for _, notifications in digests)
+                self.stdout.write(f"Would send {len(digests)} digests covering {covered} notifications")
+                continue
+
+            # One send per worker, stamped as soon as it is delivered: a failure
+            # leaves only that worker's notifications for the next run
+            for message, notifications in digests:
+                try:
+                    sent = send_messages([message])
+                except Exception as e:
+                    self.stderr.write(f"Failed to send digest to worker {notifications[0].worker_id}: {e}")
+                    continue
+
+                Notification.objects.filter(
+                    id__in=[notification.id for notification in notifications]
+                ).update(emailed_at=timezone.now())
+                emails_sent += sent
+                notifications_covered += len(notifications)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {emails_sent} digest emails covering {notifications_covered} notifications"
+        ))
@@ -0,0 +1,15 @@
+from jobs.notifications import collect_notifications
+
+
+class NotificationBatchMiddleware:
+    """
+    Collect every notification created while handling a request and write
+    them with a single bulk_create once the view has finished.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_notifications():
+            return self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0033_alter_appointment_options_appointment_is_night_shift_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['worker', 'is_read', 'created_at'], name='jobs_notifi_worker__23e1c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['customer', 'is_read', 'created_at'], name='jobs_notifi_custome_4f25b0_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0034_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workersettings',
+            name='email_frequency',
+            field=models.CharField(choices=[('instant', 'Instant'), ('digest', 'Periodic digest')], default='instant', max_length=10),
+        ),
+    ]
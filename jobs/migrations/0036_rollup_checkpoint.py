@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0035_notification_email_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_run_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
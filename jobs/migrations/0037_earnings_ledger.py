@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0036_rollup_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerMonthlyEarning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddField(
+            model_name='workerearning',
+            name='posted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workerearning',
+            name='running_balance',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='workerearning',
+            index=models.Index(fields=['worker', 'posted_at'], name='jobs_worker_worker__a48131_idx'),
+        ),
+        migrations.AddField(
+            model_name='workermonthlyearning',
+            name='worker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_earnings', to='jobs.worker'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='workermonthlyearning',
+            unique_together={('worker', 'month')},
+        ),
+    ]
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+# Frozen copies of jobs.earnings.PLATFORM_FEE_RATE and the pricing in
+# jobs.models.subtask_total_price as of this migration, so the backfill does
+# not change when the live code does
+PLATFORM_FEE_RATE = Decimal('0.10')
+
+
+def earning_amount(appointment):
+    """Stored total of a historical appointment, else its subtask pricing"""
+    amount = appointment.total_price
+    pricing = appointment.service_subtask
+    if not amount and pricing:
+        amount = Decimal(str(pricing.price)) if pricing.price else Decimal('0.00')
+        if (appointment.is_night_shift or appointment.shift_type == 'night') and pricing.night_shift_extra:
+            amount += Decimal(str(pricing.night_shift_extra))
+        try:
+            quantity = Decimal(str(appointment.quantity))
+        except (ValueError, TypeError):
+            quantity = Decimal('1.00')
+        if pricing.pricing_type in ('sqft', 'unit'):
+            amount *= quantity
+        elif pricing.pricing_type == 'hourly':
+            amount *= max(Decimal(str(pricing.min_hours)), quantity)
+    return Decimal(str(amount or 0)).quantize(Decimal('0.01'))
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Post every completed appointment to the earnings ledger in date order,
+    reusing the WorkerEarning row created at booking time where there is one,
+    and build the monthly totals from the same pass.
+    """
+    Appointment = apps.get_model('jobs', 'Appointment')
+    WorkerEarning = apps.get_model('jobs', 'WorkerEarning')
+    WorkerMonthlyEarning = apps.get_model('jobs', 'WorkerMonthlyEarning')
+
+    # Ledger order is posting time, and new entries are posted at "now", so
+    # historical entries are never dated later than this migration
+    now = timezone.now()
+    worker_ids = (
+        Appointment.objects.filter(status='completed')
+        .order_by('worker_id').values_list('worker_id', flat=True).distinct()
+    )
+    for worker_id in worker_ids:
+        appointments = sorted(
+            Appointment.objects.filter(worker_id=worker_id, status='completed').select_related('service_subtask'),
+            key=lambda appointment: (min(appointment.appointment_date or appointment.updated_at, now), appointment.pk),
+        )
+        existing = WorkerEarning.objects.in_bulk(
+            [appointment.pk for appointment in appointments], field_name='appointment_id'
+        )
+
+        balance = Decimal('0.00')
+        new_entries, reposted, months = [], [], {}
+        for appointment in appointments:
+            entry = existing.get(appointment.pk)
+            amount = earning_amount(appointment)
+            if amount <= 0:
+                continue
+
+            fee = (amount * PLATFORM_FEE_RATE).quantize(Decimal('0.01'))
+            balance += amount - fee
+            posted_at = min(appointment.appointment_date or appointment.updated_at, now)
+            if entry is None:
+                entry = WorkerEarning(worker_id=worker_id, appointment_id=appointment.pk)
+                new_entries.append(entry)
+            else:
+                reposted.append(entry)
+            entry.amount, entry.platform_fee, entry.net_amount = amount, fee, amount - fee
+            entry.posted_at, entry.running_balance = posted_at, balance
+
+            month = timezone.localtime(posted_at).date().replace(day=1)
+            totals = months.setdefault(month, [Decimal('0.00'), Decimal('0.00'), Decimal('0.00'), 0])
+            totals[0] += amount
+            totals[1] += fee
+            totals[2] += amount - fee
+            totals[3] += 1
+
+        WorkerEarning.objects.bulk_create(new_entries, batch_size=500)
+        WorkerEarning.objects.bulk_update(
+            reposted, ['amount', 'platform_fee', 'net_amount', 'posted_at', 'running_balance'], batch_size=500
+        )
+        WorkerMonthlyEarning.objects.bulk_create([
+            WorkerMonthlyEarning(
+                worker_id=worker_id, month=month,
+                gross_amount=gross, platform_fees=fees, net_amount=net, entries=entries,
+            )
+            for month, (gross, fees, net, entries) in months.items()
+        ])
+
+
+def clear_ledger(apps, schema_editor):
+    apps.get_model('jobs', 'WorkerMonthlyEarning').objects.all().delete()
+    apps.get_model('jobs', 'WorkerEarning').objects.update(posted_at=None, running_balance=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0037_earnings_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ledger, clear_ledger),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0038_backfill_earnings_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='rejected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workeranalytics',
+            name='accepted_appointments',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='WorkerLatencyHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('response', 'Request to accept/reject'), ('completion', 'Accept to complete')], max_length=20)),
+                ('counts', models.JSONField(default=list)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('total_minutes', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latency_histograms', to='jobs.worker')),
+            ],
+            options={
+                'unique_together': {('worker', 'metric')},
+            },
+        ),
+    ]
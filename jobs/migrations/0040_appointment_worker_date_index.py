@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0039_transition_timestamps_latency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['worker', 'appointment_date'], name='jobs_appoin_worker__ef325b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0040_appointment_worker_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workersettings',
+            name='calendar_token',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
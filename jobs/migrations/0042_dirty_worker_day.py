@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0041_worker_calendar_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyWorkerDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
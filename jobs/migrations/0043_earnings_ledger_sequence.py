@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+def number_ledger_entries(apps, schema_editor):
+    """
+    Number each worker's posted entries in posting order. Every entry adds a
+    positive net amount, so running balances increase strictly along the
+    ledger and order it even where ids and posted_at do not.
+    """
+    WorkerEarning = apps.get_model('jobs', 'WorkerEarning')
+    entries = WorkerEarning.objects.filter(posted_at__isnull=False).order_by('worker_id', 'running_balance', 'id')
+
+    numbered, worker_id, sequence = [], None, 0
+    for entry in entries.only('id', 'worker_id').iterator(chunk_size=2000):
+        if entry.worker_id != worker_id:
+            worker_id, sequence = entry.worker_id, 0
+        sequence += 1
+        entry.ledger_sequence = sequence
+        numbered.append(entry)
+    WorkerEarning.objects.bulk_update(numbered, ['ledger_sequence'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0042_dirty_worker_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerearning',
+            name='ledger_sequence',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(number_ledger_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='workerearning',
+            constraint=models.UniqueConstraint(fields=('worker', 'ledger_sequence'), name='unique_worker_ledger_sequence'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0043_earnings_ledger_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_id', models.BigIntegerField()),
+                ('worker_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['worker_id', 'deleted_at'], name='jobs_appoin_worker__202b3b_idx')],
+            },
+        ),
+    ]
@@ -102,6 +102,28 @@ def _haversine_km(lat1, lon1, lat2, lon2):
     r = 6371  # Radius of earth in kilometers
     return c * r
 
+class WorkerQuerySet(models.QuerySet):
+    def with_rating_stats(self, confidence=5.0):
+        """
+        Annotate `rating_total` and `bayesian_rating` (same formula as
+        Worker.bayesian_average_rating) for every worker in one grouped query,
+        plus one query for the platform-wide average.
+        """
+        global_avg = WorkerRating.objects.aggregate(Avg('rating'))['rating__avg'] or 3.0
+        return self.annotate(
+            rating_total=Count('ratings'),
+            rating_mean=Avg('ratings__rating'),
+        ).annotate(bayesian_rating=models.Case(
+            models.When(rating_total=0, then=models.Value(0.0)),
+            default=models.ExpressionWrapper(
+                (models.Value(confidence * global_avg) + models.F('rating_total') * models.F('rating_mean'))
+                / (models.Value(confidence) + models.F('rating_total')),
+                output_field=models.FloatField(),
+            ),
+            output_field=models.FloatField(),
+        ))
+
+
 # Worker Model
 class Worker(models.Model):
     owner = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -146,6 +168,8 @@ class Worker(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = WorkerQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
 
@@ -256,8 +280,9 @@ class Worker(models.Model):
         return breakdown
 
     def get_unread_notification_count(self):
-        """Get count of unread notifications for this worker"""
-        return self.notifications.filter(is_read=False).count()
+        """Get count of unread notifications for this worker (cached counter)"""
+        from jobs.notifications import get_unread_count
+        return get_unread_count(worker=self)
 
     def __str__(self):
         return f"{self.name} - {self.tagline}"
@@ -278,6 +303,44 @@ class WorkerService(models.Model):
         return f"{self.worker.name} - {self.service.name}"
 
 # Worker SubTask Pricing
+def subtask_total_price(pricing, quantity=1, is_night_shift=False):
+    """
+    ✅ FIXED: Calculate total price with proper Decimal handling
+    All calculations use Decimal to avoid float/Decimal conflicts
+
+    `pricing` is a WorkerSubTaskPricing; only its fields are read, so data
+    migrations can pass historical model instances.
+    """
+    # Ensure base price is Decimal
+    total = Decimal(str(pricing.price)) if pricing.price else Decimal('0.00')
+    
+    # Add night shift extra if applicable
+    if is_night_shift and pricing.night_shift_extra:
+        night_extra = Decimal(str(pricing.night_shift_extra))
+        total += night_extra
+    
+    # Convert quantity to Decimal for safe arithmetic
+    try:
+        qty = Decimal(str(quantity))
+    except (ValueError, TypeError):
+        qty = Decimal('1.00')
+    
+    # Calculate based on pricing type
+    if pricing.pricing_type in ['sqft', 'unit']:
+        # Multiply by quantity for per-unit pricing
+        total = total * qty
+        
+    elif pricing.pricing_type == 'hourly':
+        # For hourly, use maximum of min_hours or quantity
+        min_hrs = Decimal(str(pricing.min_hours))
+        hours = max(min_hrs, qty)
+        total = total * hours
+    
+    # For 'fixed', 'shift', 'inspection' types, return base total
+    
+    # Round to 2 decimal places and return
+    return total.quantize(Decimal('0.01'))
+
 class WorkerSubTaskPricing(models.Model):
     EXPERIENCE_LEVELS = [
         ('beginner', 'Beginner'),
@@ -317,39 +380,8 @@ class WorkerSubTaskPricing(models.Model):
         return dict(self.EXPERIENCE_LEVELS).get(self.experience_level, self.experience_level)
     
     def get_total_price(self, quantity=1, is_night_shift=False):
-        """
-        ✅ FIXED: Calculate total price with proper Decimal handling
-        All calculations use Decimal to avoid float/Decimal conflicts
-        """
-        # Ensure base price is Decimal
-        total = Decimal(str(self.price)) if self.price else Decimal('0.00')
-        
-        # Add night shift extra if applicable
-        if is_night_shift and self.night_shift_extra:
-            night_extra = Decimal(str(self.night_shift_extra))
-            total += night_extra
-        
-        # Convert quantity to Decimal for safe arithmetic
-        try:
-            qty = Decimal(str(quantity))
-        except (ValueError, TypeError):
-            qty = Decimal('1.00')
-        
-        # Calculate based on pricing type
-        if self.pricing_type in ['sqft', 'unit']:
-            # Multiply by quantity for per-unit pricing
-            total = total * qty
-            
-        elif self.pricing_type == 'hourly':
-            # For hourly, use maximum of min_hours or quantity
-            min_hrs = Decimal(str(self.min_hours))
-            hours = max(min_hrs, qty)
-            total = total * hours
-        
-        # For 'fixed', 'shift', 'inspection' types, return base total
-        
-        # Round to 2 decimal places and return
-        return total.quantize(Decimal('0.01'))
+        """Total price for `quantity` units of this subtask (see subtask_total_price)"""
+        return subtask_total_price(self, quantity, is_night_shift)
 
 # Customer Model
 class Customer(models.Model):
@@ -473,19 +505,34 @@ class Customer(models.Model):
         return nearby_workers[:limit]
 
     def get_unread_notification_count(self):
-        """Get count of unread notifications for this customer"""
-        return self.notifications.filter(is_read=False).count()
+        """Get count of unread notifications for this customer (cached counter)"""
+        from jobs.notifications import get_unread_count
+        return get_unread_count(customer=self)
 
     def __str__(self):
         return f"{self.name}"
 
 
+class AppointmentQuerySet(models.QuerySet):
+    def with_rating_status(self):
+        """
+        Annotate `has_rated`: whether the appointment's customer has rated it.
+        Computed in the same query as an EXISTS subquery, so listing pages do
+        not run one rating lookup per appointment.
+        """
+        return self.annotate(has_rated=models.Exists(
+            WorkerRating.objects.filter(appointment=models.OuterRef('pk'), customer=models.OuterRef('customer'))
+        ))
+
+
 class Appointment(models.Model):
     """
     Appointment model for booking services between customers and workers
     """
     # Primary key
     id = models.BigAutoField(primary_key=True)
+
+    objects = AppointmentQuerySet.as_manager()
     
     # Status choices
     STATUS_CHOICES = [
@@ -567,12 +614,17 @@ class Appointment(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set by the accept/reject/complete transitions (jobs/transitions.py)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+    rejected_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-appointment_date']
         indexes = [
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['worker', 'status']),
+            models.Index(fields=['worker', 'appointment_date']),
             models.Index(fields=['appointment_date']),
             models.Index(fields=['created_at']),
         ]
@@ -717,9 +769,15 @@ class Notification(models.Model):
     
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the notification has gone out in an email digest
+    emailed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['worker', 'is_read', 'created_at']),
+            models.Index(fields=['customer', 'is_read', 'created_at']),
+        ]
     
     def __str__(self):
         recipient = self.worker.name if self.worker else self.customer.name
@@ -727,7 +785,7 @@ class Notification(models.Model):
 
     def mark_as_read(self):
         self.is_read = True
-        self.save()
+        self.save(update_fields=['is_read'])
 
 class FavoriteWorker(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='favorite_workers')
@@ -789,6 +847,13 @@ class WorkerEarning(models.Model):
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_date = models.DateTimeField(blank=True, null=True)
     transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    # Set when the entry is posted to the worker's ledger (see jobs/earnings.py);
+    # running_balance is the worker's total net earnings including this entry
+    posted_at = models.DateTimeField(blank=True, null=True)
+    running_balance = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    # Position in the worker's ledger (1, 2, ...). Entries reposted from old
+    # rows keep their ids, so neither id nor posted_at gives posting order
+    ledger_sequence = models.PositiveIntegerField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -797,6 +862,10 @@ class WorkerEarning(models.Model):
         indexes = [
             models.Index(fields=['worker', 'payment_status']),
             models.Index(fields=['payment_date']),
+            models.Index(fields=['worker', 'posted_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['worker', 'ledger_sequence'], name='unique_worker_ledger_sequence'),
         ]
 
     def __str__(self):
@@ -807,12 +876,55 @@ class WorkerEarning(models.Model):
             self.net_amount = self.amount - self.platform_fee
         super().save(*args, **kwargs)
 
+class WorkerMonthlyEarning(models.Model):
+    """Per-worker monthly totals of the earnings ledger, updated as entries are posted"""
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='monthly_earnings')
+    month = models.DateField()  # first day of the month
+    gross_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    platform_fees = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    net_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    entries = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['worker', 'month']
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.worker.name} - {self.month:%Y-%m} - ₹{self.net_amount}"
+
+class WorkerLatencyHistogram(models.Model):
+    """
+    Fixed-bucket histogram of one latency metric for a worker, updated as
+    appointments move through their transitions (see jobs/latency.py), so
+    percentiles are read from one row instead of scanning appointments.
+    """
+    METRIC_CHOICES = [
+        ('response', 'Request to accept/reject'),
+        ('completion', 'Accept to complete'),
+    ]
+
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='latency_histograms')
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    # counts[i] = samples in bucket i of jobs.latency.BUCKET_BOUNDS_MINUTES
+    counts = models.JSONField(default=list)
+    total = models.PositiveIntegerField(default=0)
+    total_minutes = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['worker', 'metric']
+
+    def __str__(self):
+        return f"{self.worker.name} - {self.metric} ({self.total} samples)"
+
 class WorkerAnalytics(models.Model):
     worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='analytics')
     date = models.DateField()
     
     # Performance metrics
     total_appointments = models.PositiveIntegerField(default=0)
+    accepted_appointments = models.PositiveIntegerField(default=0)
     completed_appointments = models.PositiveIntegerField(default=0)
     cancelled_appointments = models.PositiveIntegerField(default=0)
     
@@ -850,11 +962,57 @@ class WorkerAnalytics(models.Model):
             return round((self.cancelled_appointments / self.total_appointments) * 100, 1)
         return 0
 
+class RollupCheckpoint(models.Model):
+    """High-water mark of an incremental rollup job, e.g. rollup_worker_analytics"""
+    name = models.CharField(max_length=50, unique=True)
+    last_run_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_run_at}"
+
+class AppointmentTombstone(models.Model):
+    """
+    Id of a deleted appointment, kept for CALENDAR_DELTA_MAX_AGE so calendar
+    delta requests (jobs/calendar_feed.py) can tell clients to drop it.
+    """
+    appointment_id = models.BigIntegerField()
+    worker_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['worker_id', 'deleted_at'])]
+
+    def __str__(self):
+        return f"appointment {self.appointment_id} deleted {self.deleted_at}"
+
+class DirtyWorkerDay(models.Model):
+    """
+    A worker/day the WorkerAnalytics rollup must recount because an
+    appointment left it (moved to another day or worker, or deleted), which
+    the rows' own updated_at cannot show. Written by the Appointment signals
+    below; the worker is a plain id so rows survive the worker's deletion.
+    """
+    worker_id = models.BigIntegerField()
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"worker {self.worker_id} - {self.date}"
+
 class WorkerSettings(models.Model):
     worker = models.OneToOneField(Worker, on_delete=models.CASCADE, related_name='settings')
     
+    EMAIL_FREQUENCY_CHOICES = [
+        ('instant', 'Instant'),
+        ('digest', 'Periodic digest'),
+    ]
+
     # Notification preferences
     email_notifications = models.BooleanField(default=True)
+    # With 'digest', appointment request emails are held back and sent as one
+    # summary email per run of the send_notification_digests command
+    email_frequency = models.CharField(max_length=10, choices=EMAIL_FREQUENCY_CHOICES, default='instant')
     sms_notifications = models.BooleanField(default=False)
     appointment_reminders = models.BooleanField(default=True)
     review_notifications = models.BooleanField(default=True)
@@ -876,6 +1034,9 @@ class WorkerSettings(models.Model):
         ]
     )
     
+    # Secret part of the worker's iCalendar subscription URL (jobs/ics_feed.py)
+    calendar_token = models.CharField(max_length=64, unique=True, blank=True, null=True)
+
     # Display preferences
     language = models.CharField(max_length=10, default='en')
     timezone = models.CharField(max_length=50, default='Asia/Kolkata')
@@ -926,7 +1087,7 @@ class WorkerPortfolio(models.Model):
         return f"{self.worker.name} - {self.title}"
 
 # Signal handlers for automatic creation of related objects
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 
 @receiver(post_save, sender=Worker)
@@ -934,55 +1095,71 @@ def create_worker_settings(sender, instance, created, **kwargs):
     if created:
         WorkerSettings.objects.create(worker=instance)
 
-from decimal import Decimal
+@receiver(post_init, sender=Appointment)
+def remember_appointment_day(sender, instance, **kwargs):
+    from jobs.analytics import appointment_day
+
+    instance._rollup_day = appointment_day(instance)
 
 @receiver(post_save, sender=Appointment)
-def create_worker_earning(sender, instance, created, **kwargs):
-    """✅ FIXED: Create worker earning with proper Decimal handling"""
-    if created and instance.service_subtask:
-        # Get amount as Decimal
-        amount = instance.total_price if instance.total_price else instance.calculate_total_price()
-        
-        # Ensure it's a Decimal
-        if amount:
-            amount = Decimal(str(amount))
-            
-            if amount > Decimal('0.00'):
-                # ✅ Calculate platform fee using Decimal (not 0.10 which is float)
-                platform_fee = amount * Decimal('0.10')
-                
-                WorkerEarning.objects.create(
-                    worker=instance.worker,
-                    appointment=instance,
-                    amount=amount,
-                    platform_fee=platform_fee,
-                )
-                
+def mark_previous_day_dirty(sender, instance, created, **kwargs):
+    from jobs.analytics import appointment_day, mark_days_dirty
+
+    # The new day is found through updated_at; the day it left is not
+    previous, current = instance._rollup_day, appointment_day(instance)
+    if not created and previous is not None and previous != current:
+        mark_days_dirty([previous])
+    instance._rollup_day = current
+
+@receiver(post_delete, sender=Appointment)
+def mark_deleted_day_dirty(sender, instance, **kwargs):
+    from jobs.analytics import mark_days_dirty
+
+    if instance._rollup_day is not None:
+        mark_days_dirty([instance._rollup_day])
+
+@receiver(post_delete, sender=Appointment)
+def record_appointment_tombstone(sender, instance, **kwargs):
+    from jobs.calendar_feed import record_deletions
+
+    record_deletions([instance])
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_worker_calendar_feed(sender, instance, **kwargs):
+    from jobs.ics_feed import invalidate_calendar_feeds
+
+    invalidate_calendar_feeds([instance.worker_id])
+
 @receiver(post_save, sender=Appointment)
 def create_appointment_notification(sender, instance, created, **kwargs):
     if created:
-        # Notification for worker
-        Notification.objects.create(
-            worker=instance.worker,
-            notification_type='appointment_request',
-            title='New Appointment Request',
-            message=f'You have a new appointment request from {instance.customer.name}',
-            appointment=instance
-        )
-        
-        # Notification for customer
-        Notification.objects.create(
-            customer=instance.customer,
-            notification_type='appointment_request',
-            title='Appointment Request Sent',
-            message=f'Your appointment request to {instance.worker.name} has been sent',
-            appointment=instance
-        )
+        from jobs.notifications import notify_many
+
+        # Worker and customer notifications go out in a single insert
+        notify_many([
+            Notification(
+                worker=instance.worker,
+                notification_type='appointment_request',
+                title='New Appointment Request',
+                message=f'You have a new appointment request from {instance.customer.name}',
+                appointment=instance
+            ),
+            Notification(
+                customer=instance.customer,
+                notification_type='appointment_request',
+                title='Appointment Request Sent',
+                message=f'Your appointment request to {instance.worker.name} has been sent',
+                appointment=instance
+            ),
+        ])
 
 @receiver(post_save, sender=WorkerRating)
 def create_review_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
+        from jobs.notifications import notify
+
+        notify(
             worker=instance.worker,
             notification_type='rating_received',
             title='New Review Received',
@@ -0,0 +1,235 @@
+# notifications.py - Batched notification fan-out
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from jobs.events import publish_notifications
+from jobs.models import Notification, WorkerService
+import logging
+logger = logging.getLogger(__name__)
+
+# Open batch for the current thread/task; a ContextVar keeps async requests apart
+_current_batch = ContextVar('notification_batch', default=None)
+
+
+def _batch_size():
+    return getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500)
+
+
+def _unread_timeout():
+    return getattr(settings, 'NOTIFICATION_UNREAD_COUNT_TIMEOUT', 300)
+
+
+def unread_count_key(worker_id=None, customer_id=None):
+    """Cache key holding the unread notification count for one recipient"""
+    if worker_id is not None:
+        return f'notifications:unread:worker:{worker_id}'
+    return f'notifications:unread:customer:{customer_id}'
+
+
+def get_unread_count(worker=None, customer=None):
+    """
+    Return the unread notification count for a worker or customer.
+    Served from cache; on a miss the count is taken from the
+    (recipient, is_read, created_at) index and cached.
+    """
+    if worker is not None:
+        key, recipient = unread_count_key(worker_id=worker.pk), {'worker': worker}
+    else:
+        key, recipient = unread_count_key(customer_id=customer.pk), {'customer': customer}
+
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(is_read=False, **recipient).count()
+        cache.add(key, count, _unread_timeout())
+    return count
+
+
+def _increment_unread_counts(notifications):
+    """Bump the cached counters for freshly inserted notifications"""
+    counts = Counter(
+        unread_count_key(worker_id=notification.worker_id, customer_id=notification.customer_id)
+        for notification in notifications
+        if not notification.is_read and (notification.worker_id or notification.customer_id)
+    )
+    for key, amount in counts.items():
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Not cached yet; the next read counts from the database
+            pass
+
+
+def _after_insert(notifications):
+    """Update counters and push the new rows to any open event streams"""
+    _increment_unread_counts(notifications)
+    publish_notifications(notifications)
+
+
+def decrement_unread_count(amount=1, worker=None, customer=None):
+    """Lower a recipient's cached counter after `amount` notifications were marked read"""
+    if not amount:
+        return
+    key = unread_count_key(
+        worker_id=worker.pk if worker is not None else None,
+        customer_id=customer.pk if customer is not None else None,
+    )
+    try:
+        if cache.decr(key, amount) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+
+
+def reset_unread_count(worker=None, customer=None):
+    """Drop a recipient's cached counter, e.g. after mark-all-read"""
+    cache.delete(unread_count_key(
+        worker_id=worker.pk if worker is not None else None,
+        customer_id=customer.pk if customer is not None else None,
+    ))
+
+
+class NotificationBatch:
+    """
+    Collects Notification rows and writes them with bulk_create.
+    Rows are flushed when the batch is closed, or early once `batch_size`
+    rows are pending so large broadcasts never hold everything in memory.
+
+    Rows queued inside a transaction only join the batch when it commits,
+    so those added in an atomic block that rolls back are never written.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or _batch_size()
+        self.pending = []
+        self.created_count = 0
+        self.discarded = False
+
+    def add(self, notification_type, title, message, worker=None, customer=None, appointment=None,
+            worker_id=None, customer_id=None):
+        """Queue a notification for a single worker or customer"""
+        self.extend([Notification(
+            worker_id=worker.pk if worker is not None else worker_id,
+            customer_id=customer.pk if customer is not None else customer_id,
+            appointment=appointment,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+        )])
+
+    def extend(self, notifications):
+        """Queue already-built Notification instances"""
+        notifications = list(notifications)
+        # on_commit drops the callback if the enclosing savepoint rolls back,
+        # and runs it straight away outside a transaction
+        transaction.on_commit(lambda: self._queue(notifications))
+
+    def _queue(self, notifications):
+        if self.discarded:
+            return
+        for notification in notifications:
+            self.pending.append(notification)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def discard(self):
+        """Drop pending rows, and any still waiting for their transaction to commit"""
+        self.discarded = True
+        self.pending = []
+
+    def broadcast(self, notification_type, title, message, worker_ids=(), customer_ids=(), appointment=None):
+        """Queue the same notification for many recipients, given as ids or values_list querysets"""
+        for worker_id in _iter_ids(worker_ids, self.batch_size):
+            self.add(notification_type, title, message, worker_id=worker_id, appointment=appointment)
+        for customer_id in _iter_ids(customer_ids, self.batch_size):
+            self.add(notification_type, title, message, customer_id=customer_id, appointment=appointment)
+
+    def flush(self):
+        """Write all pending notifications in one INSERT per batch_size rows"""
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, []
+        created = Notification.objects.bulk_create(pending, batch_size=self.batch_size)
+        self.created_count += len(created)
+        _after_insert(created)
+        return created
+
+
+def _iter_ids(ids, chunk_size):
+    """Iterate ids from a list or a values_list(flat=True) queryset without loading it all at once"""
+    if hasattr(ids, 'iterator'):
+        return ids.iterator(chunk_size=chunk_size)
+    return iter(ids)
+
+
+def current_batch():
+    """Return the NotificationBatch open in the current context, or None"""
+    return _current_batch.get()
+
+
+@contextmanager
+def collect_notifications(batch_size=None):
+    """
+    Buffer every notification created inside the block and write them with
+    bulk_create when it exits. Inside a transaction the write is deferred to
+    commit, and rows queued in an atomic block that rolls back (including a
+    nested savepoint) are dropped. Nested blocks share the outer batch.
+    """
+    outer = current_batch()
+    if outer is not None:
+        yield outer
+        return
+
+    batch = NotificationBatch(batch_size)
+    token = _current_batch.set(batch)
+    try:
+        yield batch
+    except Exception:
+        batch.discard()
+        raise
+    finally:
+        _current_batch.reset(token)
+    transaction.on_commit(batch.flush)
+
+
+def notify_many(notifications):
+    """Write a list of Notification instances, joining the open batch if there is one"""
+    notifications = list(notifications)
+    if not notifications:
+        return
+    batch = current_batch()
+    if batch is not None:
+        batch.extend(notifications)
+    else:
+        created = Notification.objects.bulk_create(notifications, batch_size=_batch_size())
+        transaction.on_commit(lambda: _after_insert(created))
+
+
+def notify(notification_type, title, message, worker=None, customer=None, appointment=None):
+    """Create a single notification for a worker or customer"""
+    notify_many([Notification(
+        worker=worker,
+        customer=customer,
+        appointment=appointment,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+    )])
+
+
+def broadcast_to_service_workers(service, notification_type, title, message, available_only=True):
+    """
+    Notify every worker offering `service`. Recipient ids are streamed from the
+    database and inserted in batch_size chunks, so thousands of recipients cost
+    a handful of INSERTs rather than one per worker.
+    """
+    worker_services = WorkerService.objects.filter(service=service)
+    if available_only:
+        worker_services = worker_services.filter(is_available=True, worker__is_available=True)
+    worker_ids = worker_services.values_list('worker_id', flat=True).distinct()
+
+    with collect_notifications() as batch:
+        batch.broadcast(notification_type, title, message, worker_ids=worker_ids)
+    logger.info(f"Queued broadcast '{title}' to workers of service {service.pk}")
@@ -1,3 +1,663 @@
-from django.test import TestCase
+import csv
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+import smtplib
+from asgiref.sync import async_to_sync
+from config.utils.email_dispatch import EmailDispatcher, reset_dispatcher
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from jobs.analytics import conversion_funnel, rollup_totals, timestamps_tracked_since
+from jobs.earnings import earning_amount, latest_balance, post_earnings
+from jobs.emails import build_appointment_status_email, with_email_related, worker_email_mode
+from jobs import events
+from jobs.events import CacheBroker
+from jobs.ics_feed import get_or_create_token
+from jobs.latency import BUCKET_COUNT, bucket_for, histogram_percentile, latency_summary
+from jobs.notifications import collect_notifications, notify
+from jobs.transitions import InvalidTransition, apply_transition, bulk_transition
+from jobs.views import FAVORITES_PAGE_SIZE
+from jobs.models import (
+    Appointment, Customer, FavoriteWorker, Notification, Service, ServiceCategory, SubTask, Worker, WorkerEarning,
+    WorkerRating, WorkerService, WorkerSubTaskPricing,
+)
 
-# Create your tests here.
+User = get_user_model()
+
+
+class JobsTestCase(TestCase):
+    """One worker offering one fixed-price subtask, and one customer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.worker_user = User.objects.create_user(username='worker', email='worker@example.com', password='pass')
+        cls.customer_user = User.objects.create_user(username='customer', email='customer@example.com', password='pass')
+        cls.worker = Worker.objects.create(owner=cls.worker_user, name='Worker', phone_number='+9779841000000')
+        cls.customer = Customer.objects.create(owner=cls.customer_user, name='Customer', phone_number='+9779841000001')
+        category = ServiceCategory.objects.create(name='Plumbing')
+        service = Service.objects.create(category=category, name='Pipes', description='Pipes')
+        subtask = SubTask.objects.create(service=service, name='Fix leak', description='Leaks', duration='2 hours')
+        worker_service = WorkerService.objects.create(worker=cls.worker, service=service)
+        cls.pricing = WorkerSubTaskPricing.objects.create(
+            worker_service=worker_service, subtask=subtask, pricing_type='fixed', price=500,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, status='pending', days=1, **fields):
+        fields.setdefault('worker', self.worker)
+        return Appointment.objects.create(
+            customer=self.customer, service_subtask=self.pricing,
+            appointment_date=timezone.now() + timedelta(days=days), status=status, **fields,
+        )
+
+
+class AppointmentTransitionTests(JobsTestCase):
+    def test_only_one_of_two_stale_copies_wins(self):
+        appointment = self.book()
+        first, second = Appointment.objects.get(pk=appointment.pk), Appointment.objects.get(pk=appointment.pk)
+
+        self.assertTrue(apply_transition(first, 'accept'))
+        self.assertFalse(apply_transition(second, 'reject'))
+        self.assertEqual(second.status, 'pending')
+
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'accepted')
+        self.assertIsNotNone(appointment.accepted_at)
+        self.assertIsNone(appointment.rejected_at)
+
+    def test_completing_twice_posts_one_earning(self):
+        appointment = self.book(status='accepted')
+        stale = Appointment.objects.get(pk=appointment.pk)
+        self.assertTrue(apply_transition(appointment, 'complete'))
+        self.assertFalse(apply_transition(stale, 'complete'))
+        self.assertEqual(WorkerEarning.objects.filter(appointment=appointment).count(), 1)
+
+    def test_worker_complete_requires_customer_confirmation(self):
+        appointment = self.book(status='accepted')
+        self.assertFalse(apply_transition(appointment, 'worker_complete'))
+        self.assertTrue(apply_transition(appointment, 'customer_complete'))
+        self.assertTrue(apply_transition(appointment, 'worker_complete'))
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, 'completed')
+
+    def test_bulk_transition_skips_rows_in_other_states(self):
+        pending = [self.book(), self.book()]
+        already_rejected = self.book(status='rejected')
+
+        accepted = bulk_transition(Appointment.objects.filter(worker=self.worker), 'accept')
+
+        self.assertEqual(sorted(appointment.pk for appointment in accepted), sorted(appointment.pk for appointment in pending))
+        self.assertEqual(Appointment.objects.get(pk=already_rejected.pk).status, 'rejected')
+        self.assertEqual(bulk_transition(Appointment.objects.filter(worker=self.worker), 'accept'), [])
+
+    def test_unknown_transition_is_rejected(self):
+        with self.assertRaises(InvalidTransition):
+            apply_transition(self.book(), 'archive')
+
+
+class BulkAppointmentActionTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.worker_user)
+        self.url = reverse('bulk_appointment_action')
+
+    def post_json(self, body):
+        return self.client.post(self.url, json.dumps(body), content_type='application/json')
+
+    def test_form_body(self):
+        pending, done = self.book(), self.book(status='completed')
+        response = self.client.post(self.url, {'action': 'accept', 'appointment_ids': [pending.pk, done.pk]})
+        self.assertRedirects(response, reverse('worker_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(Appointment.objects.get(pk=pending.pk).status, 'accepted')
+        self.assertEqual(Appointment.objects.get(pk=done.pk).status, 'completed')
+
+    def test_json_body(self):
+        pending = self.book()
+        data = self.post_json({'action': 'reject', 'appointment_ids': [pending.pk]}).json()
+        self.assertEqual(data['updated_ids'], [pending.pk])
+        self.assertEqual(Appointment.objects.get(pk=pending.pk).status, 'rejected')
+
+    def test_malformed_bodies_are_rejected(self):
+        pending = self.book()
+        for body in ([pending.pk], {'action': 'accept', 'appointment_ids': str(pending.pk)},
+                     {'action': 'accept', 'appointment_ids': [{'id': pending.pk}]}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post_json(body).status_code, 400)
+        response = self.client.post(self.url, 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'action': 'accept', 'appointment_ids': ['x']}).status_code, 400)
+        self.assertEqual(Appointment.objects.get(pk=pending.pk).status, 'pending')
+
+    def test_other_workers_appointments_are_skipped(self):
+        other_user = User.objects.create_user(username='other', password='pass')
+        other = Worker.objects.create(owner=other_user, name='Other', phone_number='+9779841000002')
+        foreign = self.book(worker=other)
+        data = self.post_json({'action': 'accept', 'appointment_ids': [foreign.pk]}).json()
+        self.assertEqual((data['updated_ids'], data['skipped_count']), ([], 1))
+        self.assertEqual(Appointment.objects.get(pk=foreign.pk).status, 'pending')
+
+
+class LatencyTests(JobsTestCase):
+    def test_buckets_and_percentiles(self):
+        self.assertEqual([bucket_for(minutes) for minutes in (0, 1, 2, 3, 10081)], [0, 0, 1, 2, BUCKET_COUNT - 1])
+        counts = [0] * BUCKET_COUNT
+        counts[bucket_for(12)] = 10  # the (10, 15] bucket
+        self.assertEqual(histogram_percentile(counts, 10, 50), 12)
+        self.assertEqual(histogram_percentile(counts, 10, 100), 15)
+        self.assertIsNone(histogram_percentile(counts, 0, 50))
+
+    def test_transitions_feed_the_workers_histograms(self):
+        quick, slow = self.book(), self.book()
+        Appointment.objects.filter(pk=quick.pk).update(created_at=timezone.now() - timedelta(minutes=30))
+        Appointment.objects.filter(pk=slow.pk).update(created_at=timezone.now() - timedelta(hours=5))
+        quick.refresh_from_db()
+        slow.refresh_from_db()
+
+        apply_transition(quick, 'accept')
+        bulk_transition(Appointment.objects.filter(pk=slow.pk), 'reject')
+        apply_transition(quick, 'complete')
+
+        summary = latency_summary(self.worker)
+        self.assertEqual(summary['response']['count'], 2)
+        self.assertEqual(summary['response']['average'], 165)
+        self.assertEqual(summary['completion']['count'], 1)
+        self.assertEqual(summary['completion']['p50'], 0)
+
+
+class NotificationStreamTests(JobsTestCase):
+    def test_stream_is_off_by_default(self):
+        self.client.force_login(self.customer_user)
+        response = self.client.get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cache_broker_replays_at_most_backlog_events(self):
+        broker = CacheBroker(poll_interval=0.01, backlog=2)
+        for number in range(5):
+            broker.publish('customer:1', {'type': 'notification', 'number': number})
+
+        async def first_events(last_event_id, count):
+            events = broker.subscribe('customer:1', heartbeat=0.05, last_event_id=last_event_id)
+            try:
+                return [await anext(events) for _ in range(count)]
+            finally:
+                await events.aclose()
+
+        replayed = async_to_sync(first_events)('0', 2)
+        self.assertEqual([event['id'] for event in replayed], [4, 5])
+        # An id that was never issued waits for new events instead of skipping them
+        self.assertEqual(async_to_sync(first_events)('999999', 1), [None])
+
+    @override_settings(NOTIFICATION_STREAM_ENABLED=True, NOTIFICATION_STREAM_MAX_DURATION=0, NOTIFICATION_STREAM_HEARTBEAT=0.01)
+    def test_stream_closes_after_max_duration(self):
+        self.client.force_login(self.customer_user)
+        response = self.client.get(reverse('notification_stream'), HTTP_LAST_EVENT_ID='not-a-number')
+
+        async def read_all():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        body = async_to_sync(read_all)().decode()
+        self.assertIn('event: unread_count', body)
+        self.assertTrue(body.endswith(': keep-alive\n\n'))
+
+    @override_settings(
+        NOTIFICATION_STREAM_ENABLED=True, NOTIFICATION_STREAM_MAX_DURATION=0,
+        NOTIFICATION_BROKER='jobs.events.CacheBroker', NOTIFICATION_BROKER_OPTIONS={'poll_interval': 0.01},
+    )
+    def test_stream_carries_appointment_status_changes(self):
+        events._broker = None
+        self.addCleanup(setattr, events, '_broker', None)
+        appointment = self.book()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_transition(appointment, 'accept')
+
+        self.client.force_login(self.worker_user)
+        response = self.client.get(reverse('notification_stream'), HTTP_LAST_EVENT_ID='0')
+
+        async def read_all():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        message = async_to_sync(read_all)().decode().split('\n\n')[-2]
+        self.assertIn('event: appointment_status', message)
+        data = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual((data['appointment_id'], data['status']), (appointment.pk, 'accepted'))
+
+
+class CollectNotificationsTests(JobsTestCase):
+    def test_rolled_back_savepoint_drops_its_notifications(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with collect_notifications():
+                notify('appointment_request', 'Kept', 'Hello', worker=self.worker)
+                try:
+                    with transaction.atomic():
+                        notify('appointment_request', 'Rolled back', 'Hello', worker=self.worker)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                # Not written until the outer transaction commits
+                self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['Kept'])
+
+    def test_broadcast_writes_every_queued_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with collect_notifications(batch_size=2) as batch:
+                batch.broadcast('appointment_request', 'Hi', 'Hello', worker_ids=[self.worker.pk] * 5)
+        self.assertEqual(batch.created_count, 5)
+
+
+class NotificationInboxTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        Notification.objects.bulk_create([
+            Notification(worker=self.worker, notification_type='appointment_request', title=f'Note {number}', message='Hello')
+            for number in range(25)
+        ])
+        self.client.force_login(self.worker_user)
+
+    def fetch(self, **params):
+        return self.client.get(reverse('worker_notifications'), params)
+
+    def test_cursor_pagination_visits_every_notification_once(self):
+        seen, cursor = [], None
+        while True:
+            data = self.fetch(limit=10, **({'cursor': cursor} if cursor else {})).json()
+            seen.extend(notification['id'] for notification in data['notifications'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(set(seen), reverse=True))
+
+    def test_limit_is_clamped(self):
+        for limit, expected in (('0', 1), ('-3', 1), ('500', 25), ('abc', 20)):
+            with self.subTest(limit=limit):
+                response = self.fetch(limit=limit)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['notifications']), expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.fetch(cursor='garbage').status_code, 400)
+
+
+class WorkerAnalyticsPageTests(JobsTestCase):
+    def test_page_is_built_from_grouped_aggregates(self):
+        appointments = [self.book(status=status, days=0, total_price=500) for status in ('completed', 'completed', 'pending', 'rejected')]
+        post_earnings(appointments[:2])
+        call_command('rollup_worker_analytics', stdout=StringIO())
+        self.client.force_login(self.worker_user)
+
+        data = self.client.get(reverse('worker_analytics'), HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+        self.assertEqual((data['total_appointments'], data['completed_appointments'], data['completion_rate']), (4, 2, 50.0))
+        this_month = data['monthly_earnings'][-1]
+        self.assertEqual(len(data['monthly_earnings']), 6)
+        self.assertEqual(this_month['appointments'], 4)
+        self.assertEqual(float(this_month['income']), 1000.0)
+        self.assertEqual(data['service_stats'], [{'service_name': 'Pipes', 'appointment_count': 4}])
+
+
+class WorkerAnalyticsRollupTests(JobsTestCase):
+    def rollup(self, *args):
+        call_command('rollup_worker_analytics', *args, stdout=StringIO())
+        return rollup_totals(self.worker)
+
+    def test_incremental_rollup_follows_moves_and_deletes(self):
+        appointments = [self.book(days=days) for days in (1, 2, 3, 3)]
+        self.assertEqual(self.rollup()['total'], 4)
+
+        appointments[0].delete()
+        appointments[1].appointment_date += timedelta(days=10)
+        appointments[1].save()
+        appointments[2].status = 'completed'
+        appointments[2].save()
+
+        totals = self.rollup()
+        self.assertEqual(totals['total'], Appointment.objects.filter(worker=self.worker).count())
+        self.assertEqual(totals['completed'], 1)
+        self.assertEqual(totals, self.rollup('--full'))
+
+    def test_full_rebuild_zeroes_days_without_appointments(self):
+        appointment = self.book(days=1)
+        self.rollup()
+        # A queryset update skips the signals, so only a full rebuild sees the old day
+        Appointment.objects.filter(pk=appointment.pk).update(appointment_date=appointment.appointment_date + timedelta(days=5))
+        self.rollup('--full')
+        self.assertEqual(
+            list(self.worker.analytics.order_by('date').values_list('total_appointments', flat=True)),
+            [0, 1],
+        )
+
+
+class FlakyEmailBackend(BaseEmailBackend):
+    """Records delivered subjects; raises once for every subject listed in `failures`"""
+    delivered = []
+    failures = set()
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if message.subject in self.failures:
+                self.failures.discard(message.subject)
+                raise smtplib.SMTPDataError(451, 'Try again later')
+            self.delivered.append(message.subject)
+        return len(email_messages)
+
+
+class ExportTests(JobsTestCase):
+    def export(self, dataset, **params):
+        return self.client.get(reverse('export_data', args=[dataset]), params)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_only_the_workers_rows_in_date_order(self):
+        later, earlier = self.book(days=3, location='Later'), self.book(days=1, location='Earlier')
+        other_user = User.objects.create_user(username='other', password='pass')
+        self.book(worker=Worker.objects.create(owner=other_user, name='Other', phone_number='+9779841000002'))
+        self.client.force_login(self.worker_user)
+
+        rows = list(csv.reader(StringIO(self.read(self.export('appointments')))))
+
+        self.assertEqual(rows[0][:3], ['id', 'appointment_date', 'status'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [earlier.pk, later.pk])
+        self.assertEqual(rows[1][rows[0].index('location')], 'Earlier')
+
+    def test_jsonl_honours_the_date_range(self):
+        self.book(days=1)
+        inside = self.book(days=5)
+        self.client.force_login(self.worker_user)
+        day = timezone.localtime(inside.appointment_date).date().isoformat()
+
+        lines = self.read(self.export('appointments', format='jsonl', start=day, end=day)).splitlines()
+
+        self.assertEqual([json.loads(line)['id'] for line in lines], [inside.pk])
+
+    def test_customers_and_bad_requests_are_refused(self):
+        self.client.force_login(self.customer_user)
+        self.assertEqual(self.export('appointments').status_code, 403)
+
+        self.client.force_login(self.worker_user)
+        for dataset, params in (('payroll', {}), ('appointments', {'format': 'xml'}), ('appointments', {'start': '2024-13-01'})):
+            with self.subTest(dataset=dataset, params=params):
+                self.assertEqual(self.export(dataset, **params).status_code, 400)
+
+
+class AppointmentEmailTests(JobsTestCase):
+    def test_batch_renders_without_per_email_queries(self):
+        for _ in range(3):
+            self.book()
+        appointments = list(with_email_related(Appointment.objects.filter(worker=self.worker)))
+
+        with self.assertNumQueries(0):
+            messages = [build_appointment_status_email(appointment, 'accepted') for appointment in appointments]
+
+        self.assertEqual(messages[0].subject, 'Appointment Confirmed - Worker')
+        self.assertEqual(messages[0].to, ['customer@example.com'])
+        self.assertIn('Service: Fix leak', messages[0].body)
+        self.assertIn('Fix leak', messages[0].alternatives[0][0])
+
+
+class EmailDispatcherTests(TestCase):
+    def setUp(self):
+        FlakyEmailBackend.delivered = []
+        FlakyEmailBackend.failures = set()
+        self.dispatcher = EmailDispatcher(backend='jobs.tests.FlakyEmailBackend', retry_backoff=0)
+
+    def messages(self, count):
+        return [EmailMessage(f'Message {number}', 'Body', 'from@example.com', ['to@example.com']) for number in range(count)]
+
+    def test_retry_resends_only_the_failed_message(self):
+        FlakyEmailBackend.failures = {'Message 2'}
+        self.assertEqual(self.dispatcher.send_messages(self.messages(5)), 5)
+        self.assertEqual(FlakyEmailBackend.delivered, [f'Message {number}' for number in range(5)])
+
+    def test_messages_before_a_permanent_failure_stay_delivered(self):
+        self.dispatcher.max_retries = 0
+        FlakyEmailBackend.failures = {'Message 1'}
+        with self.assertRaises(smtplib.SMTPDataError):
+            self.dispatcher.send_messages(self.messages(3))
+        self.assertEqual(FlakyEmailBackend.delivered, ['Message 0'])
+
+
+@override_settings(EMAIL_DISPATCH={'backend': 'jobs.tests.FlakyEmailBackend', 'max_retries': 0})
+class NotificationDigestTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_dispatcher()
+        self.addCleanup(reset_dispatcher)
+        FlakyEmailBackend.delivered = []
+        other_user = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        self.other = Worker.objects.create(owner=other_user, name='Other', phone_number='+9779841000002')
+        # Different counts give the two digests different subjects
+        for worker, count in ((self.worker, 1), (self.other, 2)):
+            worker.settings.email_frequency = 'digest'
+            worker.settings.save()
+            for number in range(count):
+                Notification.objects.create(worker=worker, notification_type='appointment_request', title=f'Note {number}', message='Hello')
+
+    def test_failed_digest_does_not_block_the_rest_of_the_chunk(self):
+        FlakyEmailBackend.failures = {'You have 1 new notification on BlueCaller'}
+        call_command('send_notification_digests', stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(FlakyEmailBackend.delivered, ['You have 2 new notifications on BlueCaller'])
+        self.assertFalse(Notification.objects.filter(worker=self.other, emailed_at__isnull=True).exists())
+        self.assertFalse(Notification.objects.filter(worker=self.worker, emailed_at__isnull=False).exists())
+
+
+class WorkerNotificationSettingsTests(JobsTestCase):
+    def test_worker_can_choose_digest_emails(self):
+        self.client.force_login(self.worker_user)
+        self.assertContains(self.client.get(reverse('worker_settings')), 'name="email_frequency"')
+
+        self.client.post(reverse('worker_settings'), {
+            'section': 'notifications', 'email_notifications': 'on', 'email_frequency': 'digest',
+        })
+
+        self.worker.settings.refresh_from_db()
+        self.assertTrue(self.worker.settings.email_notifications)
+        self.assertFalse(self.worker.settings.review_notifications)
+        self.assertEqual(worker_email_mode(self.worker), 'digest')
+
+
+class EarningsLedgerTests(JobsTestCase):
+    def test_balance_follows_posting_order_not_ids(self):
+        first, second = self.book(status='completed'), self.book(status='completed')
+        # Unposted row from the old booking-time signal: it has the lower id
+        # but is posted last
+        legacy = WorkerEarning.objects.create(
+            worker=self.worker, appointment=second, amount=Decimal('1.00'), net_amount=Decimal('1.00'),
+        )
+        post_earnings([first])
+        post_earnings([second])
+
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.ledger_sequence, 2)
+        self.assertEqual(latest_balance(self.worker), Decimal('900.00'))
+        self.assertEqual(legacy.running_balance, latest_balance(self.worker))
+
+    def test_posting_is_idempotent(self):
+        appointment = self.book(status='completed')
+        self.assertEqual(post_earnings([appointment]), 1)
+        self.assertEqual(post_earnings([appointment]), 0)
+        self.assertEqual(latest_balance(self.worker), Decimal('450.00'))
+
+    def test_amount_matches_appointment_pricing(self):
+        self.pricing.night_shift_extra = Decimal('100.00')
+        self.pricing.save()
+        appointment = self.book(status='completed', shift_type='night')
+        appointment.total_price = None
+        self.assertEqual(earning_amount(appointment), Decimal('600.00'))
+        self.assertEqual(earning_amount(appointment), appointment.calculate_total_price())
+
+
+class ConversionFunnelTests(JobsTestCase):
+    def test_stages_cover_the_same_appointments(self):
+        accepted, completed = self.book(), self.book()
+        self.book()
+        apply_transition(accepted, 'accept')
+        apply_transition(completed, 'accept')
+        apply_transition(completed, 'complete')
+        # Completed before transition timestamps existed: no accepted_at
+        legacy = self.book(status='completed')
+        Appointment.objects.filter(pk=legacy.pk).update(created_at=timestamps_tracked_since() - timedelta(days=1))
+
+        funnel = conversion_funnel(self.worker)
+        self.assertEqual((funnel['requested'], funnel['accepted'], funnel['completed']), (3, 2, 1))
+
+
+class CalendarSubscriptionTests(JobsTestCase):
+    def feed(self, token, **headers):
+        return self.client.get(reverse('worker_calendar_ics', args=[token]), **headers)
+
+    def test_feed_is_revalidated_until_an_appointment_changes(self):
+        appointment = self.book(location='12 Main Road, Kathmandu')
+        token = get_or_create_token(self.worker)
+
+        response = self.feed(token)
+        self.assertContains(response, f'UID:appointment-{appointment.pk}@')
+        self.assertContains(response, 'STATUS:TENTATIVE')
+        self.assertEqual(self.feed(token, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_transition(appointment, 'accept')
+        response = self.feed(token, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, 'STATUS:CONFIRMED')
+
+    def test_rotated_token_is_rejected(self):
+        old_token = get_or_create_token(self.worker)
+        self.assertEqual(self.feed(old_token).status_code, 200)
+
+        self.client.force_login(self.worker_user)
+        self.client.post(reverse('rotate_calendar_token'))
+
+        self.assertEqual(self.feed(old_token).status_code, 404)
+        self.assertEqual(self.feed(get_or_create_token(self.worker)).status_code, 200)
+
+
+class CustomerDashboardTests(JobsTestCase):
+    def dashboard(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('customer_dashboard'))
+        return response, len(queries)
+
+    def test_counts_and_ratings_in_a_constant_number_of_queries(self):
+        self.client.force_login(self.customer_user)
+        rated = self.book(status='completed', days=3)
+        WorkerRating.objects.create(worker=self.worker, appointment=rated, customer=self.customer, rating=4)
+        self.book(status='pending', days=2)
+        self.dashboard()  # warm the cached unread count
+        _, few_queries = self.dashboard()
+
+        for days in range(5):
+            self.book(status='accepted', days=-days)
+        response, many_queries = self.dashboard()
+
+        self.assertEqual(few_queries, many_queries)
+        context = response.context
+        self.assertEqual(
+            (context['total_appointments'], context['pending_count'], context['accepted_count'], context['completed_count']),
+            (7, 1, 5, 1),
+        )
+        self.assertEqual(context['rating_distribution'][4], 100)
+        self.assertEqual([appointment.has_rated for appointment in context['appointments']], [True, False, False])
+
+
+class FavoriteWorkersTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer_user)
+
+    def add_workers(self, count):
+        workers = []
+        for number in range(count):
+            owner = User.objects.create_user(username=f'favorite{number}', password='pass')
+            workers.append(Worker.objects.create(
+                owner=owner, name=f'Favorite {number}', phone_number=f'+97798410100{number:02d}',
+            ))
+        return workers
+
+    def test_favorites_page_is_paginated_and_loaded_in_bulk(self):
+        for worker in self.add_workers(FAVORITES_PAGE_SIZE + 3):
+            FavoriteWorker.objects.create(customer=self.customer, worker=worker)
+        FavoriteWorker.objects.create(customer=self.customer, worker=self.worker)
+        WorkerRating.objects.create(worker=self.worker, appointment=self.book(status='completed'), customer=self.customer, rating=5)
+
+        # Warm the cached unread count read by the context processor
+        self.client.get(reverse('favorite_workers_list'))
+        with CaptureQueriesContext(connection) as first_queries:
+            first_page = self.client.get(reverse('favorite_workers_list'))
+        with CaptureQueriesContext(connection) as last_queries:
+            last_page = self.client.get(reverse('favorite_workers_list'), {'page': 2})
+
+        self.assertEqual(len(first_page.context['favorite_workers']), FAVORITES_PAGE_SIZE)
+        self.assertEqual(len(last_page.context['favorite_workers']), 4)
+        self.assertEqual(len(first_queries), len(last_queries))
+        # Most recently favorited first
+        newest = first_page.context['favorite_workers'][0]['worker']
+        self.assertEqual((newest.pk, newest.total_ratings, newest.average_rating), (self.worker.pk, 1, 5.0))
+
+    def test_toggle_invalidates_the_cached_favorite_ids(self):
+        [worker] = self.add_workers(1)
+        statuses = lambda: self.client.get(reverse('favorite_statuses'), {'ids': f'{worker.pk},{self.worker.pk}'}).json()
+        self.assertEqual(statuses()['favorites'], {str(worker.pk): False, str(self.worker.pk): False})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('toggle_favorite_worker', args=[worker.pk]), HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        self.assertTrue(response.json()['is_favorite'])
+        self.assertEqual(statuses()['favorites'], {str(worker.pk): True, str(self.worker.pk): False})
+
+
+class WorkerCalendarFeedTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.worker_user)
+        today = timezone.localdate()
+        self.window = {'start': today.isoformat(), 'end': (today + timedelta(days=7)).isoformat()}
+
+    def fetch(self, headers=None, **params):
+        return self.client.get(reverse('worker_calendar_feed'), {**self.window, **params}, **(headers or {}))
+
+    def test_unchanged_window_is_not_modified(self):
+        appointment = self.book(days=2)
+        etag = self.fetch()['ETag']
+        self.assertEqual(self.fetch(headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 304)
+
+        appointment.location = 'Elsewhere'
+        appointment.save()
+        self.assertEqual(self.fetch(headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+    def test_delta_reports_changed_moved_and_deleted_appointments(self):
+        edited, moved, deleted = self.book(days=2), self.book(days=3), self.book(days=4)
+        self.book(days=5)
+        since = self.fetch().json()['server_time']
+
+        edited.location = 'Elsewhere'
+        edited.save()
+        moved.appointment_date += timedelta(days=30)
+        moved.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        data = self.fetch(since=since).json()
+        self.assertFalse(data['full'])
+        self.assertEqual([event['id'] for event in data['events']], [edited.pk])
+        self.assertEqual(sorted(data['removed']), sorted([moved.pk, deleted_id]))
+
+    def test_expired_since_gets_the_full_window(self):
+        self.book(days=2)
+        self.book(days=3)
+        data = self.fetch(since=(timezone.now() - timedelta(days=30)).isoformat()).json()
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['events']), 2)
@@ -0,0 +1,175 @@
+# transitions.py - Appointment state machine backed by conditional UPDATEs
+from django.db import transaction
+from django.utils import timezone
+from jobs.earnings import post_earnings
+from jobs.emails import APPOINTMENT_EMAIL_RELATED
+from jobs.events import publish_status_changes
+from jobs.ics_feed import invalidate_calendar_feeds
+from jobs.latency import record_latencies
+from jobs.models import Appointment, Notification
+from jobs.notifications import notify_many
+import logging
+logger = logging.getLogger(__name__)
+
+# Each transition lists the statuses it may start from, any extra column
+# preconditions, the columns it writes and the timestamp column it stamps.
+# Applying a transition is a single `UPDATE ... WHERE id=? AND status IN (...)`,
+# so two concurrent requests can never both win and nothing outside `changes`
+# is rewritten.
+TRANSITIONS = {
+    'accept': {
+        'from': ('pending',),
+        'changes': {'status': 'accepted'},
+        'stamp': 'accepted_at',
+    },
+    'reject': {
+        'from': ('pending',),
+        'changes': {'status': 'rejected'},
+        'stamp': 'rejected_at',
+    },
+    'complete': {
+        'from': ('accepted',),
+        'changes': {'status': 'completed'},
+        'stamp': 'completed_at',
+    },
+    'customer_complete': {
+        'from': ('accepted',),
+        'changes': {'customer_completed': True},
+    },
+    'worker_complete': {
+        'from': ('accepted',),
+        'requires': {'customer_completed': True},
+        'changes': {'status': 'completed', 'worker_completed': True},
+        'stamp': 'completed_at',
+    },
+}
+
+
+class InvalidTransition(Exception):
+    """Raised when an unknown transition name is requested"""
+
+
+def get_transition(action):
+    """Look up a transition definition by name"""
+    try:
+        return TRANSITIONS[action]
+    except KeyError:
+        raise InvalidTransition(f"Unknown appointment transition: {action}")
+
+
+def can_transition(appointment, action):
+    """Check in memory whether `action` is allowed from the appointment's current state"""
+    transition = get_transition(action)
+    if appointment.status not in transition['from']:
+        return False
+    return all(getattr(appointment, field) == value for field, value in transition.get('requires', {}).items())
+
+
+def transition_queryset(queryset, action):
+    """Restrict a queryset to rows that are allowed to take `action`"""
+    transition = get_transition(action)
+    return queryset.filter(status__in=transition['from'], **transition.get('requires', {}))
+
+
+def completes(action):
+    """Whether `action` moves an appointment to 'completed' (and so earns the worker money)"""
+    return get_transition(action)['changes'].get('status') == 'completed'
+
+
+def transition_changes(action):
+    """Return the column values written by `action`, including updated_at and its timestamp"""
+    transition = get_transition(action)
+    changes = dict(transition['changes'])
+    changes['updated_at'] = timezone.now()
+    if 'stamp' in transition:
+        changes[transition['stamp']] = changes['updated_at']
+    return changes
+
+
+def apply_transition(appointment, action):
+    """
+    Apply `action` to a single appointment with one conditional UPDATE.
+    Returns True if this call performed the transition; False if the row was
+    no longer in a valid source state. On success the in-memory instance is
+    updated to match the database.
+    """
+    changes = transition_changes(action)
+    with transaction.atomic():
+        updated = transition_queryset(
+            Appointment.objects.filter(pk=appointment.pk), action
+        ).update(**changes)
+
+        if not updated:
+            logger.info(f"Transition '{action}' rejected for appointment {appointment.pk}: state changed")
+            return False
+
+        for field, value in changes.items():
+            setattr(appointment, field, value)
+        record_latencies([appointment], action)
+        invalidate_calendar_feeds([appointment.worker_id])
+        if completes(action):
+            post_earnings([appointment])
+    publish_status_changes([appointment])
+    return True
+
+
+def bulk_transition(queryset, action):
+    """
+    Apply `action` to every eligible appointment in `queryset` with one
+    set-based UPDATE. Rows that are not in a valid source state are skipped.
+    Returns the list of appointments that were transitioned, with related
+    customer/worker rows loaded so callers can fan out emails without extra
+    queries.
+    """
+    changes = transition_changes(action)
+    with transaction.atomic():
+        appointments = list(
+            transition_queryset(queryset, action)
+            .select_for_update(of=('self',))
+            .select_related(*APPOINTMENT_EMAIL_RELATED)
+        )
+        if not appointments:
+            return []
+
+        transition_queryset(
+            Appointment.objects.filter(pk__in=[appointment.pk for appointment in appointments]), action
+        ).update(**changes)
+
+        for appointment in appointments:
+            for field, value in changes.items():
+                setattr(appointment, field, value)
+        record_latencies(appointments, action)
+        invalidate_calendar_feeds(appointment.worker_id for appointment in appointments)
+        if completes(action):
+            post_earnings(appointments)
+    publish_status_changes(appointments)
+    return appointments
+
+
+# Notifications sent after a transition: (recipient, type, title, message)
+TRANSITION_NOTIFICATIONS = {
+    'accept': ('customer', 'appointment_accepted', 'Appointment Accepted', '{worker} accepted your appointment request'),
+    'reject': ('customer', 'appointment_rejected', 'Appointment Rejected', '{worker} declined your appointment request'),
+    'complete': ('customer', 'appointment_completed', 'Appointment Completed', 'Your appointment with {worker} has been completed'),
+    'customer_complete': ('worker', 'appointment_completed', 'Completion Confirmation Needed', '{customer} marked the appointment as completed'),
+    'worker_complete': ('customer', 'appointment_completed', 'Appointment Completed', 'Your appointment with {worker} has been completed'),
+}
+
+
+def notify_transition(appointments, action):
+    """Create the notifications for a batch of transitioned appointments in one insert"""
+    if action not in TRANSITION_NOTIFICATIONS or not appointments:
+        return
+
+    recipient, notification_type, title, message = TRANSITION_NOTIFICATIONS[action]
+    notify_many([
+        Notification(
+            worker_id=appointment.worker_id if recipient == 'worker' else None,
+            customer_id=appointment.customer_id if recipient == 'customer' else None,
+            appointment=appointment,
+            notification_type=notification_type,
+            title=title,
+            message=message.format(worker=appointment.worker.name, customer=appointment.customer.name),
+        )
+        for appointment in appointments
+    ])
@@ -41,6 +41,7 @@ urlpatterns = [
     path('appointment/<int:appointment_id>/accept/', views.accept_appointment, name='accept_appointment'),
     path('appointment/<int:appointment_id>/reject/', views.reject_appointment, name='reject_appointment'),
     path('appointment/<int:appointment_id>/complete/', views.complete_appointment, name='complete_appointment'),
+    path('appointments/bulk-action/', views.bulk_appointment_action, name='bulk_appointment_action'),
     path('appointment/<int:appointment_id>/delete/', views.delete_appointment, name='delete_appointment'),
     path('appointment/<int:appointment_id>/request-new/', views.request_new_worker, name='request_new_worker'),
      path('appointments/<int:appointment_id>/details/', views.appointment_request_details, name='appointment_request_details'),
@@ -58,6 +59,7 @@ urlpatterns = [
     path('api/worker-notifications/', views.worker_notifications, name='worker_notifications'),
     path('api/mark-notification-read/', views.mark_notification_read, name='mark_notification_read'),
     path('api/mark-all-notifications-read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
+    path('api/notifications/stream/', views.notification_stream, name='notification_stream'),
 
     # Location Tracking API Endpoints
     path('api/update-location/', views.update_current_location, name='update_current_location'),
@@ -83,13 +85,18 @@ urlpatterns = [
     path('favorite-workers/', views.favorite_workers_list, name='favorite_workers_list'),
     path('toggle-favorite-worker/<int:worker_id>/', views.toggle_favorite_worker, name='toggle_favorite_worker'),
     path('check-favorite-status/<int:worker_id>/', views.check_favorite_status, name='check_favorite_status'),
+    path('favorite-statuses/', views.favorite_statuses, name='favorite_statuses'),
 
 
     # Worker section URLs
     path('worker/calendar/', views.worker_calendar, name='worker_calendar'),
+    path('worker/calendar/events/', views.worker_calendar_feed, name='worker_calendar_feed'),
+    path('worker/calendar/reset-link/', views.rotate_calendar_token, name='rotate_calendar_token'),
+    path('calendar/<str:token>.ics', views.worker_calendar_ics, name='worker_calendar_ics'),
     path('worker/reviews/', views.worker_reviews, name='worker_reviews'),
     path('worker/analytics/', views.worker_analytics, name='worker_analytics'),
     path('worker/earnings/', views.worker_earnings, name='worker_earnings'),
+    path('exports/<str:dataset>/', views.export_data, name='export_data'),
     path('worker/settings/', views.worker_settings, name='worker_settings'),
 
     path('delete-worker-review/', views.delete_worker_review, name='delete_worker_review'),
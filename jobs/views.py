@@ -1,17 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, DetailView, CreateView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import login_required
-from jobs.models import Worker, Customer, Appointment, WorkerRating, Service, WorkerService, WorkerSubTaskPricing, ServiceCategory, SubTask
+from jobs.models import Worker, Customer, Appointment, WorkerRating, Service, WorkerService, WorkerSubTaskPricing, ServiceCategory, SubTask, Notification
+from jobs.models import WorkerEarning, WorkerMonthlyEarning, WorkerSettings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.contrib import messages
 from django.utils.timezone import make_aware, now
-from django.core.mail import send_mail
-from django.db.models import Avg, QuerySet, Count
+from django.db.models import Avg, QuerySet, Count, Q, Sum
 from django.db.models import F, ExpressionWrapper, FloatField
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from phonenumber_field.formfields import PhoneNumberField
 from django.views.decorators.http import require_POST
 from datetime import date
@@ -22,8 +22,25 @@ from django.contrib.auth import logout, login, authenticate
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+import ipaddress
 import logging
 from .models import FavoriteWorker 
+from .transitions import apply_transition, bulk_transition, notify_transition
+from .notifications import get_unread_count, decrement_unread_count, reset_unread_count
+from .events import channel_for, get_broker
+from .analytics import conversion_funnel, monthly_activity, open_appointment_counts, rollup_totals, service_popularity
+from .earnings import latest_balance, month_start
+from .latency import latency_summary
+from .calendar_feed import CalendarRangeError, parse_range, parse_since, window_etag, window_events
+from .ics_feed import get_feed, get_or_create_token, rotate_token, worker_id_for_token
+from .favorites import get_favorite_ids, invalidate_favorite_ids, load_favorite_cards
+from .exports import EXPORT_FORMATS, ExportError, export_rows, stream_export
+from .emails import (
+    with_email_related, build_appointment_status_email, build_appointment_completion_email,
+    send_appointment_request_email, send_appointment_status_email, send_appointment_completion_email,
+    send_email_batch,
+)
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt 
 
@@ -35,8 +52,8 @@ except ImportError:
     from django.contrib.auth.models import User as CustomUser
 
 # OTP imports
-from otp_auth.models import OTP
-from otp_auth.utils import send_otp_via_email
+from otp_auth.store import issue_otp, OTPRateLimited
+from otp_auth.delivery import queue_otp_email
 
 # Configure logging for email failures
 logger = logging.getLogger(__name__)
@@ -44,13 +61,22 @@ logger = logging.getLogger(__name__)
 
 # Add these helper functions after the imports
 def get_client_ip(request):
-    """Get client IP address for geolocation fallback"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    """
+    Get the client IP address, or None if it is not a valid address.
+    X-Forwarded-For is only trusted behind TRUSTED_PROXY_COUNT reverse
+    proxies: each proxy appends the address it saw, so the client is that many
+    entries from the right and anything further left is client-supplied.
+    """
+    ip = request.META.get('REMOTE_ADDR')
+    proxy_count = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    if proxy_count:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxy_count:
+            ip = forwarded[-proxy_count]
+    try:
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
 
 def update_user_location_with_coords(user, latitude, longitude, accuracy=None, source='browser'):
     """
@@ -196,325 +222,6 @@ def service_categories(request):
     
     return render(request, 'jobs/service_categories.html', context)
 
-# Enhanced email functions with better formatting and error handling
-def send_appointment_request_email(worker, appointment):
-    """Send email notification to worker when customer requests an appointment"""
-    try:
-        subject = f"New Appointment Request - {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Service'}"
-        
-        # Get price information safely
-        price_info = "Contact for pricing"
-        if appointment.service_subtask and appointment.service_subtask.price:
-            price_info = f"₹{appointment.service_subtask.price}"
-        
-        # Create HTML email template
-        html_message = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c3e50;">New Appointment Request</h2>
-                
-                <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #007bff; margin-top: 0;">Appointment Details</h3>
-                    <p><strong>Customer:</strong> {appointment.customer.name}</p>
-                    <p><strong>Service:</strong> {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Not specified'}</p>
-                    <p><strong>Price:</strong> {price_info}</p>
-                    <p><strong>Date & Time:</strong> {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')}</p>
-                    <p><strong>Location:</strong> {appointment.location or 'Not specified'}</p>
-                    {f"<p><strong>Special Instructions:</strong> {appointment.special_instructions}</p>" if appointment.special_instructions else ""}
-                </div>
-                
-                <div style="background: #e8f4f8; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <h4 style="color: #17a2b8; margin-top: 0;">What's Next?</h4>
-                    <p>Please log in to your BlueCaller dashboard to:</p>
-                    <ul>
-                        <li>Accept or reject this appointment request</li>
-                        <li>View customer contact information</li>
-                        <li>Communicate with the customer</li>
-                    </ul>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{settings.SITE_URL}/worker/dashboard/" 
-                       style="background: #007bff; color: white; padding: 12px 30px; 
-                              text-decoration: none; border-radius: 5px; display: inline-block;">
-                        View Dashboard
-                    </a>
-                </div>
-                
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="color: #666; font-size: 12px;">
-                    This is an automated message from BlueCaller. 
-                    Please do not reply to this email directly.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Plain text version
-        plain_message = f"""
-New Appointment Request
-
-Dear {worker.name},
-
-You have received a new appointment request from {appointment.customer.name}.
-
-Appointment Details:
-- Service: {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Not specified'}
-- Price: {price_info}
-- Date & Time: {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')}
-- Location: {appointment.location or 'Not specified'}
-{f"- Special Instructions: {appointment.special_instructions}" if appointment.special_instructions else ""}
-
-Please log in to your BlueCaller dashboard to accept or reject this request.
-Dashboard: {settings.SITE_URL}/worker/dashboard/
-
-Best regards,
-BlueCaller Team
-        """
-        
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@bluecaller.com')
-        recipients = [worker.owner.email]
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=from_email,
-            recipient_list=recipients,
-            html_message=html_message,
-            fail_silently=False
-        )
-        
-        logger.info(f"Appointment request email sent to worker {worker.name} ({worker.owner.email})")
-        
-    except Exception as e:
-        logger.error(f"Failed to send appointment request email to worker {worker.name}: {str(e)}")
-        # Don't raise the exception to prevent appointment creation from failing
-        pass
-
-def send_appointment_status_email(appointment, status):
-    """Send email notification to customer when appointment status changes"""
-    try:
-        customer = appointment.customer
-        worker = appointment.worker
-        
-        # Get price information safely
-        price_info = "Contact for pricing"
-        if appointment.service_subtask and appointment.service_subtask.price:
-            price_info = f"₹{appointment.service_subtask.price}"
-        
-        if status == 'accepted':
-            subject = f"Appointment Confirmed - {worker.name}"
-            status_message = "Your appointment has been confirmed!"
-            status_color = "#28a745"
-            next_steps = """
-            <p>Your appointment is now confirmed. Here's what happens next:</p>
-            <ul>
-                <li>The worker will contact you if needed</li>
-                <li>Please be available at the scheduled time</li>
-                <li>You can contact the worker through our platform</li>
-            </ul>
-            """
-        else:  # rejected
-            subject = f"Appointment Update - {worker.name}"
-            status_message = "Your appointment request was declined"
-            status_color = "#dc3545"
-            next_steps = """
-            <p>Unfortunately, this worker was unable to accept your appointment. You can:</p>
-            <ul>
-                <li>Browse other available workers</li>
-                <li>Try a different date and time with the same worker</li>
-                <li>Contact our support team for assistance</li>
-            </ul>
-            """
-        
-        html_message = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c3e50;">Appointment Update</h2>
-                
-                <div style="background: {status_color}; color: white; padding: 15px; 
-                           border-radius: 8px; text-align: center; margin: 20px 0;">
-                    <h3 style="margin: 0;">{status_message}</h3>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #007bff; margin-top: 0;">Appointment Details</h3>
-                    <p><strong>Worker:</strong> {worker.name}</p>
-                    <p><strong>Service:</strong> {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Not specified'}</p>
-                    <p><strong>Price:</strong> {price_info}</p>
-                    <p><strong>Date & Time:</strong> {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')}</p>
-                    <p><strong>Location:</strong> {appointment.location or 'Not specified'}</p>
-                    {f"<p><strong>Special Instructions:</strong> {appointment.special_instructions}</p>" if appointment.special_instructions else ""}
-                </div>
-                
-                <div style="background: #e8f4f8; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <h4 style="color: #17a2b8; margin-top: 0;">What's Next?</h4>
-                    {next_steps}
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{settings.SITE_URL}/customer/appointments/" 
-                       style="background: #007bff; color: white; padding: 12px 30px; 
-                              text-decoration: none; border-radius: 5px; display: inline-block;">
-                        View My Appointments
-                    </a>
-                    <a href="{settings.SITE_URL}/get-started/" 
-                       style="background: #28a745; color: white; padding: 12px 30px; 
-                              text-decoration: none; border-radius: 5px; display: inline-block; margin-left: 10px;">
-                        Browse Workers
-                    </a>
-                </div>
-                
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="color: #666; font-size: 12px;">
-                    This is an automated message from BlueCaller. 
-                    Please do not reply to this email directly.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Plain text version
-        plain_message = f"""
-Appointment Update
-
-Dear {customer.name},
-
-{status_message}
-
-Appointment Details:
-- Worker: {worker.name}
-- Service: {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Not specified'}
-- Price: {price_info}
-- Date & Time: {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')}
-- Location: {appointment.location or 'Not specified'}
-{f"- Special Instructions: {appointment.special_instructions}" if appointment.special_instructions else ""}
-
-View your appointments: {settings.SITE_URL}/customer/appointments/
-Browse workers: {settings.SITE_URL}/get-started/
-
-Best regards,
-BlueCaller Team
-        """
-        
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@bluecaller.com')
-        recipients = [customer.owner.email]
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=from_email,
-            recipient_list=recipients,
-            html_message=html_message,
-            fail_silently=False
-        )
-        
-        logger.info(f"Appointment status email ({status}) sent to customer {customer.name} ({customer.owner.email})")
-        
-    except Exception as e:
-        logger.error(f"Failed to send appointment status email to customer {customer.name}: {str(e)}")
-        # Don't raise the exception to prevent the main action from failing
-        pass
-
-def send_appointment_completion_email(appointment):
-    """Send email notification when appointment is completed"""
-    try:
-        customer = appointment.customer
-        worker = appointment.worker
-        
-        subject = f"Appointment Completed - Please Rate Your Experience"
-        
-        html_message = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2c3e50;">Appointment Completed</h2>
-                
-                <div style="background: #28a745; color: white; padding: 15px; 
-                           border-radius: 8px; text-align: center; margin: 20px 0;">
-                    <h3 style="margin: 0;">Your appointment has been completed!</h3>
-                </div>
-                
-                <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="color: #007bff; margin-top: 0;">Appointment Details</h3>
-                    <p><strong>Worker:</strong> {worker.name}</p>
-                    <p><strong>Service:</strong> {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Not specified'}</p>
-                    <p><strong>Date & Time:</strong> {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')}</p>
-                </div>
-                
-                <div style="background: #fff3cd; padding: 15px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #ffc107;">
-                    <h4 style="color: #856404; margin-top: 0;">Rate Your Experience</h4>
-                    <p style="color: #856404;">
-                        Help other customers by rating your experience with {worker.name}. 
-                        Your feedback helps maintain service quality on our platform.
-                    </p>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="{settings.SITE_URL}/rate-worker/{appointment.id}/" 
-                       style="background: #ffc107; color: #333; padding: 12px 30px; 
-                              text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Rate & Review
-                    </a>
-                    <a href="{settings.SITE_URL}/customer/appointments/" 
-                       style="background: #007bff; color: white; padding: 12px 30px; 
-                              text-decoration: none; border-radius: 5px; display: inline-block; margin-left: 10px;">
-                        View Appointments
-                    </a>
-                </div>
-                
-                <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                <p style="color: #666; font-size: 12px;">
-                    This is an automated message from BlueCaller. 
-                    Please do not reply to this email directly.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Plain text version
-        plain_message = f"""
-Appointment Completed
-
-Dear {customer.name},
-
-Your appointment with {worker.name} has been completed!
-
-Appointment Details:
-- Worker: {worker.name}
-- Service: {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Not specified'}
-- Date & Time: {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')}
-
-Please take a moment to rate your experience: {settings.SITE_URL}/rate-worker/{appointment.id}/
-View your appointments: {settings.SITE_URL}/customer/appointments/
-
-Best regards,
-BlueCaller Team
-        """
-        
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@bluecaller.com')
-        recipients = [customer.owner.email]
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=from_email,
-            recipient_list=recipients,
-            html_message=html_message,
-            fail_silently=False
-        )
-        
-        logger.info(f"Appointment completion email sent to customer {customer.name} ({customer.owner.email})")
-        
-    except Exception as e:
-        logger.error(f"Failed to send appointment completion email to customer {customer.name}: {str(e)}")
-        raise
-
 def _haversine_km(lat1, lon1, lat2, lon2):
     """Return distance in km between two lat/lon points using Haversine formula."""
     try:
@@ -707,6 +414,11 @@ class WorkerListView(ListView):
             # Add distance to worker object for template access
             w.distance_km = worker_info['distance_km']
 
+        # Favorite flags for the cards come from the customer's cached id set
+        favorite_ids = get_favorite_ids(customer) if customer else set()
+        for worker_info in workers_with_distance:
+            worker_info['worker'].is_favorite = worker_info['worker'].pk in favorite_ids
+
         # Replace the object_list with our sorted list of workers
         context['object_list'] = [worker_info['worker'] for worker_info in workers_with_distance]
         context['workers_with_distance'] = workers_with_distance
@@ -1117,7 +829,7 @@ def handle_login(request):
     if request.session.get('needs_login_otp'):
         user_id = request.session.get('login_user_id')
         if user_id:
-            return redirect('verify_login_otp', user_id=user_id)
+            return redirect('otp_auth:verify_login_otp', user_id=user_id)
     
     # Try to detect worker profile
     try:
@@ -1266,15 +978,24 @@ def custom_login(request):
         
         if user is not None:
             # Generate OTP for login verification
-            otp = OTP.create_otp(user, "login")
-            send_otp_via_email(user, otp.code)
+            try:
+                code = issue_otp(user, "login", ip_address=get_client_ip(request))
+            except OTPRateLimited as e:
+                # Never fall through to allauth with this POST: valid
+                # credentials would log the user in without an OTP
+                messages.error(request, f"Too many OTP requests. Please try again in {e.retry_after // 60} minutes.")
+                from allauth.account.forms import LoginForm
+                response = render(request, 'account/login.html', {'form': LoginForm(request=request)}, status=429)
+                response['Retry-After'] = str(e.retry_after)
+                return response
+            queue_otp_email(user, code, "login")
             
             # Store user ID in session for OTP verification
             request.session['needs_login_otp'] = True
             request.session['login_user_id'] = user.id
             
             messages.info(request, "An OTP has been sent to your email. Please verify to login.")
-            return redirect('verify_login_otp', user_id=user.id)
+            return redirect('otp_auth:verify_login_otp', user_id=user.id)
         else:
             messages.error(request, "Invalid credentials. Please try again.")
     
@@ -1302,16 +1023,26 @@ def custom_signup(request):
             user.is_active = False  # User will be activated after OTP verification
             user.save()
             
-            # Generate OTP for signup verification
-            otp = OTP.create_otp(user, "signup")
-            send_otp_via_email(user, otp.code)
+            # Generate OTP for signup verification (a brand-new user cannot
+            # have hit the per-user limit, only the per-IP one)
+            try:
+                code = issue_otp(user, "signup", ip_address=get_client_ip(request))
+            except OTPRateLimited as e:
+                user.delete()
+                # Re-running SignupView with this POST would create the account
+                # again without an OTP
+                messages.error(request, f"Too many OTP requests. Please try again in {e.retry_after // 60} minutes.")
+                response = render(request, 'account/signup.html', {'form': form}, status=429)
+                response['Retry-After'] = str(e.retry_after)
+                return response
+            queue_otp_email(user, code, "signup")
             
             # Store user ID in session for OTP verification
             request.session['needs_signup_otp'] = True
             request.session['signup_user_id'] = user.id
             
             messages.info(request, "An OTP has been sent to your email. Please verify to complete registration.")
-            return redirect('verify_signup_otp', user_id=user.id)
+            return redirect('otp_auth:verify_signup_otp', user_id=user.id)
     else:
         from allauth.account.forms import SignupForm
         form = SignupForm()
@@ -1403,24 +1134,40 @@ def appoint_worker(request, worker_id):
     return redirect('worker-detail', pk=worker_id)
 
 
+CUSTOMER_APPOINTMENTS_PAGE_SIZE = 10
+
 @login_required
 def customer_appointments(request):
     customer = get_object_or_404(Customer, owner=request.user)
-    appointments = Appointment.objects.filter(customer=customer).order_by('-appointment_date')
-    
-    for appointment in appointments:
-        appointment.has_rated = WorkerRating.objects.filter(
-            appointment=appointment,
-            customer=customer
-        ).exists()
+    appointments = Appointment.objects.filter(customer=customer)
+
+    appointment_counts = appointments.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+
+    # One page of appointments with has_rated annotated in the same query
+    paginator = Paginator(
+        appointments.with_rating_status()
+        .select_related('worker', 'customer__owner')
+        .order_by('-appointment_date', '-id'),
+        CUSTOMER_APPOINTMENTS_PAGE_SIZE,
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
 
     # Add current_page context
     context = {
-        'appointments': appointments,
+        'customer': customer,
+        'appointments': page_obj.object_list,
+        'page_obj': page_obj,
+        'total_appointments': appointment_counts['total'],
+        'pending_count': appointment_counts['pending'],
+        'completed_count': appointment_counts['completed'],
         'current_page': 'appointments'
     }
     
-    return render(request, 'jobs/customer_dashboard.html', context)
+    return render(request, 'jobs/customer_appointments.html', context)
 
 @require_POST
 @login_required
@@ -1435,10 +1182,26 @@ def request_new_worker(request, appointment_id):
     return redirect('worker-list')
 
 # NEW: Worker Dashboard View
+WORKER_DASHBOARD_PAGE_SIZE = 10
+WORKER_DASHBOARD_TABS = ('all', 'pending', 'accepted', 'completed')
+
+# Columns the dashboard cards actually render
+WORKER_DASHBOARD_FIELDS = (
+    'id', 'appointment_date', 'status', 'location', 'special_instructions',
+    'customer_completed', 'worker_completed', 'created_at',
+    'customer__name', 'customer__phone_number', 'customer__profile_pic',
+    'service_subtask__pricing_type', 'service_subtask__price', 'service_subtask__experience_level',
+    'service_subtask__night_shift_extra', 'service_subtask__min_hours',
+    'service_subtask__subtask__name', 'service_subtask__subtask__description',
+)
+
 @login_required
 def worker_dashboard(request):
     """
-    Main dashboard view for workers to see their appointments
+    Main dashboard view for workers to see their appointments.
+    Each tab is paginated on its own (?all_page=, ?pending_page=, ...), and
+    tab counts come from one grouped query, so the page costs the same number
+    of queries however many jobs the worker has done.
     """
     try:
         worker = request.user.worker
@@ -1446,29 +1209,40 @@ def worker_dashboard(request):
         messages.error(request, "You don't have a worker profile.")
         return redirect('worker-list')
     
-    # Get all appointments for this worker with explicit field selection
-    # This prevents Django from trying to access non-existent fields like 'uuid'
-    appointments = Appointment.objects.filter(worker=worker).select_related(
+    appointments = Appointment.objects.filter(worker=worker)
+
+    # Per-status counts in a single GROUP BY query
+    status_counts = dict(
+        appointments.order_by().values_list('status').annotate(total=Count('id'))
+    )
+    tab_counts = {status: status_counts.get(status, 0) for status in WORKER_DASHBOARD_TABS[1:]}
+    tab_counts['all'] = sum(status_counts.values())
+
+    rows = appointments.select_related(
         'customer', 'service_subtask', 'service_subtask__subtask'
-    ).only(
-        'id', 'customer', 'worker', 'appointment_date', 'status', 
-        'service_subtask', 'location', 'special_instructions',
-        'customer_completed', 'worker_completed', 'created_at'
-    ).order_by('-appointment_date')
-    
-    # Separate appointments by status for better organization
-    pending_appointments = appointments.filter(status='pending')
-    accepted_appointments = appointments.filter(status='accepted')
-    completed_appointments = appointments.filter(status='completed')
-    rejected_appointments = appointments.filter(status='rejected')
+    ).only(*WORKER_DASHBOARD_FIELDS).order_by('-appointment_date', '-id')
+
+    pages = {}
+    for tab in WORKER_DASHBOARD_TABS:
+        paginator = Paginator(rows if tab == 'all' else rows.filter(status=tab), WORKER_DASHBOARD_PAGE_SIZE)
+        # The count is already known from the grouped query; skip COUNT(*)
+        paginator.count = tab_counts[tab]
+        pages[tab] = paginator.get_page(request.GET.get(f'{tab}_page'))
+
+    # Open the tab the user was paging through
+    active_tab = next((tab for tab in WORKER_DASHBOARD_TABS if f'{tab}_page' in request.GET), 'all')
     
     context = {
         'worker': worker,
-        'appointments': appointments,
-        'pending_appointments': pending_appointments,
-        'accepted_appointments': accepted_appointments,
-        'completed_appointments': completed_appointments,
-        'rejected_appointments': rejected_appointments,
+        'appointments': pages['all'],
+        'pending_appointments': pages['pending'],
+        'accepted_appointments': pages['accepted'],
+        'completed_appointments': pages['completed'],
+        'total_count': tab_counts['all'],
+        'pending_count': tab_counts['pending'],
+        'accepted_count': tab_counts['accepted'],
+        'completed_count': tab_counts['completed'],
+        'active_tab': active_tab,
         'today': timezone.now().date(),
     }
     
@@ -1494,7 +1268,9 @@ def worker_appointments(request, worker_id=None):
             messages.error(request, "You don't have a worker profile.")
             return redirect('worker-list')
     
-    appointments = Appointment.objects.filter(worker=worker).order_by('-appointment_date')
+    appointments = Appointment.objects.filter(worker=worker).select_related(
+        'customer', 'service_subtask', 'service_subtask__subtask'
+    ).order_by('-appointment_date')
     return render(request, 'jobs/worker_appointments.html', {
         'appointments': appointments,
         'worker': worker
@@ -1502,7 +1278,7 @@ def worker_appointments(request, worker_id=None):
 
 @login_required
 def accept_appointment(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(with_email_related(Appointment.objects), id=appointment_id)
     
     # Check if the current user is the owner of the worker
     if appointment.worker.owner != request.user:
@@ -1510,10 +1286,9 @@ def accept_appointment(request, appointment_id):
         return redirect('worker_dashboard')
 
     if request.method == 'POST':
-        if appointment.status == 'pending':
-            appointment.status = 'accepted'
-            appointment.save()
-            
+        if apply_transition(appointment, 'accept'):
+            notify_transition([appointment], 'accept')
+
             # Send email notification to customer
             try:
                 send_appointment_status_email(appointment, 'accepted')
@@ -1531,7 +1306,7 @@ def accept_appointment(request, appointment_id):
 
 @login_required
 def reject_appointment(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(with_email_related(Appointment.objects), id=appointment_id)
     
     # Check if the current user is the owner of the worker
     if appointment.worker.owner != request.user:
@@ -1539,10 +1314,9 @@ def reject_appointment(request, appointment_id):
         return redirect('worker_dashboard')
 
     if request.method == 'POST':
-        if appointment.status == 'pending':
-            appointment.status = 'rejected'
-            appointment.save()
-            
+        if apply_transition(appointment, 'reject'):
+            notify_transition([appointment], 'reject')
+
             # Send email notification to customer
             try:
                 send_appointment_status_email(appointment, 'rejected')
@@ -1558,6 +1332,89 @@ def reject_appointment(request, appointment_id):
     
     return redirect('worker_dashboard')
 
+# Bulk actions available from the worker dashboard, mapped to their transition
+# and the email sent to each affected customer
+BULK_APPOINTMENT_ACTIONS = {
+    'accept': lambda appointment: build_appointment_status_email(appointment, 'accepted'),
+    'reject': lambda appointment: build_appointment_status_email(appointment, 'rejected'),
+    'complete': build_appointment_completion_email,
+}
+
+@require_POST
+@login_required
+def bulk_appointment_action(request):
+    """
+    Accept, reject or complete several appointments in one request.
+    Accepts form data (appointment_ids, action) or a JSON body with the same keys.
+    """
+    try:
+        worker = request.user.worker
+    except AttributeError:
+        messages.error(request, "You don't have a worker profile.")
+        return redirect('worker-list')
+
+    is_json = request.content_type == 'application/json'
+    if is_json:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'The JSON body must be an object'}, status=400)
+        action = data.get('action')
+        raw_ids = data.get('appointment_ids', [])
+        if not isinstance(raw_ids, list):
+            return JsonResponse({'error': "'appointment_ids' must be a list"}, status=400)
+    else:
+        action = request.POST.get('action')
+        raw_ids = request.POST.getlist('appointment_ids')
+
+    try:
+        appointment_ids = {int(appointment_id) for appointment_id in raw_ids}
+    except (ValueError, TypeError):
+        if is_json:
+            return JsonResponse({'error': 'Appointment ids must be integers'}, status=400)
+        return HttpResponseBadRequest("Appointment ids must be integers")
+
+    if action not in BULK_APPOINTMENT_ACTIONS or not appointment_ids:
+        if is_json:
+            return JsonResponse({'error': 'A valid action and at least one appointment id are required'}, status=400)
+        messages.error(request, "Please select at least one appointment and an action.")
+        return redirect('worker_dashboard')
+
+    # Scoping the queryset to this worker doubles as the authorization check
+    appointments = bulk_transition(
+        Appointment.objects.filter(worker=worker, id__in=appointment_ids), action
+    )
+    notify_transition(appointments, action)
+
+    build_email = BULK_APPOINTMENT_ACTIONS[action]
+    email_messages = []
+    for appointment in appointments:
+        try:
+            email_messages.append(build_email(appointment))
+        except Exception as e:
+            logger.error(f"Failed to build {action} email for appointment {appointment.id}: {e}")
+    send_email_batch(email_messages)
+
+    updated_ids = [appointment.id for appointment in appointments]
+    skipped_count = len(appointment_ids) - len(updated_ids)
+    logger.info(f"Bulk '{action}' by worker {worker.id}: {len(updated_ids)} updated, {skipped_count} skipped")
+
+    if is_json:
+        return JsonResponse({
+            'success': True,
+            'action': action,
+            'updated_ids': updated_ids,
+            'skipped_count': skipped_count,
+        })
+
+    if updated_ids:
+        messages.success(request, f"{len(updated_ids)} appointment(s) updated.")
+    if skipped_count:
+        messages.warning(request, f"{skipped_count} appointment(s) were skipped because their status no longer allows this action.")
+    return redirect('worker_dashboard')
+
 @login_required
 def delete_appointment(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id)
@@ -1577,17 +1434,16 @@ def delete_appointment(request, appointment_id):
 
 @login_required
 def complete_appointment(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(with_email_related(Appointment.objects), id=appointment_id)
 
     if appointment.worker.owner != request.user:
         messages.error(request, "You are not allowed to complete this appointment.")
         return redirect('worker_dashboard')
 
     if request.method == 'POST':
-        if appointment.status == 'accepted':
-            appointment.status = 'completed'
-            appointment.save()
-            
+        if apply_transition(appointment, 'complete'):
+            notify_transition([appointment], 'complete')
+
             # Send completion email to customer
             try:
                 send_appointment_completion_email(appointment)
@@ -1679,20 +1535,17 @@ def mark_customer_completed(request, pk):
         return HttpResponseForbidden("Only the customer can mark this appointment as completed.")
 
     # Customer can only mark completed if the worker has accepted the job
-    if appointment.status != 'accepted':
+    if not apply_transition(appointment, 'customer_complete'):
         messages.error(request, "You can only mark appointments as completed after they are accepted.")
         return redirect('customer_appointments')
-
-    # Mark as completed by customer
-    appointment.customer_completed = True
-    appointment.save()
+    notify_transition([appointment], 'customer_complete')
 
     messages.success(request, "You marked the appointment as completed. Now the worker must confirm.")
     return redirect('customer_appointments')
 
 @login_required
 def mark_worker_completed(request, pk):
-    appointment = get_object_or_404(Appointment, pk=pk)
+    appointment = get_object_or_404(with_email_related(Appointment.objects), pk=pk)
 
     # Ensure the logged-in user is the assigned worker
     if not hasattr(request.user, 'worker') or appointment.worker != request.user.worker:
@@ -1704,10 +1557,11 @@ def mark_worker_completed(request, pk):
         return redirect('worker_dashboard')
 
     # Worker can now confirm completion
-    appointment.status = 'completed'
-    appointment.worker_completed = True
-    appointment.save()
-    
+    if not apply_transition(appointment, 'worker_complete'):
+        messages.warning(request, "This appointment is no longer awaiting completion.")
+        return redirect('worker_dashboard')
+    notify_transition([appointment], 'worker_complete')
+
     # Send completion email to customer
     try:
         send_appointment_completion_email(appointment)
@@ -1861,105 +1715,78 @@ def customer_dashboard(request):
     """Customer dashboard view with stats, appointments, and ratings"""
     customer = get_object_or_404(Customer, owner=request.user)
     
-    # Get appointments
-    appointments_list = Appointment.objects.filter(customer=customer).order_by('-appointment_date')
-    
-    # Add rating status to each appointment
-    for appointment in appointments_list:
-        appointment.has_rated = WorkerRating.objects.filter(
-            appointment=appointment,
-            customer=customer
-        ).exists()
-    
-    # Count appointments by status
-    pending_appointments = appointments_list.filter(status='pending')
-    accepted_appointments = appointments_list.filter(status='accepted')
-    completed_appointments = appointments_list.filter(status='completed')
+    appointments_list = Appointment.objects.filter(customer=customer)
+
+    # Every status count in a single conditional-aggregate query
+    appointment_counts = appointments_list.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        accepted=Count('id', filter=Q(status='accepted')),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+
+    # Recent appointments for display, with the rating flag worked out in SQL
+    recent_appointments = list(
+        appointments_list
+        .with_rating_status()
+        .select_related('worker')
+        .order_by('-appointment_date')[:3]
+    )
     
     # Get favorite workers count
     favorite_workers_count = FavoriteWorker.objects.filter(customer=customer).count()
     
-    # Get recent appointments for display
-    recent_appointments = appointments_list[:3]
-    
-    # Get completed appointments for activity section
-    completed_for_activity = completed_appointments[:4]
-    
     # Get worker appointment requests
-    worker_requests = Appointment.objects.filter(
-        customer=customer,
+    worker_requests = list(appointments_list.filter(
         status='pending'
-    ).select_related('worker', 'service_subtask', 'service_subtask__subtask').order_by('-created_at')
+    ).select_related('worker', 'service_subtask', 'service_subtask__subtask').order_by('-created_at'))
     
-    # NEW: Ratings and Reviews Data - USING YOUR EXISTING BAYESIAN FUNCTION
+    # Ratings and reviews the customer has given: total, average and star
+    # distribution all come from one aggregate
     customer_ratings = WorkerRating.objects.filter(customer=customer).select_related(
         'worker', 'appointment', 'appointment__service_subtask__subtask'
     ).order_by('-created_at')
-    
-    total_reviews = customer_ratings.count()
-    
-    # Calculate average rating for CUSTOMER'S reviews (simple average since it's the customer's own ratings)
-    if total_reviews > 0:
-        # For customer's own rating summary, use simple average of their ratings
-        ratings_list = [rating.rating for rating in customer_ratings]
-        average_rating = sum(ratings_list) / len(ratings_list)
-        average_rating_int = int(average_rating)
-        
-        # Also get Bayesian averages for each worker the customer rated (for display if needed)
-        worker_bayesian_ratings = {}
-        for rating in customer_ratings:
-            worker = rating.worker
-            worker_bayesian_ratings[worker.id] = worker.bayesian_average_rating()
-    else:
-        average_rating = 0.0
-        average_rating_int = 0
-        worker_bayesian_ratings = {}
-    
-    # Calculate rating distribution for CUSTOMER'S reviews
-    rating_distribution = {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
-    for rating in customer_ratings:
-        if 1 <= rating.rating <= 5:
-            rating_distribution[rating.rating] += 1
+
+    rating_stats = customer_ratings.aggregate(
+        total=Count('id'),
+        average=Avg('rating'),
+        **{f'stars_{star}': Count('id', filter=Q(rating=star)) for star in range(1, 6)},
+    )
+    total_reviews = rating_stats['total']
+    average_rating = rating_stats['average'] or 0.0
     
     # Convert to percentages for display
-    rating_distribution_percent = {}
-    if total_reviews > 0:
-        for star in [5, 4, 3, 2, 1]:
-            rating_distribution_percent[star] = round((rating_distribution[star] / total_reviews) * 100)
-    else:
-        rating_distribution_percent = {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
+    rating_distribution_percent = {
+        star: round(rating_stats[f'stars_{star}'] / total_reviews * 100) if total_reviews else 0
+        for star in [5, 4, 3, 2, 1]
+    }
     
     # Get recent reviews (last 5)
     recent_reviews = customer_ratings[:5]
     
     # Get pending reviews (completed appointments without ratings)
-    pending_reviews = completed_appointments.filter(
+    pending_reviews = appointments_list.filter(
+        status='completed',
         customer_completed=True,
         worker_completed=True
     ).exclude(
         id__in=WorkerRating.objects.filter(customer=customer).values('appointment_id')
-    )[:5]
-    
-    # Calculate total reviews given (you already have this as total_reviews)
-    total_reviews_given = total_reviews
+    ).order_by('-appointment_date')[:5]
     
     context = {
         'customer': customer,
         'appointments': recent_appointments,
-        'pending_appointments': pending_appointments,
-        'completed_appointments': completed_appointments,
-        'all_appointments': appointments_list,
         'favorite_workers_count': favorite_workers_count,
-        'completed_for_activity': completed_for_activity,
         'worker_requests': worker_requests,
-        'total_appointments': appointments_list.count(),
-        'pending_count': pending_appointments.count(),
-        'completed_count': completed_appointments.count(),
+        'total_appointments': appointment_counts['total'],
+        'pending_count': appointment_counts['pending'],
+        'accepted_count': appointment_counts['accepted'],
+        'completed_count': appointment_counts['completed'],
         'current_page': 'dashboard',
-        # NEW: Ratings context
-        'total_reviews': total_reviews_given,  # This goes in your stats grid
+        # Ratings context
+        'total_reviews': total_reviews,  # This goes in your stats grid
         'average_rating': round(average_rating, 1),
-        'average_rating_int': average_rating_int,
+        'average_rating_int': int(average_rating),
         'rating_distribution': rating_distribution_percent,
         'recent_reviews': recent_reviews,
         'pending_reviews': pending_reviews,
@@ -1999,16 +1826,13 @@ def appointment_request_details(request, appointment_id):
 
 @login_required
 def notification_count(request):
-    """AJAX view to get notification count"""
+    """AJAX view to get the unread notification count (served from the cached counter)"""
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        # Example: count pending appointments for customer
-        customer = get_object_or_404(Customer, owner=request.user)
-        count = Appointment.objects.filter(
-            customer=customer, 
-            status='pending'
-        ).count()
-        
-        return JsonResponse({'count': count})
+        recipient = _notification_recipient(request.user)
+        if recipient is None:
+            return JsonResponse({'error': 'Worker or customer profile required'}, status=403)
+
+        return JsonResponse({'count': get_unread_count(**recipient)})
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
@@ -2088,96 +1912,177 @@ def customer_support(request):
     }
     return render(request, 'jobs/customer_support.html', context)
 
-from django.utils import timezone
 from datetime import timedelta
 import json
+import time
 
 # Add to your views.py
 
+NOTIFICATION_PAGE_SIZE = 20
+
+def _notification_recipient(user):
+    """Return the Notification filter for the logged-in worker or customer, or None"""
+    worker = getattr(user, 'worker', None)
+    if worker is not None:
+        return {'worker': worker}
+    customer = getattr(user, 'customer', None)
+    if customer is not None:
+        return {'customer': customer}
+    return None
+
+def _encode_notification_cursor(notification):
+    return f"{notification.created_at.timestamp():.6f}_{notification.id}"
+
+def _decode_notification_cursor(cursor):
+    """Parse a '<timestamp>_<id>' cursor into (datetime, id); raises ValueError if malformed"""
+    timestamp, notification_id = cursor.split('_', 1)
+    created_at = datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+    return created_at, int(notification_id)
+
 @login_required
 def worker_notifications(request):
-    """API endpoint to fetch worker notifications"""
+    """
+    API endpoint to fetch the notification inbox for the current worker or customer.
+    Uses keyset pagination on (created_at, id): pass the returned `next_cursor`
+    as `?cursor=` to fetch the next page, and `?unread=1` to list unread only.
+    """
+    recipient = _notification_recipient(request.user)
+    if recipient is None:
+        return JsonResponse({'error': 'Worker or customer profile required'}, status=403)
+
+    notifications = Notification.objects.filter(**recipient)
+    if request.GET.get('unread') in ('1', 'true'):
+        notifications = notifications.filter(is_read=False)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = _decode_notification_cursor(cursor)
+        except (ValueError, TypeError, OverflowError):
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        notifications = notifications.filter(
+            Q(created_at__lt=cursor_created_at) | Q(created_at=cursor_created_at, id__lt=cursor_id)
+        )
+
     try:
-        worker = request.user.worker
-    except AttributeError:
-        return JsonResponse({'error': 'Worker profile required'}, status=403)
-    
-    # Get notifications from the last 7 days
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    
-    # Get pending appointments (new requests)
-    pending_appointments = Appointment.objects.filter(
-        worker=worker, 
-        status='pending',
-        created_at__gte=seven_days_ago
-    ).select_related('customer').order_by('-created_at')
-    
-    # Get appointments marked as completed by customer
-    completed_by_customer = Appointment.objects.filter(
-        worker=worker,
-        customer_completed=True,
-        worker_completed=False,
-        updated_at__gte=seven_days_ago
-    ).select_related('customer').order_by('-updated_at')
-    
-    # Format notifications
-    notifications = []
-    
-    for appointment in pending_appointments:
-        notifications.append({
-            'id': f'appointment-pending-{appointment.id}',
-            'type': 'appointment',
-            'message': f'New appointment request from {appointment.customer.name}',
-            'customer_name': appointment.customer.name,
-            'appointment_id': appointment.id,
-            'is_read': False,  # You might want to implement a read status system
-            'created_at': appointment.created_at.isoformat(),
-            'time_ago': get_time_ago(appointment.created_at)
-        })
-    
-    for appointment in completed_by_customer:
-        notifications.append({
-            'id': f'appointment-completed-{appointment.id}',
-            'type': 'completion',
-            'message': f'{appointment.customer.name} marked the appointment as completed',
-            'customer_name': appointment.customer.name,
-            'appointment_id': appointment.id,
-            'is_read': False,
-            'created_at': appointment.updated_at.isoformat(),
-            'time_ago': get_time_ago(appointment.updated_at)
-        })
-    
-    # Count unread notifications (simplified - all are unread in this implementation)
-    unread_count = len([n for n in notifications if not n['is_read']])
-    
+        page_size = max(1, min(int(request.GET.get('limit', NOTIFICATION_PAGE_SIZE)), 100))
+    except (ValueError, TypeError):
+        page_size = NOTIFICATION_PAGE_SIZE
+
+    # Fetch one extra row to know whether another page exists
+    page = list(
+        notifications.order_by('-created_at', '-id').only(
+            'id', 'notification_type', 'title', 'message', 'appointment_id', 'is_read', 'created_at'
+        )[:page_size + 1]
+    )
+    has_more = len(page) > page_size
+    page = page[:page_size]
+
+    notifications_data = [{
+        'id': notification.id,
+        'type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'appointment_id': notification.appointment_id,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'time_ago': get_time_ago(notification.created_at),
+    } for notification in page]
+
     return JsonResponse({
-        'notifications': notifications,
-        'unread_count': unread_count
+        'notifications': notifications_data,
+        'unread_count': get_unread_count(**recipient),
+        'next_cursor': _encode_notification_cursor(page[-1]) if has_more else None,
     })
 
 @require_POST
 @login_required
 def mark_notification_read(request):
     """API endpoint to mark a notification as read"""
+    recipient = _notification_recipient(request.user)
+    if recipient is None:
+        return JsonResponse({'error': 'Worker or customer profile required'}, status=403)
+
     try:
         data = json.loads(request.body)
-        notification_id = data.get('notification_id')
-        
-        # In a real implementation, you would update a Notification model
-        # For now, we'll just return success
-        return JsonResponse({'success': True})
-    except Exception as e:
+        notification_id = int(data.get('notification_id'))
+    except (ValueError, TypeError) as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+    updated = Notification.objects.filter(
+        id=notification_id, is_read=False, **recipient
+    ).update(is_read=True)
+    decrement_unread_count(updated, **recipient)
+    return JsonResponse({'success': True, 'updated': updated})
+
 @require_POST
 @login_required
 def mark_all_notifications_read(request):
-    """API endpoint to mark all notifications as read"""
-    try:
-        # In a real implementation, you would update all notifications for this user
-        return JsonResponse({'success': True})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
+    """API endpoint to mark all notifications as read with a single UPDATE"""
+    recipient = _notification_recipient(request.user)
+    if recipient is None:
+        return JsonResponse({'error': 'Worker or customer profile required'}, status=403)
+
+    updated = Notification.objects.filter(is_read=False, **recipient).update(is_read=True)
+    reset_unread_count(**recipient)
+    return JsonResponse({'success': True, 'updated': updated})
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream for the logged-in worker or customer. Pushes new
+    notifications as they happen so dashboards don't need to poll.
+
+    Only served when NOTIFICATION_STREAM_ENABLED is set, which needs an ASGI
+    server (see config/asgi.py): under WSGI every open stream would hold a
+    worker thread. Each stream also closes after NOTIFICATION_STREAM_MAX_DURATION
+    seconds and the browser reconnects, resuming from Last-Event-ID.
+    """
+    if not getattr(settings, 'NOTIFICATION_STREAM_ENABLED', False):
+        raise Http404("Notification stream is disabled")
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    recipient = await sync_to_async(_notification_recipient)(user)
+    if recipient is None:
+        return JsonResponse({'error': 'Worker or customer profile required'}, status=403)
+
+    if 'worker' in recipient:
+        channel = channel_for(worker_id=recipient['worker'].id)
+    else:
+        channel = channel_for(customer_id=recipient['customer'].id)
+    unread_count = await sync_to_async(get_unread_count)(**recipient)
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id is not None and not last_event_id.isdigit():
+        last_event_id = None
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+    max_duration = getattr(settings, 'NOTIFICATION_STREAM_MAX_DURATION', 300)
+
+    async def event_stream():
+        deadline = time.monotonic() + max_duration
+        yield 'retry: 5000\n\n'
+        yield f"event: unread_count\ndata: {json.dumps({'type': 'unread_count', 'count': unread_count})}\n\n"
+        events = get_broker().subscribe(channel, heartbeat=heartbeat, last_event_id=last_event_id)
+        try:
+            async for event in events:
+                if event is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    message = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                    if 'id' in event:
+                        message = f"id: {event['id']}\n" + message
+                    yield message
+                # Heartbeats wake the loop at least every `heartbeat` seconds
+                if time.monotonic() >= deadline:
+                    break
+        finally:
+            await events.aclose()
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 def get_time_ago(dt):
     """Helper function to get a human-readable time ago string"""
@@ -2553,6 +2458,8 @@ def toggle_favorite_worker(request, worker_id):
                 is_favorite = True
                 message = "Worker added to favorites"
             
+            invalidate_favorite_ids(customer.pk)
+            
             return JsonResponse({
                 'success': True,
                 'is_favorite': is_favorite,
@@ -2567,21 +2474,16 @@ def toggle_favorite_worker(request, worker_id):
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
+
+FAVORITES_PAGE_SIZE = 12
+
 @login_required
 def favorite_workers_list(request):
     """View to display customer's favorite workers"""
     customer = get_object_or_404(Customer, owner=request.user)
     
-    # Get favorite workers with distance calculation
-    favorite_workers = FavoriteWorker.objects.filter(
-        customer=customer
-    ).select_related('worker').order_by('-created_at')
-    
-    # Calculate distance for each favorite worker
-    workers_with_distance = []
     cust_lat = None
     cust_lon = None
-    
     if customer.latitude and customer.longitude:
         try:
             cust_lat = float(customer.latitude)
@@ -2590,44 +2492,16 @@ def favorite_workers_list(request):
             cust_lat = None
             cust_lon = None
     
-    for favorite in favorite_workers:
-        worker = favorite.worker
-        distance_km = None
-        
-        # Calculate distance if customer has coordinates and worker has coordinates
-        if cust_lat is not None and cust_lon is not None and worker.latitude and worker.longitude:
-            try:
-                worker_lat = float(worker.latitude)
-                worker_lon = float(worker.longitude)
-                distance_km = _haversine_km(worker_lat, worker_lon, cust_lat, cust_lon)
-                if distance_km != float('inf'):
-                    distance_km = round(distance_km, 2)
-            except (ValueError, TypeError):
-                distance_km = None
-        
-        # Add rating information
-        average_rating = worker.bayesian_average_rating()
-        worker.average_rating = average_rating
-        worker.total_ratings = worker.ratings.count()
-        
-        # Star breakdown for display
-        full_stars = int(average_rating)
-        half_star = 1 if average_rating % 1 >= 0.5 else 0
-        empty_stars = 5 - (full_stars + half_star)
-        
-        worker.full_stars = range(full_stars)
-        worker.half_star = half_star
-        worker.empty_stars = range(empty_stars)
-        worker.distance_km = distance_km
-        
-        workers_with_distance.append({
-            'worker': worker,
-            'favorited_at': favorite.created_at,
-            'distance_km': distance_km
-        })
+    # Only the current page of favorites is loaded, with rating stats in bulk
+    paginator = Paginator(
+        FavoriteWorker.objects.filter(customer=customer).order_by('-created_at', '-id'),
+        FAVORITES_PAGE_SIZE,
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
-        'favorite_workers': workers_with_distance,
+        'favorite_workers': load_favorite_cards(page_obj.object_list, cust_lat, cust_lon),
+        'page_obj': page_obj,
         'current_page': 'favorites'
     }
     
@@ -2642,13 +2516,8 @@ def check_favorite_status(request, worker_id):
             worker = get_object_or_404(Worker, id=worker_id)
             customer = request.user.customer
             
-            is_favorite = FavoriteWorker.objects.filter(
-                customer=customer, 
-                worker=worker
-            ).exists()
-            
             return JsonResponse({
-                'is_favorite': is_favorite
+                'is_favorite': worker.pk in get_favorite_ids(customer)
             })
             
         except Exception as e:
@@ -2659,46 +2528,149 @@ def check_favorite_status(request, worker_id):
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+@login_required
+def favorite_statuses(request):
+    """
+    Favorite flags for several workers at once (?ids=1,2,3), so worker cards
+    can be marked with one request instead of one check_favorite_status call
+    per card. Answered from the customer's cached favorite-id set.
+    """
+    customer = getattr(request.user, 'customer', None)
+    if customer is None:
+        return JsonResponse({'error': 'Only customers have favorites'}, status=403)
+    
+    try:
+        worker_ids = [int(worker_id) for worker_id in request.GET.get('ids', '').split(',') if worker_id.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma-separated list of worker ids'}, status=400)
+    
+    favorite_ids = get_favorite_ids(customer)
+    return JsonResponse({
+        'favorites': {str(worker_id): worker_id in favorite_ids for worker_id in worker_ids}
+    })
+
 
 @login_required
 def worker_calendar(request):
-    """Worker calendar view"""
+    """
+    Worker calendar page. Events are not embedded: the calendar loads the
+    visible window from worker_calendar_feed as the worker navigates.
+    """
     try:
         worker = request.user.worker
     except AttributeError:
         messages.error(request, "You don't have a worker profile.")
         return redirect('worker-list')
     
-    # Get appointments for calendar
-    appointments = Appointment.objects.filter(worker=worker).select_related(
-        'customer', 'service_subtask', 'service_subtask__subtask'
-    ).order_by('appointment_date')
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return worker_calendar_feed(request)
     
-    # Format appointments for calendar
-    calendar_events = []
-    for appointment in appointments:
-        calendar_events.append({
-            'id': appointment.id,
-            'title': f"{appointment.customer.name} - {appointment.service_subtask.subtask.name if appointment.service_subtask else 'Service'}",
-            'start': appointment.appointment_date.isoformat(),
-            'end': (appointment.appointment_date + timedelta(hours=2)).isoformat(),
-            'status': appointment.status,
-            'customer_name': appointment.customer.name,
-            'service_name': appointment.service_subtask.subtask.name if appointment.service_subtask else 'General Service',
-            'location': appointment.location,
-        })
+    today = timezone.localdate()
+    day_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+    week_start = day_start - timedelta(days=today.weekday())
+    appointments = Appointment.objects.filter(worker=worker)
+    totals = rollup_totals(worker)
     
     context = {
         'worker': worker,
-        'calendar_events': json.dumps(calendar_events),
+        'today': today,
+        'today_appointments': appointments.filter(
+            appointment_date__gte=day_start, appointment_date__lt=day_start + timedelta(days=1)
+        ).select_related('customer', 'service_subtask__subtask').order_by('appointment_date'),
+        'week_appointments': appointments.filter(
+            appointment_date__gte=week_start, appointment_date__lt=week_start + timedelta(days=7)
+        ),
+        'pending_count': open_appointment_counts(worker)['pending'],
+        'completion_rate': round(totals['completed'] / totals['total'] * 100, 1) if totals['total'] else 0,
+        'calendar_feed_url': request.build_absolute_uri(
+            reverse('worker_calendar_ics', args=[get_or_create_token(worker)])
+        ),
         'current_section': 'calendar'
     }
     
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse({'calendar_events': calendar_events})
-    
     return render(request, 'jobs/worker_calendar.html', context)
 
+
+def worker_calendar_ics(request, token):
+    """
+    iCalendar subscription feed for external calendar apps. The token in the
+    URL is the only credential. The feed is served from cache until one of the
+    worker's appointments changes, and clients revalidate with If-None-Match.
+    """
+    worker_id = worker_id_for_token(token)
+    if worker_id is None:
+        raise Http404("Unknown calendar feed")
+    
+    feed, version = get_feed(worker_id)
+    etag = f'"{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(feed, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="bluecaller.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@require_POST
+def rotate_calendar_token(request):
+    """Replace the worker's calendar feed token, revoking the old subscription URL"""
+    try:
+        worker = request.user.worker
+    except AttributeError:
+        messages.error(request, "You don't have a worker profile.")
+        return redirect('worker-list')
+    
+    rotate_token(worker)
+    messages.success(request, "Your calendar link was reset. Update your calendar app with the new link.")
+    return redirect('worker_calendar')
+
+
+@login_required
+def worker_calendar_feed(request):
+    """
+    JSON events for one calendar window (?start=&end=, ISO dates as sent by
+    FullCalendar). Full windows carry an ETag and answer If-None-Match with
+    304; ?since= returns only events changed since a previous response's
+    server_time, plus ids of events that left the window or were deleted.
+    A `since` older than CALENDAR_DELTA_MAX_AGE gets the full window, flagged
+    with `full`, so the client replaces its events.
+    """
+    try:
+        worker = request.user.worker
+    except AttributeError:
+        return JsonResponse({'error': "You don't have a worker profile."}, status=403)
+    
+    # Read before querying, so the next delta overlaps rather than misses rows
+    server_time = timezone.now()
+    try:
+        start_at, end_at = parse_range(request.GET.get('start'), request.GET.get('end'))
+        since = parse_since(request.GET.get('since'), now=server_time)
+    except CalendarRangeError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    etag = None
+    if since is None:
+        etag = window_etag(worker, start_at, end_at)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+    
+    events, removed = window_events(worker, start_at, end_at, since=since)
+    response = JsonResponse({
+        'events': events,
+        'removed': removed,
+        'full': since is None,
+        'server_time': server_time.isoformat(),
+    })
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @login_required
 def worker_reviews(request):
     """Worker reviews view"""
@@ -2759,44 +2731,31 @@ def worker_analytics(request):
         messages.error(request, "You don't have a worker profile.")
         return redirect('worker-list')
     
-    # Calculate analytics data
-    total_appointments = Appointment.objects.filter(worker=worker).count()
-    completed_appointments = Appointment.objects.filter(worker=worker, status='completed').count()
-    pending_appointments = Appointment.objects.filter(worker=worker, status='pending').count()
-    accepted_appointments = Appointment.objects.filter(worker=worker, status='accepted').count()
-    
-    # Monthly earnings (example calculation)
-    monthly_earnings = []
-    for i in range(6):  # Last 6 months
-        month = timezone.now() - timedelta(days=30*i)
-        monthly_appointments = Appointment.objects.filter(
-            worker=worker,
-            status='completed',
-            appointment_date__month=month.month,
-            appointment_date__year=month.year
-        )
-        monthly_income = sum(
-            appointment.service_subtask.price 
-            for appointment in monthly_appointments 
-            if appointment.service_subtask
-        )
-        monthly_earnings.append({
-            'month': month.strftime('%b %Y'),
-            'income': monthly_income
-        })
-    
-    # Service popularity
-    service_stats = []
-    worker_services = WorkerService.objects.filter(worker=worker)
-    for service in worker_services:
-        service_appointments = Appointment.objects.filter(
-            worker=worker,
-            service_subtask__worker_service=service
-        ).count()
-        service_stats.append({
-            'service_name': service.service.name,
-            'appointment_count': service_appointments
-        })
+    # Historical figures come from the WorkerAnalytics daily rollup (see the
+    # rollup_worker_analytics command); only open appointments are counted live
+    totals = rollup_totals(worker)
+    open_counts = open_appointment_counts(worker)
+    total_appointments = totals['total']
+    completed_appointments = totals['completed']
+    pending_appointments = open_counts['pending']
+    accepted_appointments = open_counts['accepted']
+    completion_rate = round(completed_appointments / total_appointments * 100, 1) if total_appointments > 0 else 0
+
+    # Request -> accept -> complete funnel over the appointments that have
+    # transition timestamps, and response-time percentiles read from the
+    # worker's latency histograms
+    funnel = conversion_funnel(worker)
+    latency = latency_summary(worker)
+    response_times = latency.get('response', {})
+    completion_times = latency.get('completion', {})
+
+    monthly_earnings = monthly_activity(worker, months=6)
+    new_customers = monthly_earnings[-1]['new_customers']
+    window_customers = sum(month['new_customers'] + month['repeat_customers'] for month in monthly_earnings)
+    repeat_customers = round(
+        sum(month['repeat_customers'] for month in monthly_earnings) / window_customers * 100, 1
+    ) if window_customers > 0 else 0
+    service_stats = service_popularity(worker)
     
     context = {
         'worker': worker,
@@ -2804,6 +2763,15 @@ def worker_analytics(request):
         'completed_appointments': completed_appointments,
         'pending_appointments': pending_appointments,
         'accepted_appointments': accepted_appointments,
+        'completion_rate': completion_rate,
+        'funnel': funnel,
+        'avg_response_time': response_times.get('average') or 0,
+        'response_p50': response_times.get('p50'),
+        'response_p90': response_times.get('p90'),
+        'completion_p50': completion_times.get('p50'),
+        'completion_p90': completion_times.get('p90'),
+        'new_customers': new_customers,
+        'repeat_customers': repeat_customers,
         'monthly_earnings': monthly_earnings,
         'service_stats': service_stats,
         'current_section': 'analytics'
@@ -2813,74 +2781,107 @@ def worker_analytics(request):
         return JsonResponse({
             'total_appointments': total_appointments,
             'completed_appointments': completed_appointments,
-            'completion_rate': (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0,
+            'completion_rate': completion_rate,
+            'funnel': funnel,
+            'latency': latency,
             'monthly_earnings': monthly_earnings,
             'service_stats': service_stats
         })
     
     return render(request, 'jobs/worker_analytics.html', context)
 
+
+EARNINGS_PAGE_SIZE = 10
+
 @login_required
 def worker_earnings(request):
-    """Worker earnings view"""
+    """Worker earnings view, read from the earnings ledger (see jobs/earnings.py)"""
     try:
         worker = request.user.worker
     except AttributeError:
         messages.error(request, "You don't have a worker profile.")
         return redirect('worker-list')
     
-    # Get completed appointments with pricing
-    completed_appointments = Appointment.objects.filter(
-        worker=worker,
-        status='completed'
-    ).select_related('service_subtask').order_by('-appointment_date')
-    
-    # Calculate total earnings
-    total_earnings = sum(
-        appointment.service_subtask.price 
-        for appointment in completed_appointments 
-        if appointment.service_subtask
+    ledger = WorkerEarning.objects.filter(worker=worker, posted_at__isnull=False)
+    total_earnings = latest_balance(worker)
+    pending_earnings = ledger.filter(
+        payment_status__in=['pending', 'processing']
+    ).aggregate(total=Sum('net_amount'))['total'] or 0
+    
+    # Last twelve months of maintained totals, oldest first for the chart
+    monthly_totals = list(WorkerMonthlyEarning.objects.filter(worker=worker).order_by('-month')[:12])[::-1]
+    current_month = month_start(timezone.now())
+    this_month = next((row.net_amount for row in monthly_totals if row.month == current_month), 0)
+    
+    paginator = Paginator(
+        ledger.select_related('appointment__customer', 'appointment__service_subtask__subtask')
+        .order_by('-ledger_sequence'),
+        EARNINGS_PAGE_SIZE,
     )
-    
-    # Earnings by month
-    monthly_earnings = {}
-    for appointment in completed_appointments:
-        if appointment.service_subtask:
-            month_year = appointment.appointment_date.strftime('%Y-%m')
-            if month_year not in monthly_earnings:
-                monthly_earnings[month_year] = 0
-            monthly_earnings[month_year] += appointment.service_subtask.price
-    
-    # Recent transactions
-    recent_transactions = []
-    for appointment in completed_appointments[:10]:  # Last 10 transactions
-        if appointment.service_subtask:
-            recent_transactions.append({
-                'date': appointment.appointment_date,
-                'customer': appointment.customer.name,
-                'service': appointment.service_subtask.subtask.name,
-                'amount': appointment.service_subtask.price,
-                'status': 'completed'
-            })
+    transactions = paginator.get_page(request.GET.get('page'))
+    recent_transactions = [
+        {
+            'date': earning.posted_at,
+            'customer_name': earning.appointment.customer.name,
+            'service_name': earning.appointment.get_service_name(),
+            'amount': earning.net_amount,
+            'balance': earning.running_balance,
+            'status': earning.payment_status,
+        }
+        for earning in transactions
+    ]
     
     context = {
         'worker': worker,
         'total_earnings': total_earnings,
-        'monthly_earnings': monthly_earnings,
+        'monthly_earnings': this_month,
+        'pending_earnings': pending_earnings,
+        'completed_jobs': paginator.count,
+        'earnings_chart': [
+            {'month': row.month.strftime('%b %Y'), 'amount': float(row.net_amount)} for row in monthly_totals
+        ],
         'recent_transactions': recent_transactions,
-        'completed_appointments': completed_appointments,
+        'transactions': transactions,
         'current_section': 'earnings'
     }
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'total_earnings': total_earnings,
-            'monthly_earnings': monthly_earnings,
+            'monthly_earnings': {row.month.strftime('%Y-%m'): row.net_amount for row in monthly_totals},
             'recent_transactions': recent_transactions
         })
     
     return render(request, 'jobs/worker_earnings.html', context)
 
+@login_required
+def export_data(request, dataset):
+    """
+    Stream a full-history export of earnings, appointments or ratings as CSV
+    or JSONL (?format=), optionally limited to ?start= / ?end= dates. Workers
+    export their own rows; staff export every worker's, or one with ?worker=.
+    """
+    if request.user.is_staff:
+        worker = request.GET.get('worker') or None
+        if worker is not None and not worker.isdigit():
+            return JsonResponse({'error': 'worker must be a worker id'}, status=400)
+    else:
+        try:
+            worker = request.user.worker
+        except AttributeError:
+            return HttpResponseForbidden("Exports are only available to workers.")
+
+    export_format = request.GET.get('format', 'csv')
+    try:
+        headers, rows = export_rows(dataset, request.GET.get('start'), request.GET.get('end'), worker=worker)
+        content = stream_export(export_format, headers, rows)
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}-{timezone.localdate():%Y%m%d}.{export_format}"'
+    return response
+
 @login_required
 def worker_settings(request):
     """Worker settings view"""
@@ -2890,6 +2891,19 @@ def worker_settings(request):
         messages.error(request, "You don't have a worker profile.")
         return redirect('worker-list')
     
+    notification_settings, _ = WorkerSettings.objects.get_or_create(worker=worker)
+    
+    if request.method == 'POST' and request.POST.get('section') == 'notifications':
+        # Unchecked checkboxes are simply absent from the POST data
+        for field in ('email_notifications', 'sms_notifications', 'appointment_reminders', 'review_notifications'):
+            setattr(notification_settings, field, field in request.POST)
+        email_frequency = request.POST.get('email_frequency')
+        if email_frequency in dict(WorkerSettings.EMAIL_FREQUENCY_CHOICES):
+            notification_settings.email_frequency = email_frequency
+        notification_settings.save()
+        messages.success(request, "Notification preferences updated!")
+        return redirect('worker_settings')
+    
     if request.method == 'POST':
         # Handle profile updates
         worker.name = request.POST.get('name', worker.name)
@@ -2918,6 +2932,7 @@ def worker_settings(request):
     
     context = {
         'worker': worker,
+        'notification_settings': notification_settings,
         'current_section': 'settings'
     }
     
@@ -3,7 +3,7 @@ from .models import OTP
 
 @admin.register(OTP)
 class OTPAdmin(admin.ModelAdmin):
-    list_display = ('user', 'code', 'purpose', 'created_at', 'expires_at', 'is_valid')
+    list_display = ('user', 'purpose', 'ip_address', 'created_at', 'expires_at', 'verified_at')
     list_filter = ('purpose', 'created_at')
-    search_fields = ('user__email', 'user__username', 'code')
-    readonly_fields = ('created_at', 'expires_at')
\ No newline at end of file
+    search_fields = ('user__email', 'user__username', 'ip_address')
+    readonly_fields = ('created_at', 'expires_at', 'verified_at')
\ No newline at end of file
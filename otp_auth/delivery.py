@@ -0,0 +1,62 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .utils import send_otp_via_email
+
+logger = logging.getLogger(__name__)
+
+# Delivery states shown on the verification page
+QUEUED = "queued"
+SENT = "sent"
+FAILED = "failed"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "OTP_DELIVERY_WORKERS", 2),
+                    thread_name_prefix="otp-delivery",
+                )
+    return _executor
+
+
+def _status_key(user_id, purpose):
+    return f"otp:delivery:{purpose}:{user_id}"
+
+
+def _set_status(user_id, purpose, status):
+    cache.set(_status_key(user_id, purpose), status, getattr(settings, "OTP_TTL_SECONDS", 300))
+
+
+def delivery_status(user, purpose):
+    """Return QUEUED, SENT or FAILED for the latest code, or None if nothing is pending"""
+    return cache.get(_status_key(user.pk, purpose))
+
+
+def _deliver(user, code, purpose):
+    try:
+        send_otp_via_email(user, code, purpose)
+    except Exception as e:
+        logger.error(f"Failed to deliver {purpose} OTP to user {user.pk}: {e}")
+        _set_status(user.pk, purpose, FAILED)
+    else:
+        _set_status(user.pk, purpose, SENT)
+
+
+def queue_otp_email(user, code, purpose):
+    """
+    Send the OTP email from a background thread so the request can redirect to
+    the verification page without waiting on SMTP. The email is handed off
+    once the current transaction commits; progress is tracked in the cache.
+    """
+    _set_status(user.pk, purpose, QUEUED)
+    transaction.on_commit(lambda: _get_executor().submit(_deliver, user, code, purpose))
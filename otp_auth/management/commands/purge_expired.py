@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from otp_auth.models import OTP
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired OTP audit rows and expired database sessions in small "
+        "batches, so no single statement holds locks for long. Safe to run "
+        "from cron as often as needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows deleted per statement")
+        parser.add_argument("--sleep", type=float, default=0.1, help="Seconds to pause between batches")
+        parser.add_argument(
+            "--otp-retention-days", type=int,
+            default=getattr(settings, "OTP_AUDIT_RETENTION_DAYS", 30),
+            help="Keep OTP audit rows for this many days after they expire",
+        )
+        parser.add_argument("--skip-sessions", action="store_true", help="Only purge OTP rows")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        otp_cutoff = now - timedelta(days=options["otp_retention_days"])
+
+        deleted = self.purge(OTP.objects.filter(expires_at__lt=otp_cutoff), options)
+        self.stdout.write(f"Deleted {deleted} expired OTP rows")
+
+        if not options["skip_sessions"]:
+            deleted = self.purge(Session.objects.filter(expire_date__lt=now), options)
+            self.stdout.write(f"Deleted {deleted} expired sessions")
+
+        self.stdout.write(self.style.SUCCESS("Purge complete"))
+
+    def purge(self, queryset, options):
+        """
+        Delete `queryset` in primary-key batches. Each batch is its own short
+        statement (autocommit), reading keys through the expiry index.
+        """
+        model = queryset.model
+        total = 0
+        while True:
+            keys = list(queryset.values_list("pk", flat=True)[:options["batch_size"]])
+            if not keys:
+                return total
+            # Neither model has dependents, so this is a single fast DELETE
+            deleted, _ = model.objects.filter(pk__in=keys).delete()
+            total += deleted
+            if len(keys) < options["batch_size"]:
+                return total
+            time.sleep(options["sleep"])
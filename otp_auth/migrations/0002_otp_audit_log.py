@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otp_auth', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otp',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='otp',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='otp',
+            name='code',
+            field=models.CharField(blank=True, max_length=6),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otp_auth', '0002_otp_audit_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expires_at'], name='otp_auth_ot_expires_91219a_idx'),
+        ),
+    ]
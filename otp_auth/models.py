@@ -1,42 +1,34 @@
-import random
-import string
-from datetime import timedelta
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 class OTP(models.Model):
+    """
+    Audit log of issued one-time codes. The codes themselves are kept (hashed)
+    in the cache by otp_auth.store; nothing here is read to verify a login.
+    """
     PURPOSE_CHOICES = [
         ("signup", "Signup"),
         ("login", "Login"),
     ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    code = models.CharField(max_length=6)
+    # Kept for older rows only; new codes are never written to the database
+    code = models.CharField(max_length=6, blank=True)
     purpose = models.CharField(max_length=10, choices=PURPOSE_CHOICES)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+    verified_at = models.DateTimeField(null=True, blank=True)
 
-    def is_valid(self):
-        return timezone.now() < self.expires_at
-
-    @staticmethod
-    def generate_code():
-        return "".join(random.choices(string.digits, k=6))
+    class Meta:
+        indexes = [
+            # Range scans by the purge_expired command
+            models.Index(fields=["expires_at"]),
+        ]
 
-    @classmethod
-    def create_otp(cls, user, purpose):
-        # Delete any existing OTPs for this user and purpose
-        cls.objects.filter(user=user, purpose=purpose).delete()
-        
-        code = cls.generate_code()
-        otp = cls.objects.create(
-            user=user,
-            code=code,
-            purpose=purpose,
-            expires_at=timezone.now() + timedelta(minutes=5),
-        )
-        return otp
+    def is_valid(self):
+        return self.verified_at is None and timezone.now() < self.expires_at
 
     def __str__(self):
-        return f"{self.user.email} - {self.code} ({self.purpose})"
\ No newline at end of file
+        return f"{self.user.email} - {self.purpose} ({self.created_at:%Y-%m-%d %H:%M})"
@@ -0,0 +1,134 @@
+import hashlib
+import hmac
+import ipaddress
+import secrets
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import OTP
+
+# Outcomes of verify_otp()
+VERIFIED = "verified"
+INVALID = "invalid"
+EXPIRED = "expired"
+LOCKED = "locked"
+
+
+class OTPRateLimited(Exception):
+    """Raised when a user or IP address has requested too many codes"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Too many OTP requests; retry in {retry_after} seconds")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _code_key(user_id, purpose):
+    return f"otp:code:{purpose}:{user_id}"
+
+
+def _attempts_key(user_id, purpose):
+    return f"otp:attempts:{purpose}:{user_id}"
+
+
+def _hash_code(user_id, purpose, code):
+    """Codes are only kept as a keyed hash, so a cache dump does not leak them"""
+    message = f"{user_id}:{purpose}:{code}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _hit_rate_limit(key, limit, window):
+    """Count one request in a fixed window; True once `limit` is exceeded"""
+    cache.add(key, 0, window)
+    try:
+        return cache.incr(key) > limit
+    except ValueError:
+        # Window expired between add() and incr()
+        cache.set(key, 1, window)
+        return False
+
+
+def _check_rate_limits(user_id, ip_address):
+    window = _setting("OTP_RATE_LIMIT_WINDOW", 900)
+    limited = _hit_rate_limit(f"otp:rate:user:{user_id}", _setting("OTP_MAX_ISSUES_PER_USER", 5), window)
+    if ip_address:
+        limited = _hit_rate_limit(f"otp:rate:ip:{ip_address}", _setting("OTP_MAX_ISSUES_PER_IP", 20), window) or limited
+    if limited:
+        raise OTPRateLimited(window)
+
+
+def generate_code():
+    return "".join(secrets.choice("0123456789") for _ in range(6))
+
+
+def issue_otp(user, purpose, ip_address=None):
+    """
+    Create a one-time code for `user`, replacing any earlier one for the same
+    purpose. The hashed code lives in the cache with a TTL; the database only
+    receives a single audit row. Raises OTPRateLimited when the user or IP has
+    asked for too many codes in OTP_RATE_LIMIT_WINDOW seconds.
+    """
+    try:
+        ip_address = str(ipaddress.ip_address(ip_address)) if ip_address else None
+    except ValueError:
+        ip_address = None
+    _check_rate_limits(user.pk, ip_address)
+
+    ttl = _setting("OTP_TTL_SECONDS", 300)
+    code = generate_code()
+    cache.set_many({
+        _code_key(user.pk, purpose): _hash_code(user.pk, purpose, code),
+        _attempts_key(user.pk, purpose): 0,
+    }, ttl)
+
+    OTP.objects.create(
+        user=user,
+        purpose=purpose,
+        ip_address=ip_address,
+        expires_at=timezone.now() + timedelta(seconds=ttl),
+    )
+    return code
+
+
+def verify_otp(user, purpose, code):
+    """
+    Check a submitted code. Returns VERIFIED, INVALID, EXPIRED or LOCKED.
+    A verified code is consumed; after OTP_MAX_ATTEMPTS wrong guesses the code
+    is discarded and the user has to request a new one.
+    """
+    code_key = _code_key(user.pk, purpose)
+    attempts_key = _attempts_key(user.pk, purpose)
+
+    stored_hash = cache.get(code_key)
+    if stored_hash is None:
+        return EXPIRED
+
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # The counter was evicted; start it again so this guess still counts
+        attempts = 1
+        if not cache.add(attempts_key, attempts, _setting("OTP_TTL_SECONDS", 300)):
+            attempts = cache.incr(attempts_key)
+    if attempts > _setting("OTP_MAX_ATTEMPTS", 5):
+        cache.delete_many([code_key, attempts_key])
+        return LOCKED
+
+    if not hmac.compare_digest(stored_hash, _hash_code(user.pk, purpose, code)):
+        return INVALID
+
+    # delete() reports whether the key was still there, so a code can only be
+    # redeemed once even if two submissions race
+    if not cache.delete(code_key):
+        return EXPIRED
+    cache.delete(attempts_key)
+
+    OTP.objects.filter(
+        pk=OTP.objects.filter(user=user, purpose=purpose, verified_at__isnull=True)
+        .order_by("-created_at").values("pk")[:1]
+    ).update(verified_at=timezone.now())
+    return VERIFIED
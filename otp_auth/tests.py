@@ -1,3 +1,128 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from jobs.views import custom_login, get_client_ip
+from .models import OTP
+from .views import send_otp_and_redirect
+from .store import (
+    EXPIRED, INVALID, LOCKED, VERIFIED, OTPRateLimited, _attempts_key, issue_otp, verify_otp,
+)
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(OTP_MAX_ISSUES_PER_USER=2, OTP_MAX_ISSUES_PER_IP=3, OTP_MAX_ATTEMPTS=3)
+class OTPStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='secret-pass')
+
+    def test_per_user_rate_limit(self):
+        issue_otp(self.user, 'login')
+        issue_otp(self.user, 'login')
+        with self.assertRaises(OTPRateLimited):
+            issue_otp(self.user, 'login')
+
+    def test_per_ip_rate_limit_spans_users(self):
+        for number in range(3):
+            other = User.objects.create_user(username=f'user{number}', password='secret-pass')
+            issue_otp(other, 'login', ip_address='203.0.113.7')
+        with self.assertRaises(OTPRateLimited):
+            issue_otp(self.user, 'login', ip_address='203.0.113.7')
+
+    def test_invalid_ip_is_not_stored(self):
+        issue_otp(self.user, 'login', ip_address='not-an-ip')
+        self.assertIsNone(OTP.objects.get(user=self.user).ip_address)
+
+    def test_wrong_guesses_lock_the_code(self):
+        code = issue_otp(self.user, 'login')
+        wrong = '000000' if code != '000000' else '111111'
+        self.assertEqual([verify_otp(self.user, 'login', wrong) for _ in range(3)], [INVALID] * 3)
+        self.assertEqual(verify_otp(self.user, 'login', code), LOCKED)
+        self.assertEqual(verify_otp(self.user, 'login', code), EXPIRED)
+
+    def test_guess_counts_when_attempt_counter_was_evicted(self):
+        code = issue_otp(self.user, 'login')
+        wrong = '000000' if code != '000000' else '111111'
+        cache.delete(_attempts_key(self.user.pk, 'login'))
+        self.assertEqual(verify_otp(self.user, 'login', wrong), INVALID)
+        self.assertEqual(cache.get(_attempts_key(self.user.pk, 'login')), 1)
+
+    def test_code_is_single_use(self):
+        code = issue_otp(self.user, 'login')
+        self.assertEqual(verify_otp(self.user, 'login', code), VERIFIED)
+        self.assertEqual(verify_otp(self.user, 'login', code), EXPIRED)
+        self.assertIsNotNone(OTP.objects.get(user=self.user).verified_at)
+
+
+class ClientIPTests(TestCase):
+    def request(self, forwarded=None, remote='198.51.100.1'):
+        extra = {'REMOTE_ADDR': remote}
+        if forwarded is not None:
+            extra['HTTP_X_FORWARDED_FOR'] = forwarded
+        return RequestFactory().get('/', **extra)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.9')), '198.51.100.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_client_supplied_entries_are_skipped_behind_a_proxy(self):
+        self.assertEqual(get_client_ip(self.request('1.2.3.4, 203.0.113.9')), '203.0.113.9')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_invalid_address_is_rejected(self):
+        self.assertIsNone(get_client_ip(self.request('<script>')))
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_otp_is_issued_for_the_client_address(self):
+        cache.clear()
+        user = User.objects.create_user(username='carol', email='carol@example.com', password='secret-pass')
+        request = self.request('203.0.113.9')
+        SessionMiddleware(lambda request: None).process_request(request)
+
+        send_otp_and_redirect(user, 'login', request)
+
+        self.assertEqual(OTP.objects.get(user=user).ip_address, '203.0.113.9')
+
+
+@override_settings(OTP_MAX_ISSUES_PER_USER=0)
+class CustomLoginRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bob', email='bob@example.com', password='secret-pass')
+
+    def test_rate_limited_login_does_not_skip_otp(self):
+        request = RequestFactory().post('/login/', {'login': 'bob', 'password': 'secret-pass'})
+        SessionMiddleware(lambda request: None).process_request(request)
+        MessageMiddleware(lambda request: None).process_request(request)
+        request.user = AnonymousUser()
+
+        response = custom_login(request)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertNotIn('_auth_user_id', request.session)
+
+
+class PurgeExpiredTests(TestCase):
+    def test_expired_rows_are_removed_and_live_ones_kept(self):
+        user = User.objects.create_user(username='dave', password='secret-pass')
+        now = timezone.now()
+        for days in (-40, -35, -5, 1):
+            OTP.objects.create(user=user, purpose='login', expires_at=now + timedelta(days=days))
+        for number, days in enumerate((-1, 1)):
+            Session.objects.create(session_key=f'session{number}', session_data='', expire_date=now + timedelta(days=days))
+
+        call_command('purge_expired', '--batch-size=1', '--sleep=0', stdout=StringIO())
+
+        # Expired OTP rows are kept for the audit retention period (30 days)
+        self.assertEqual(OTP.objects.count(), 2)
+        self.assertFalse(OTP.objects.filter(expires_at__lt=now - timedelta(days=30)).exists())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['session1'])
@@ -6,4 +6,5 @@ app_name = 'otp_auth'
 urlpatterns = [
     path("verify-signup/<int:user_id>/", views.verify_signup_otp, name="verify_signup_otp"),
     path("verify-login/<int:user_id>/", views.verify_login_otp, name="verify_login_otp"),
+    path("delivery-status/<str:purpose>/<int:user_id>/", views.otp_delivery_status, name="delivery_status"),
 ]
\ No newline at end of file
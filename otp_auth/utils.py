@@ -1,5 +1,6 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
+from config.utils.email_dispatch import send_messages
 
 def send_otp_via_email(user, otp_code, purpose):
     if purpose == "signup":
@@ -21,10 +22,8 @@ def send_otp_via_email(user, otp_code, purpose):
         If you didn't request this login, please secure your account.
         """
     
-    send_mail(
-        subject, 
-        message, 
-        settings.DEFAULT_FROM_EMAIL, 
-        [user.email],
+    # Goes out over the shared pooled connection instead of a fresh SMTP login per code
+    send_messages(
+        [EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])],
         fail_silently=False
-    )
\ No newline at end of file
+    )
@@ -1,11 +1,19 @@
 from django.contrib import messages
-from django.contrib.auth import login
-from django.contrib.auth.models import User
+from django.contrib.auth import login, get_user_model
+from django.http import JsonResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.csrf import csrf_protect
-from .models import OTP
+from jobs.views import get_client_ip
 from .forms import OTPVerificationForm
-from .utils import send_otp_via_email
+from .store import issue_otp, verify_otp, VERIFIED, LOCKED, EXPIRED
+from .delivery import queue_otp_email, delivery_status
+
+User = get_user_model()
+
+VERIFY_ERRORS = {
+    EXPIRED: "This OTP has expired. Please request a new one.",
+    LOCKED: "Too many incorrect attempts. Please request a new OTP.",
+}
 
 @csrf_protect
 def verify_signup_otp(request, user_id):
@@ -13,30 +21,27 @@ def verify_signup_otp(request, user_id):
     form = OTPVerificationForm(request.POST or None)
 
     if request.method == "POST" and form.is_valid():
-        otp_code = form.cleaned_data["otp"]
-        
-        # Get the latest OTP for this user and purpose
-        otp_obj = OTP.objects.filter(user=user, purpose="signup").order_by('-created_at').first()
-        
-        if otp_obj and otp_obj.is_valid() and otp_obj.code == otp_code:
+        result = verify_otp(user, "signup", form.cleaned_data["otp"])
+
+        if result == VERIFIED:
             # OTP is valid - activate user and log them in
             user.is_active = True
-            user.save()
-            
-            # Delete the used OTP
-            otp_obj.delete()
+            user.save(update_fields=["is_active"])
             
             # Log the user in
-            login(request, user)
+            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
             messages.success(request, "Signup successful! You are now logged in.")
             return redirect("landing-page")
         else:
-            messages.error(request, "Invalid or expired OTP. Please try again.")
+            messages.error(request, VERIFY_ERRORS.get(result, "Invalid OTP. Please try again."))
     
     # If GET request or invalid form, show the verification page
     context = {
         'form': form,
-        'user_email': user.email
+        'user_email': user.email,
+        'delivery_status': delivery_status(user, "signup"),
+        'purpose': "signup",
+        'user_id': user.id,
     }
     return render(request, "otp_auth/verify_signup_otp.html", context)
 
@@ -46,36 +51,42 @@ def verify_login_otp(request, user_id):
     form = OTPVerificationForm(request.POST or None)
 
     if request.method == "POST" and form.is_valid():
-        otp_code = form.cleaned_data["otp"]
-        
-        # Get the latest OTP for this user and purpose
-        otp_obj = OTP.objects.filter(user=user, purpose="login").order_by('-created_at').first()
-        
-        if otp_obj and otp_obj.is_valid() and otp_obj.code == otp_code:
+        result = verify_otp(user, "login", form.cleaned_data["otp"])
+
+        if result == VERIFIED:
             # OTP is valid - log the user in
-            login(request, user)
-            
-            # Delete the used OTP
-            otp_obj.delete()
+            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
             
             messages.success(request, "Login successful!")
             return redirect("landing-page")
         else:
-            messages.error(request, "Invalid or expired OTP. Please try again.")
+            messages.error(request, VERIFY_ERRORS.get(result, "Invalid OTP. Please try again."))
     
     context = {
         'form': form,
-        'user_email': user.email
+        'user_email': user.email,
+        'delivery_status': delivery_status(user, "login"),
+        'purpose': "login",
+        'user_id': user.id,
     }
     return render(request, "otp_auth/verify_login_otp.html", context)
 
+def otp_delivery_status(request, purpose, user_id):
+    """JSON delivery state of the latest OTP email, polled by the verification page"""
+    # Only the browser that started this login/signup may ask
+    if request.session.get(f"{purpose}_user_id") != user_id:
+        return HttpResponseForbidden()
+    user = get_object_or_404(User, id=user_id)
+    return JsonResponse({'status': delivery_status(user, purpose)})
+
 # Helper function to initiate OTP flow
 def send_otp_and_redirect(user, purpose, request):
-    """Create OTP, send email, and redirect to verification page"""
-    otp = OTP.create_otp(user, purpose)
-    send_otp_via_email(user, otp.code, purpose)
+    """Issue an OTP, queue the email, and redirect to verification page"""
+    code = issue_otp(user, purpose, ip_address=get_client_ip(request))
+    queue_otp_email(user, code, purpose)
+    request.session[f"{purpose}_user_id"] = user.id
     
     if purpose == "signup":
         return redirect('otp_auth:verify_signup_otp', user_id=user.id)
     else:  # login
-        return redirect('otp_auth:verify_login_otp', user_id=user.id)
\ No newline at end of file
+        return redirect('otp_auth:verify_login_otp', user_id=user.id)
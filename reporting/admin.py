@@ -0,0 +1,83 @@
+from datetime import timedelta
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .models import AppointmentFact, ServiceFeeCube, WeeklyCategoryCityCube
+from .warehouse import week_start
+
+REPORT_DEFAULT_WEEKS = 8
+
+
+class ReadOnlyReportAdmin(admin.ModelAdmin):
+    """Reporting rows are written by `manage.py refresh_reporting` only"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AppointmentFact)
+class AppointmentFactAdmin(ReadOnlyReportAdmin):
+    list_display = ('appointment_id', 'week', 'category_name', 'service_name', 'city', 'status', 'price', 'platform_fee', 'rating')
+    list_filter = ('status', 'week', 'category_name')
+    search_fields = ('city', 'service_name', 'subtask_name')
+    date_hierarchy = 'week'
+    show_full_result_count = False
+
+
+@admin.register(ServiceFeeCube)
+class ServiceFeeCubeAdmin(ReadOnlyReportAdmin):
+    list_display = ('service_name', 'category_name', 'bookings', 'completed', 'gross_amount', 'average_price', 'average_fee')
+    list_filter = ('category_name',)
+    search_fields = ('service_name',)
+
+
+@admin.register(WeeklyCategoryCityCube)
+class WeeklyCategoryCityCubeAdmin(ReadOnlyReportAdmin):
+    list_display = ('week', 'category_name', 'city', 'bookings', 'completed', 'cancelled', 'gross_amount', 'platform_fees')
+    list_filter = ('week', 'category_name')
+    search_fields = ('city',)
+    date_hierarchy = 'week'
+    change_list_template = 'admin/reporting/weeklycategorycitycube/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='reporting_platform_report'),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        """Bookings per category and city over the last N weeks, plus average fees per service"""
+        try:
+            weeks = max(1, min(int(request.GET.get('weeks', REPORT_DEFAULT_WEEKS)), 52))
+        except ValueError:
+            weeks = REPORT_DEFAULT_WEEKS
+        last_week = week_start(timezone.now())
+        week_columns = [last_week - timedelta(weeks=offset) for offset in range(weeks - 1, -1, -1)]
+
+        # Pivot cube cells into one row per (category, city) with a column per week
+        pivot = {}
+        cells = WeeklyCategoryCityCube.objects.filter(week__gte=week_columns[0], week__lte=last_week)
+        for cell in cells.values('category_name', 'city', 'week', 'bookings'):
+            key = (cell['category_name'] or 'Uncategorised', cell['city'] or 'Unknown')
+            pivot.setdefault(key, dict.fromkeys(week_columns, 0))[cell['week']] += cell['bookings']
+        booking_rows = [
+            {'category': category, 'city': city, 'counts': [counts[week] for week in week_columns], 'total': sum(counts.values())}
+            for (category, city), counts in sorted(pivot.items())
+        ]
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Platform report',
+            'opts': self.model._meta,
+            'weeks': weeks,
+            'week_columns': week_columns,
+            'booking_rows': booking_rows,
+            'service_rows': ServiceFeeCube.objects.all(),
+        }
+        return TemplateResponse(request, 'admin/reporting/report.html', context)
@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+class ReportingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'reporting'
+    verbose_name = 'Reporting'
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.1 on 2026-10-19 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceFeeCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_id', models.BigIntegerField(unique=True)),
+                ('service_name', models.CharField(blank=True, max_length=100)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Service fees',
+                'verbose_name_plural': 'Service fees',
+                'ordering': ['category_name', 'service_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_id', models.BigIntegerField(unique=True)),
+                ('worker_id', models.BigIntegerField()),
+                ('customer_id', models.BigIntegerField()),
+                ('category_id', models.BigIntegerField(blank=True, null=True)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('service_id', models.BigIntegerField(blank=True, null=True)),
+                ('service_name', models.CharField(blank=True, max_length=100)),
+                ('subtask_name', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(max_length=20)),
+                ('shift_type', models.CharField(blank=True, max_length=10)),
+                ('appointment_date', models.DateTimeField(blank=True, null=True)),
+                ('week', models.DateField()),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('platform_fee', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('rating', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('loaded_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-week', 'appointment_id'],
+                'indexes': [models.Index(fields=['week', 'category_id', 'city'], name='reporting_a_week_38f551_idx'), models.Index(fields=['service_id'], name='reporting_a_service_795791_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyCategoryCityCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('category_id', models.BigIntegerField(blank=True, null=True)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Weekly bookings by category and city',
+                'verbose_name_plural': 'Weekly bookings by category and city',
+                'ordering': ['-week', 'category_name', 'city'],
+                'indexes': [models.Index(fields=['week'], name='reporting_w_week_15e701_idx')],
+            },
+        ),
+    ]
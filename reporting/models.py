@@ -0,0 +1,95 @@
+# models.py - Star-schema reporting tables, loaded by `manage.py refresh_reporting`
+from django.db import models
+
+# Facts and cubes reference OLTP rows by plain ids rather than foreign keys, so
+# they can live in a separate database (see reporting.routers) and reporting
+# queries never join back to the booking tables.
+
+
+class AppointmentFact(models.Model):
+    """One row per appointment with its service, category and city dimensions denormalised"""
+    appointment_id = models.BigIntegerField(unique=True)
+    worker_id = models.BigIntegerField()
+    customer_id = models.BigIntegerField()
+
+    # Dimensions
+    category_id = models.BigIntegerField(null=True, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    service_id = models.BigIntegerField(null=True, blank=True)
+    service_name = models.CharField(max_length=100, blank=True)
+    subtask_name = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20)
+    shift_type = models.CharField(max_length=10, blank=True)
+    appointment_date = models.DateTimeField(null=True, blank=True)
+    week = models.DateField()  # Monday of the (local) appointment week
+
+    # Measures
+    price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    platform_fee = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    rating = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    loaded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-week', 'appointment_id']
+        indexes = [
+            models.Index(fields=['week', 'category_id', 'city']),
+            models.Index(fields=['service_id']),
+        ]
+
+    def __str__(self):
+        return f"Appointment {self.appointment_id} ({self.week})"
+
+
+class WeeklyCategoryCityCube(models.Model):
+    """Bookings per service category per city per week"""
+    week = models.DateField()
+    category_id = models.BigIntegerField(null=True, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    bookings = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    platform_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        ordering = ['-week', 'category_name', 'city']
+        indexes = [models.Index(fields=['week'])]
+        verbose_name = 'Weekly bookings by category and city'
+        verbose_name_plural = 'Weekly bookings by category and city'
+
+    def __str__(self):
+        return f"{self.week} - {self.category_name or 'Uncategorised'} - {self.city or 'Unknown'}"
+
+
+class ServiceFeeCube(models.Model):
+    """Lifetime booking and fee totals per service"""
+    service_id = models.BigIntegerField(unique=True)
+    service_name = models.CharField(max_length=100, blank=True)
+    category_name = models.CharField(max_length=100, blank=True)
+    bookings = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    platform_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        ordering = ['category_name', 'service_name']
+        verbose_name = 'Service fees'
+        verbose_name_plural = 'Service fees'
+
+    def __str__(self):
+        return self.service_name
+
+    @property
+    def average_price(self):
+        if self.completed:
+            return round(self.gross_amount / self.completed, 2)
+        return 0
+
+    @property
+    def average_fee(self):
+        if self.completed:
+            return round(self.platform_fees / self.completed, 2)
+        return 0
@@ -0,0 +1,30 @@
+from django.conf import settings
+
+REPORTING_DB = 'reporting'
+
+
+def reporting_db():
+    """Database alias holding the reporting tables: 'reporting' if configured, else 'default'"""
+    return REPORTING_DB if REPORTING_DB in settings.DATABASES else 'default'
+
+
+class ReportingRouter:
+    """
+    Keep the reporting app's tables in DATABASES['reporting'] when that alias
+    exists, so warehouse loads and report queries stay off the OLTP database.
+    Without it everything stays on 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'reporting':
+            return reporting_db()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, **hints):
+        if REPORTING_DB not in settings.DATABASES:
+            return None
+        if app_label == 'reporting':
+            return db == REPORTING_DB
+        return db != REPORTING_DB
@@ -0,0 +1,86 @@
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from jobs.models import Appointment
+from jobs.tests import JobsTestCase
+from .models import AppointmentFact, ServiceFeeCube, WeeklyCategoryCityCube
+
+
+class RefreshReportingTests(JobsTestCase):
+    def refresh(self, *args):
+        call_command('refresh_reporting', *args, stdout=StringIO())
+
+    def bookings_by_city(self):
+        return dict(WeeklyCategoryCityCube.objects.values_list('city', 'bookings'))
+
+    def test_incremental_refresh_follows_changes(self):
+        appointment = self.book(location='12 Main Road, Kathmandu')
+        self.refresh()
+        self.assertEqual(self.bookings_by_city(), {'Kathmandu': 1})
+
+        appointment.location = '4 Lake Side, Pokhara - 33700'
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.refresh()
+
+        self.assertEqual(self.bookings_by_city(), {'Pokhara': 1})
+        self.assertEqual(AppointmentFact.objects.get().status, 'cancelled')
+
+    def test_incremental_refresh_drops_deleted_appointments(self):
+        kept = self.book(location='12 Main Road, Kathmandu')
+        deleted = self.book(location='3 Durbar Marg, Kathmandu')
+        self.refresh()
+        self.assertEqual(self.bookings_by_city(), {'Kathmandu': 2})
+
+        deleted.delete()
+        self.refresh()
+
+        self.assertEqual(list(AppointmentFact.objects.values_list('appointment_id', flat=True)), [kept.pk])
+        self.assertEqual(self.bookings_by_city(), {'Kathmandu': 1})
+        self.assertEqual(ServiceFeeCube.objects.get().bookings, 1)
+
+    def test_full_refresh_reloads_everything(self):
+        appointment = self.book(location='12 Main Road, Kathmandu')
+        self.refresh()
+        # A queryset update skips updated_at, so only a full reload sees it
+        Appointment.objects.filter(pk=appointment.pk).update(location='4 Lake Side, Pokhara')
+        self.refresh()
+        self.assertEqual(self.bookings_by_city(), {'Kathmandu': 1})
+
+        self.refresh('--full')
+        self.assertEqual(self.bookings_by_city(), {'Pokhara': 1})
+
+    def test_failed_full_refresh_keeps_the_previous_warehouse(self):
+        self.book(location='12 Main Road, Kathmandu')
+        self.refresh()
+
+        with mock.patch('reporting.management.commands.refresh_reporting.refresh_service_cube', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.refresh('--full')
+
+        self.assertEqual(AppointmentFact.objects.count(), 1)
+        self.assertEqual(self.bookings_by_city(), {'Kathmandu': 1})
+
+
+class PlatformReportTests(JobsTestCase):
+    def test_report_pivots_bookings_per_week(self):
+        self.book(days=0, location='12 Main Road, Kathmandu')
+        self.book(days=0, location='3 Durbar Marg, Kathmandu', status='completed', total_price=500)
+        call_command('refresh_reporting', stdout=StringIO())
+        admin = get_user_model().objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('admin:reporting_platform_report'), {'weeks': '4'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['week_columns']), 4)
+        [row] = response.context['booking_rows']
+        self.assertEqual((row['category'], row['city'], row['counts'][-1], row['total']), ('Plumbing', 'Kathmandu', 2, 2))
+        self.assertEqual(response.context['service_rows'].get().completed, 1)
+
+    def test_report_is_staff_only(self):
+        self.client.force_login(self.worker_user)
+        response = self.client.get(reverse('admin:reporting_platform_report'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,188 @@
+# warehouse.py - Incremental load of AppointmentFact and the cubes built from it
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from jobs.models import Appointment, AppointmentTombstone, WorkerEarning, WorkerRating
+from .models import AppointmentFact, ServiceFeeCube, WeeklyCategoryCityCube
+from .routers import reporting_db
+
+# Appointment columns read for each fact row, with the joins they need
+SOURCE_FIELDS = (
+    'id', 'worker_id', 'customer_id', 'status', 'shift_type', 'appointment_date',
+    'created_at', 'location', 'total_price',
+    'service_subtask__worker_service__service__category_id',
+    'service_subtask__worker_service__service__category__name',
+    'service_subtask__worker_service__service_id',
+    'service_subtask__worker_service__service__name',
+    'service_subtask__subtask__name',
+    'workerearning__platform_fee',
+    'workerearning__posted_at',
+    'workerrating__rating',
+)
+
+FACT_FIELDS = (
+    'worker_id', 'customer_id', 'category_id', 'category_name', 'service_id',
+    'service_name', 'subtask_name', 'city', 'status', 'shift_type',
+    'appointment_date', 'week', 'price', 'platform_fee', 'rating',
+)
+
+
+def city_from_location(location):
+    """
+    Appointment locations are stored as "<address>, <city>[ - <pincode>]"
+    by the booking form; return the city part, or '' if there is none.
+    """
+    if not location or ',' not in location:
+        return ''
+    return location.rsplit(',', 1)[1].split(' - ', 1)[0].strip()[:100]
+
+
+def week_start(moment):
+    """Monday of the local week `moment` falls in"""
+    day = timezone.localtime(moment).date()
+    return day - timedelta(days=day.weekday())
+
+
+def build_fact(row):
+    """Turn one SOURCE_FIELDS row into an unsaved AppointmentFact"""
+    posted = row['workerearning__posted_at'] is not None
+    return AppointmentFact(
+        appointment_id=row['id'],
+        worker_id=row['worker_id'],
+        customer_id=row['customer_id'],
+        category_id=row['service_subtask__worker_service__service__category_id'],
+        category_name=row['service_subtask__worker_service__service__category__name'] or '',
+        service_id=row['service_subtask__worker_service__service_id'],
+        service_name=row['service_subtask__worker_service__service__name'] or '',
+        subtask_name=row['service_subtask__subtask__name'] or '',
+        city=city_from_location(row['location']),
+        status=row['status'],
+        shift_type=row['shift_type'] or '',
+        appointment_date=row['appointment_date'],
+        week=week_start(row['appointment_date'] or row['created_at']),
+        price=row['total_price'],
+        platform_fee=row['workerearning__platform_fee'] if posted else None,
+        rating=row['workerrating__rating'],
+    )
+
+
+def changed_appointment_ids(since):
+    """Ids of appointments whose own row, rating or ledger entry changed at or after `since`"""
+    ids = set(Appointment.objects.filter(updated_at__gte=since).values_list('id', flat=True))
+    ids.update(WorkerRating.objects.filter(updated_at__gte=since).values_list('appointment_id', flat=True))
+    ids.update(WorkerEarning.objects.filter(updated_at__gte=since).values_list('appointment_id', flat=True))
+    return ids
+
+
+def deleted_appointment_ids(since):
+    """
+    Ids of appointments deleted at or after `since`, from the tombstones kept
+    for calendar deltas (jobs.calendar_feed.CALENDAR_DELTA_MAX_AGE)
+    """
+    return set(AppointmentTombstone.objects.filter(deleted_at__gte=since).values_list('appointment_id', flat=True))
+
+
+def drop_facts(appointment_ids):
+    """
+    Delete the facts of deleted appointments. Returns (rows dropped, weeks
+    touched, service ids touched) so their old cube cells can be refreshed.
+    """
+    facts = AppointmentFact.objects.using(reporting_db()).filter(appointment_id__in=appointment_ids)
+    weeks, service_ids = set(), set()
+    for week, service_id in facts.values_list('week', 'service_id'):
+        weeks.add(week)
+        service_ids.add(service_id)
+    dropped, _ = facts.delete()
+    service_ids.discard(None)
+    return dropped, weeks, service_ids
+
+
+def load_facts(appointment_ids, chunk_size=1000):
+    """
+    Upsert facts for the given appointments, reading the OLTP tables once per
+    chunk. Returns (rows loaded, weeks touched, service ids touched), where
+    "touched" covers both the old and the new dimension values so the cubes
+    can be refreshed for exactly those cells.
+    """
+    db = reporting_db()
+    appointment_ids = sorted(appointment_ids)
+    weeks, service_ids = set(), set()
+    loaded = 0
+    for start in range(0, len(appointment_ids), chunk_size):
+        chunk = appointment_ids[start:start + chunk_size]
+        previous = AppointmentFact.objects.using(db).filter(appointment_id__in=chunk).values_list('week', 'service_id')
+        for week, service_id in previous:
+            weeks.add(week)
+            service_ids.add(service_id)
+
+        facts = [build_fact(row) for row in Appointment.objects.filter(id__in=chunk).values(*SOURCE_FIELDS)]
+        for fact in facts:
+            weeks.add(fact.week)
+            service_ids.add(fact.service_id)
+
+        AppointmentFact.objects.using(db).bulk_create(
+            facts,
+            update_conflicts=True,
+            unique_fields=['appointment_id'],
+            update_fields=[*FACT_FIELDS, 'loaded_at'],
+        )
+        loaded += len(facts)
+    service_ids.discard(None)
+    return loaded, weeks, service_ids
+
+
+def refresh_weekly_cube(weeks=None):
+    """Rebuild WeeklyCategoryCityCube cells for `weeks` (all weeks if None) from the facts"""
+    db = reporting_db()
+    facts = AppointmentFact.objects.using(db)
+    cells = WeeklyCategoryCityCube.objects.using(db)
+    if weeks is not None:
+        facts = facts.filter(week__in=weeks)
+        cells = cells.filter(week__in=weeks)
+
+    rows = (
+        facts.order_by().values('week', 'category_id', 'city')
+        .annotate(
+            category_name=Max('category_name'),
+            bookings=Count('id'),
+            completed=Count('id', filter=Q(status='completed')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            gross_amount=Sum('price', filter=Q(status='completed')),
+            platform_fees=Sum('platform_fee'),
+        )
+    )
+    with transaction.atomic(using=db):
+        cells.delete()
+        WeeklyCategoryCityCube.objects.using(db).bulk_create([
+            WeeklyCategoryCityCube(**{**row, 'gross_amount': row['gross_amount'] or 0, 'platform_fees': row['platform_fees'] or 0})
+            for row in rows
+        ], batch_size=1000)
+
+
+def refresh_service_cube(service_ids=None):
+    """Rebuild ServiceFeeCube rows for `service_ids` (all services if None) from the facts"""
+    db = reporting_db()
+    facts = AppointmentFact.objects.using(db).filter(service_id__isnull=False)
+    cells = ServiceFeeCube.objects.using(db)
+    if service_ids is not None:
+        facts = facts.filter(service_id__in=service_ids)
+        cells = cells.filter(service_id__in=service_ids)
+
+    rows = (
+        facts.order_by().values('service_id')
+        .annotate(
+            service_name=Max('service_name'),
+            category_name=Max('category_name'),
+            bookings=Count('id'),
+            completed=Count('id', filter=Q(status='completed')),
+            gross_amount=Sum('price', filter=Q(status='completed')),
+            platform_fees=Sum('platform_fee'),
+        )
+    )
+    with transaction.atomic(using=db):
+        cells.delete()
+        ServiceFeeCube.objects.using(db).bulk_create([
+            ServiceFeeCube(**{**row, 'gross_amount': row['gross_amount'] or 0, 'platform_fees': row['platform_fees'] or 0})
+            for row in rows
+        ], batch_size=1000)